@@ -42,8 +42,12 @@ __version__ = "2.0.10"
 
 # loading the PYroMat utility functions
 from . import utility
+# Time each phase of the import (see startup_report)
+_startup = {}
+_tic = utility.time.time()
 # load the configuration
 config = utility.PMConfig()
+_startup['config'] = utility.time.time() - _tic
 
 # import the dataclass registry
 from . import reg
@@ -51,9 +55,26 @@ from . import reg
 from . import dat
 # import the units module
 from . import units
-
-reg.regload()
-dat.load()
+# The bank, validate, equil, and combust modules are imported when they
+# are first used (see __getattr__)
+_startup['modules'] = utility.time.time() - _tic - _startup['config']
+
+if utility.os.environ.get(dat._WORKER_FLAG):
+    # Workers in a dat_pool='process' pool only parse files, so they need
+    # neither the registry nor the data (see dat._parse_files)
+    _startup['reg'] = reg.stats
+    _startup['dat'] = dat.stats
+else:
+    reg.regload()
+    _startup['reg'] = reg.stats
+    if config['dat_thread']:
+        # The data statistics are not available until the load is finished
+        dat.start()
+        _startup['dat'] = None
+    else:
+        dat.load()
+        _startup['dat'] = dat.stats
+_startup['total'] = utility.time.time() - _tic
 
 
 
@@ -70,6 +91,9 @@ Returns a substance data class for the substance named.
 """
     if name in dat.data:
         return dat.data[name]
+    # If the data are still loading, wait for them
+    if dat.wait(name) and name in dat.data:
+        return dat.data[name]
     
     utility.print_error('No substance named "' + str(name) + '" was found in the loaded data.')
     raise utility.PMParamError('Invaid substance name.')
@@ -80,6 +104,193 @@ Returns a substance data class for the substance named.
 
 
 
+# The modules that are imported on first use
+_SUBMODULES = ('bank', 'validate', 'equil', 'combust')
+
+def __getattr__(name):
+    """Import the bank, validate, equil, and combust modules on first use
+    pm.equil
+
+They are not needed by most users, so they are not imported with 
+PYroMat.  In Python 3.7 and later, the module is imported the first 
+time it is used as an attribute, as in pm.equil.PMEquilibrium.  In 
+older versions, they must be imported explicitly,
+  >>> import pyromat.equil
+"""
+    if name in _SUBMODULES:
+        import importlib
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError("module '" + __name__ + "' has no attribute '" + 
+            name + "'")
+
+
+
+
+
+
+
+def mixture(contents, bymass=False, name=None):
+    """Create an ideal gas mixture
+    mix = mixture(contents)
+        or
+    mix = mixture(contents, bymass=False, name=None)
+
+Returns an igmix object for a mixture of any of the ig and ig2 species.
+CONTENTS is a dictionary of the amounts of each constituent keyed by 
+species id.  The amounts are mole fractions (or numbers of moles), 
+unless bymass is True, in which case they are mass fractions (or 
+masses).  They do not need to add up to one.  For example,
+  >>> mix = pm.mixture({'ig.N2':0.79, 'ig.O2':0.21})
+  >>> mix.h(T=500.)
+
+NAME is an optional species id for the mixture.  The mixture is not 
+added to the data dictionary.  
+
+The constituents' polynomials are merged into a single polynomial for
+the mixture, so its properties cost the same as a single species.  The 
+merged polynomials are cached by composition, so creating many mixtures
+of the same composition is cheap.
+"""
+    if name is None:
+        name = 'ig.mixture'
+    for sid in contents:
+        if sid not in dat.data:
+            utility.print_error('No substance named "' + str(sid) + '" was found in the loaded data.')
+            raise utility.PMParamError('Invaid substance name.')
+        if dat.data[sid].data['class'] not in ('ig', 'ig2'):
+            utility.print_error('Mixtures may only contain ig and ig2 species.  ' + sid + ' is ' + dat.data[sid].data['class'] + '.')
+            raise utility.PMParamError('Invalid substance class.')
+    data = {'id':name, 'class':'igmix', 'fromfile':'', 'bymass':bymass,
+            'contents':dict(contents), 
+            'doc':'Ideal gas mixture of ' + ', '.join(sorted(contents)) + '.'}
+    return reg.registry['igmix'](data)
+
+
+
+def search(contains=None, only=None, T=None, cls=None, charge=None):
+    """Find species by their atomic contents and properties
+    ids = search(contains=None, only=None, T=None, cls=None, charge=None)
+
+Returns a sorted list of the ids of the species that meet all of the 
+criteria specified.  The elements may be given as a list of symbols or 
+as a string like 'CHON'.
+contains
+    The species must contain all of these elements.  This may also be a
+    dictionary of elements with the exact number of each atom.
+only
+    The species may contain no elements other than these.
+T
+    A temperature or an array of temperatures [unit_temperature] that 
+    must all be within the species' limits.
+cls
+    The name of a class or a list of classes (e.g. 'ig2').
+charge
+    The charge of the species; e.g. charge=0 excludes ions.
+
+For example, all species made only of C, H, O, and N that are valid at
+3000K are 
+  >>> pm.search(only='CHON', T=3000.)
+
+The search uses the species index in dat.index(), which is built the 
+first time it is needed after the data are loaded.
+"""
+    idx = dat.index()
+    species = idx['species']
+    elements = idx['elements']
+    found = set(species.keys())
+    if contains is not None:
+        if isinstance(contains, dict):
+            for key,value in contains.items():
+                temp = elements.get(key, {})
+                found.intersection_update(
+                        [sid for sid in temp if temp[sid] == value])
+        else:
+            for key in _symbols(contains):
+                found.intersection_update(elements.get(key, {}))
+    if only is not None:
+        only = set(_symbols(only))
+        for key in elements:
+            if key not in only:
+                found.difference_update(elements[key])
+    if cls is not None:
+        if isinstance(cls, str):
+            cls = [cls]
+        found = set([sid for sid in found if species[sid]['class'] in cls])
+    if charge is not None:
+        found = set([sid for sid in found if species[sid]['charge'] == charge])
+    if T is not None:
+        T = units.temperature_scale(utility.np.asarray(T, dtype=float), 
+                to_units='K')
+        Tmin = T.min()
+        Tmax = T.max()
+        found = set([sid for sid in found if species[sid]['Tlim'] is not None 
+                and species[sid]['Tlim'][0] <= Tmin 
+                and species[sid]['Tlim'][1] >= Tmax])
+    return sorted(found)
+
+
+
+def _symbols(value):
+    """Return a list of element symbols from a string or a list"""
+    if isinstance(value, str):
+        return utility.re.findall('[A-Z][a-z]*', value)
+    return list(value)
+
+
+
+
+
+
+
+def startup_report():
+    """Return a summary of the time spent importing PYroMat
+    report = startup_report()
+
+The report is a dictionary with the following keys:
+total
+    The total import time in seconds.
+config
+    A dictionary with the total 'time' spent loading the configuration
+    and a list of 'files', each with the 'file', its load 'time', and
+    the number of 'entries' it defined.
+modules
+    The time spent importing the reg, dat, and units modules.
+reg
+    The registry load 'time', whether it was 'lazy', the number of 
+    files found in each directory in 'dirs', and a list of 'files' with
+    the time spent loading each of them.
+dat
+    The data load 'time', split into the 'listing', 'parsing', and 
+    'merging' phases.  The 'construction' time is the part of merging
+    spent building species objects.  There are also the total number of
+    'files' and 'species', whether the data came from the 'snapshot' 
+    cache, the number of directories read from a 'manifest', the number
+    of species using coefficients from the 'store', the files and 
+    suppressed files found in each directory in 'dirs', and the number 
+    of species of each class in 'classes', with the number 'built' and
+    the construction 'time'.
+
+All times are in seconds.  In lazy mode, species are built after import,
+so the construction times grow as species are used.  When the data are 
+loaded in a background thread (see the 'dat_thread' parameter), the 
+'total' does not include the data load, and startup_report() waits for
+it to finish.
+"""
+    import copy
+    if _startup['dat'] is None:
+        dat.wait()
+        _startup['dat'] = dat.stats
+    report = copy.deepcopy(_startup)
+    report['config'] = {'time':_startup['config'], 
+            'files':copy.deepcopy(config.stats)}
+    return report
+
+
+
+
+
+
+
 def info( name=None ):
     """Print information on substance data
     info()
@@ -91,6 +302,8 @@ If called with a string indicating one of the
 substances, info() prints relevant information 
 for the substance named.
 """
+    # The table should not be printed from a partial load
+    dat.wait()
 
     month = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
 
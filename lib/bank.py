@@ -0,0 +1,834 @@
+"""PYROMAT.BANK
+
+The bank module evaluates the properties of many ideal gas species at
+once.  Chemical equilibrium and screening calculations need properties
+like enthalpy and entropy for hundreds of species at the same
+temperatures.  Rather than calling each species' property methods in a
+loop, a PMBank object stacks the coefficients of the ig and ig2 species
+into dense arrays, and each property is evaluated for every species in
+a single vectorized operation.
+
+>>> import pyromat as pm
+>>> b = pm.bank.PMBank(['ig.N2', 'ig.O2', 'ig.CO2'])
+>>> h = b.h(T=[300., 500., 1000.])
+>>> h.shape
+(3, 3)
+
+The rows of the results correspond to the species in b.species, and the
+remaining dimensions correspond to the temperature array.
+
+A PMReaction object uses a bank to evaluate the enthalpy, entropy, Gibbs
+energy, and equilibrium constant of reactions over temperature arrays.
+
+>>> r = pm.bank.PMReaction({'ig.H2':-1, 'ig.O2':-0.5, 'ig.H2O':1})
+>>> Kp = r.Kp(T=[1000., 1500., 2000.])
+
+A PMMixture object evaluates ideal gas mixtures with a different 
+composition in every state, like the cells of a reacting flow 
+solution.  The fractions are an array with one column per species.
+
+>>> m = pm.bank.PMMixture(['ig.N2', 'ig.O2', 'ig.H2O'])
+>>> h = m.h([[0.79, 0.21, 0.], [0.7, 0.1, 0.2]], T=[300., 1500.])
+"""
+
+import pyromat as pyro
+import numpy as np
+utility = pyro.utility
+
+
+
+# The classes that can be stacked in a bank
+CLASSES = ('ig', 'ig2')
+
+
+
+class PMBank(object):
+    """A bank of ideal gas species evaluated together
+    b = PMBank()
+        or
+    b = PMBank(species)
+
+SPECIES is an optional list of species id strings.  Every species must
+belong to the ig or ig2 class.  When it is omitted, the bank includes
+every ig and ig2 species in the data dictionary, sorted by id.
+
+The Shomate (ig) and NASA (ig2) polynomials are both re-written in a
+common form for the specific heat,
+    cp = a0/T**2 + a1 + a2*T + a3*T**2 + a4*T**3 + a5*T**4
+with constants of integration for enthalpy and entropy.  Species with
+the same number of temperature ranges are grouped together, and the
+coefficients of each group are stored as dense arrays.  The bank is a
+snapshot; it does not change if the data are later reloaded.
+
+The property methods accept arrays of temperature (and pressure), and
+they return an array with shape (n_species,) + T.shape.  The rows are
+in the same order as the species list.  Temperatures outside of a
+species' limits result in NaN in that species' row.
+  cp()  spec. heat      (unit_energy / unit_temperature / unit_matter)
+  h()   enthalpy        (unit_energy / unit_matter)
+  s()   entropy         (unit_energy / unit_temperature / unit_matter)
+  g()   Gibbs energy    (unit_energy / unit_matter)
+  mw()  molecular weight (unit_mass / unit_molar)
+  Tlim() temperature limits (unit_temperature)
+"""
+    def __init__(self, species=None):
+        # Do not build a bank from a partial load
+        pyro.dat.wait()
+        if species is None:
+            species = []
+            for sid in sorted(pyro.dat.data.keys()):
+                if pyro.dat.data[sid].data['class'] in CLASSES:
+                    species.append(sid)
+
+        self.species = list(species)
+        n = len(self.species)
+        mw = np.zeros((n,), dtype=float)
+        # The reference pressure in Pa
+        pref = np.zeros((n,), dtype=float)
+        # Group the species by their number of temperature ranges
+        groups = {}
+        for ii,sid in enumerate(self.species):
+            if sid not in pyro.dat.data:
+                utility.print_error('No substance named "' + str(sid) +
+                        '" was found in the loaded data.')
+                raise utility.PMParamError('Invalid substance name.')
+            data = pyro.dat.data[sid].data
+            if data['class'] not in CLASSES:
+                utility.print_error('PMBank only accepts species of the ' +
+                        'ig and ig2 classes.  ' + sid + ' is ' +
+                        data['class'] + '.')
+                raise utility.PMParamError('Invalid substance class.')
+            Tlim,A = _coef(data)
+            mw[ii] = data['mw']
+            if data['class'] == 'ig':
+                pref[ii] = 1e5
+            else:
+                pref[ii] = data['pref']
+            group = groups.setdefault(len(Tlim),
+                    {'index':[], 'Tlim':[], 'A':[], 'lower':[]})
+            group['index'].append(ii)
+            group['Tlim'].append(Tlim)
+            group['A'].append(A)
+            # The ig2 ranges include their lower limits, and the ig
+            # ranges include their upper limits.
+            group['lower'].append(data['class'] == 'ig2')
+
+        self._mw = mw
+        self._pref = pref
+        self._groups = []
+        for m in sorted(groups.keys()):
+            group = groups[m]
+            self._groups.append((
+                    np.array(group['index'], dtype=int),
+                    np.array(group['Tlim'], dtype=float),
+                    _stack(group['A']),
+                    np.array(group['lower'], dtype=bool)))
+
+
+    def __len__(self):
+        return len(self.species)
+
+
+    def __repr__(self):
+        return '<PMBank of %d species>'%len(self.species)
+
+
+    def _eval(self, T, cp=False, h=False, s=False):
+        """Evaluate the polynomials for all species
+    cp, h, s = _eval(T, cp=False, h=False, s=False)
+
+T is a one-dimensional array of temperatures in K.  Returns arrays with
+shape (n_species, T.size) in kJ/kmol/K and kJ/kmol.  Only the
+properties requested by the keywords are calculated; the others are
+None.  The entropy is at the species' reference pressure.
+"""
+        n = len(self.species)
+        result = [None, None, None]
+        work = []
+        # Build the basis functions of T
+        if cp:
+            work.append((0, np.array([T**-2, np.ones_like(T), T, T**2, T**3, T**4])))
+        if h:
+            work.append((1, np.array([1./T, T, T**2, T**3, T**4, T**5, np.ones_like(T)])))
+        if s:
+            work.append((2, np.array([T**-2, np.log(T), T, T**2, T**3, T**4, np.ones_like(T)])))
+        for kk,basis in work:
+            result[kk] = np.full((n, T.size), np.nan)
+
+        for index, Tlim, A, lower in self._groups:
+            # Find the range for each species and temperature
+            Tb = Tlim[:, 1:-1, np.newaxis]
+            rr = np.sum(T > Tb, axis=1)
+            rr += np.sum((T == Tb) & lower[:, np.newaxis, np.newaxis], axis=1)
+            valid = (T >= Tlim[:, 0:1]) & (T <= Tlim[:, -1:])
+            for kk,basis in work:
+                temp = np.full((index.size, T.size), np.nan)
+                for r in range(A[kk].shape[0]):
+                    I = valid & (rr == r)
+                    temp[I] = np.dot(A[kk][r], basis)[I]
+                result[kk][index] = temp
+        return tuple(result)
+
+
+    def _argparse(self, T=None, p=None):
+        """Parse the temperature and pressure arguments
+    T, p, shape = _argparse(T, p)
+
+Applies the default temperature and pressure, converts them to K and
+Pa, and broadcasts them.  T and p are returned as one-dimensional
+arrays, and shape is the broadcast shape of the originals.
+"""
+        if T is None:
+            T = pyro.config['def_T']
+        if p is None:
+            p = pyro.config['def_p']
+        T = pyro.units.temperature_scale(np.asarray(T, dtype=float), to_units='K')
+        p = pyro.units.pressure(np.asarray(p, dtype=float), to_units='Pa')
+        T,p = np.broadcast_arrays(T,p)
+        shape = T.shape
+        return T.flatten(), p.flatten(), shape
+
+
+    def _scale(self, out, shape, temperature=False):
+        """Convert a result from kJ/kmol(/K) into the user units
+    out = _scale(out, shape, temperature=False)
+"""
+        pyro.units.energy(out, from_units='kJ', inplace=True)
+        pyro.units.matter(out, self._mw[:, np.newaxis],
+                from_units='kmol', exponent=-1, inplace=True)
+        if temperature:
+            pyro.units.temperature(out, from_units='K', exponent=-1, inplace=True)
+        return out.reshape((len(self.species),) + shape)
+
+
+    def cp(self, T=None, p=None):
+        """Constant-pressure specific heat
+    cp = b.cp(T,p)
+Both arguments are optional, and will default to 'def_T' and 'def_p'
+configuration parameters if they are left undefined.  Ideal gas specific
+heat is not actually a function of p, but it is permitted as an argument
+for cross-compatibility with the species' property methods.
+
+Accepts unit_temperature
+        unit_pressure
+Returns unit_energy / unit_matter / unit_temperature
+"""
+        T,p,shape = self._argparse(T,p)
+        out = self._eval(T, cp=True)[0]
+        return self._scale(out, shape, temperature=True)
+
+
+    def h(self, T=None, p=None):
+        """Enthalpy
+    h = b.h(T,p)
+Both arguments are optional, and will default to 'def_T' and 'def_p'
+configuration parameters if they are left undefined.  Ideal gas enthalpy
+is not actually a function of p, but it is permitted as an argument for
+cross-compatibility with the species' property methods.  The enthalpy
+includes the enthalpy of formation.
+
+Accepts unit_temperature
+        unit_pressure
+Returns unit_energy / unit_matter
+"""
+        T,p,shape = self._argparse(T,p)
+        out = self._eval(T, h=True)[1]
+        return self._scale(out, shape)
+
+
+    def s(self, T=None, p=None):
+        """Entropy
+    s = b.s(T,p)
+Both arguments are optional, and will default to 'def_T' and 'def_p'
+configuration parameters if they are left undefined.
+
+Accepts unit_temperature
+        unit_pressure
+Returns unit_energy / unit_matter / unit_temperature
+"""
+        T,p,shape = self._argparse(T,p)
+        out = self._eval(T, s=True)[2]
+        out -= pyro.units.const_Ru * np.log(p / self._pref[:, np.newaxis])
+        return self._scale(out, shape, temperature=True)
+
+
+    def g(self, T=None, p=None):
+        """Gibbs energy
+    g = b.g(T,p)
+Both arguments are optional, and will default to 'def_T' and 'def_p'
+configuration parameters if they are left undefined.  The Gibbs energy
+is g = h - T*s, where T is the absolute temperature.  Since it is
+calculated from the same evaluation, this is faster than calling h()
+and s() separately.
+
+Accepts unit_temperature
+        unit_pressure
+Returns unit_energy / unit_matter
+"""
+        T,p,shape = self._argparse(T,p)
+        _,h,s = self._eval(T, h=True, s=True)
+        s -= pyro.units.const_Ru * np.log(p / self._pref[:, np.newaxis])
+        h -= T * s
+        return self._scale(h, shape)
+
+
+    def mw(self):
+        """Molecular weight
+    mw = b.mw()
+Returns an array with the molecular weight of each species.
+
+Returns unit_mass / unit_molar
+"""
+        mw = pyro.units.mass(self._mw, from_units='kg')
+        return pyro.units.molar(mw, from_units='kmol', exponent=-1)
+
+
+    def Tlim(self):
+        """Temperature limits
+    Tmin, Tmax = b.Tlim()
+Returns arrays with the lower and upper temperature limits of each
+species.
+
+Returns unit_temperature
+"""
+        Tmin = np.zeros((len(self.species),), dtype=float)
+        Tmax = np.zeros_like(Tmin)
+        for index, Tlim, A, lower in self._groups:
+            Tmin[index] = Tlim[:,0]
+            Tmax[index] = Tlim[:,-1]
+        Tmin = pyro.units.temperature_scale(Tmin, from_units='K')
+        Tmax = pyro.units.temperature_scale(Tmax, from_units='K')
+        return Tmin, Tmax
+
+
+
+class PMReaction(object):
+    """Thermochemistry of one or more gas phase reactions
+    r = PMReaction(stoich)
+        or
+    r = PMReaction(stoich, bank=b)
+
+STOICH is a dictionary of stoichiometric coefficients keyed by species
+id.  Reactants have negative coefficients, and products have positive
+coefficients.  For example, the combustion of methane is
+    r = PMReaction({'ig.CH4':-1, 'ig.O2':-2, 'ig.CO2':1, 'ig.H2O':2})
+
+STOICH may also be a list of dictionaries to evaluate many reactions at
+once.  Then, the results have shape (n_reactions,) + T.shape instead of
+T.shape.  Every species must belong to the ig or ig2 class.
+
+The species' polynomials are evaluated once per call through a PMBank,
+and the results are shared by all of the reactions.  An existing bank 
+that includes all of the species may be passed with the BANK keyword.
+Otherwise, a bank is built with only the species that are needed.
+
+All properties are per mole of reaction at the species' standard 
+pressure (1 bar).
+  dh()  enthalpy of reaction    (unit_energy / unit_molar)
+  ds()  entropy of reaction     (unit_energy / unit_molar / unit_temperature)
+  dg()  Gibbs energy of reaction (unit_energy / unit_molar)
+  Kp()  equilibrium constant    (dless)
+  props() all of the above from a single evaluation
+"""
+    def __init__(self, stoich, bank=None):
+        self.single = isinstance(stoich, dict)
+        if self.single:
+            stoich = [stoich]
+        self.stoich = [dict(this) for this in stoich]
+
+        if bank is None:
+            species = set()
+            for this in self.stoich:
+                species.update(this.keys())
+            bank = PMBank(sorted(species))
+        self.bank = bank
+
+        # The species indices and coefficients of each reaction
+        self._index = []
+        self._nu = []
+        for this in self.stoich:
+            index = []
+            nu = []
+            for sid,value in this.items():
+                if sid not in bank.species:
+                    utility.print_error('The species ' + repr(sid) + 
+                            ' is not in the bank.')
+                    raise utility.PMParamError('Invalid substance name.')
+                index.append(bank.species.index(sid))
+                nu.append(value)
+            self._index.append(np.array(index, dtype=int))
+            self._nu.append(np.array(nu, dtype=float))
+
+
+    def __len__(self):
+        return len(self.stoich)
+
+
+    def _eval(self, T, h=False, s=False):
+        """Evaluate the reaction enthalpy and entropy
+    dh, ds, T, shape = _eval(T, h=False, s=False)
+
+Returns the enthalpy and entropy of reaction in kJ/kmol and kJ/kmol/K
+with shape (n_reactions, T.size), the temperature array in K, and the
+shape of the original temperature array.  Only the properties 
+requested by the keywords are calculated; the others are None.
+"""
+        T,p,shape = self.bank._argparse(T)
+        _,hh,ss = self.bank._eval(T, h=h, s=s)
+        dh = None
+        ds = None
+        if h:
+            dh = np.zeros((len(self.stoich), T.size), dtype=float)
+            for kk in range(len(self.stoich)):
+                dh[kk] = np.dot(self._nu[kk], hh[self._index[kk]])
+        if s:
+            ds = np.zeros((len(self.stoich), T.size), dtype=float)
+            for kk in range(len(self.stoich)):
+                ds[kk] = np.dot(self._nu[kk], ss[self._index[kk]])
+        return dh, ds, T, shape
+
+
+    def _scale(self, out, shape, temperature=False):
+        """Convert a result from kJ/kmol(/K) into the user units
+    out = _scale(out, shape, temperature=False)
+"""
+        pyro.units.energy(out, from_units='kJ', inplace=True)
+        pyro.units.molar(out, from_units='kmol', exponent=-1, inplace=True)
+        if temperature:
+            pyro.units.temperature(out, from_units='K', exponent=-1, inplace=True)
+        if self.single:
+            return out.reshape(shape)
+        return out.reshape((len(self.stoich),) + shape)
+
+
+    def dh(self, T=None):
+        """Enthalpy of reaction
+    dh = r.dh(T)
+The temperature is optional, and will default to the 'def_T' 
+configuration parameter if it is left undefined.
+
+Accepts unit_temperature
+Returns unit_energy / unit_molar
+"""
+        dh,ds,T,shape = self._eval(T, h=True)
+        return self._scale(dh, shape)
+
+
+    def ds(self, T=None):
+        """Entropy of reaction
+    ds = r.ds(T)
+The temperature is optional, and will default to the 'def_T' 
+configuration parameter if it is left undefined.
+
+Accepts unit_temperature
+Returns unit_energy / unit_molar / unit_temperature
+"""
+        dh,ds,T,shape = self._eval(T, s=True)
+        return self._scale(ds, shape, temperature=True)
+
+
+    def dg(self, T=None):
+        """Gibbs energy of reaction
+    dg = r.dg(T)
+The temperature is optional, and will default to the 'def_T' 
+configuration parameter if it is left undefined.
+
+Accepts unit_temperature
+Returns unit_energy / unit_molar
+"""
+        dh,ds,T,shape = self._eval(T, h=True, s=True)
+        dh -= T*ds
+        return self._scale(dh, shape)
+
+
+    def Kp(self, T=None):
+        """Equilibrium constant
+    Kp = r.Kp(T)
+The temperature is optional, and will default to the 'def_T' 
+configuration parameter if it is left undefined.  Kp is the product of
+the partial pressures of the products divided by those of the 
+reactants, each raised to the power of its coefficient, when the 
+pressures are expressed in bar.
+
+Accepts unit_temperature
+Returns dimensionless
+"""
+        dh,ds,T,shape = self._eval(T, h=True, s=True)
+        out = np.exp(-(dh - T*ds)/(pyro.units.const_Ru*T))
+        if self.single:
+            return out.reshape(shape)
+        return out.reshape((len(self.stoich),) + shape)
+
+
+    def props(self, T=None):
+        """Evaluate all of the reaction properties at once
+    P = r.props(T)
+The temperature is optional, and will default to the 'def_T' 
+configuration parameter if it is left undefined.  P is a dictionary 
+with the 'dh', 'ds', 'dg', and 'Kp' results.  This is faster than 
+calling the methods separately, because the species are only 
+evaluated once.
+
+Accepts unit_temperature
+Returns the same units as dh(), ds(), dg(), and Kp()
+"""
+        dh,ds,T,shape = self._eval(T, h=True, s=True)
+        dg = dh - T*ds
+        out = {}
+        out['Kp'] = np.exp(-dg/(pyro.units.const_Ru*T))
+        if self.single:
+            out['Kp'] = out['Kp'].reshape(shape)
+        else:
+            out['Kp'] = out['Kp'].reshape((len(self.stoich),) + shape)
+        out['dh'] = self._scale(dh, shape)
+        out['ds'] = self._scale(ds, shape, temperature=True)
+        out['dg'] = self._scale(dg, shape)
+        return out
+
+
+
+class PMMixture(object):
+    """Ideal gas mixtures with a different composition in every state
+    m = PMMixture(species)
+        or
+    m = PMMixture(species, bymass=False, bank=None)
+
+SPECIES is a list of M species id strings.  Every species must belong 
+to the ig or ig2 class.  The property methods accept an array of 
+fractions, X, whose last dimension has length M, so an (N x M) array 
+describes N states.  The columns are in the same order as the species 
+list.  The fractions are mole fractions unless BYMASS is True, in which 
+case they are mass fractions.  The fractions in each state are 
+normalized, so they do not need to add up to one.
+
+    m = PMMixture(['ig.N2', 'ig.O2', 'ig.H2O', 'ig.CO2'])
+    h = m.h(X, T=T, p=p)
+
+The shape of the results is the broadcast shape of X[..., 0], T, and p.
+The species' polynomials are evaluated once per call through a PMBank,
+and the mixture properties are formed by weighting them by the 
+fractions in each state.  An existing bank that includes all of the 
+species may be passed with the BANK keyword.  Otherwise, a bank is 
+built with only the species that are needed.
+
+Unlike the igmix class, the entropy includes the entropy of mixing; 
+each species is evaluated at its partial pressure.  Species with zero 
+fraction do not contribute to a state, but a temperature outside the 
+limits of any species that is present results in NaN.
+
+The properties are per unit_matter of mixture.  When unit_matter is a
+mass, the molecular weight of the mixture in each state is used.
+  cp()  spec. heat      (unit_energy / unit_temperature / unit_matter)
+  cv()  spec. heat      (unit_energy / unit_temperature / unit_matter)
+  d()   density         (unit_matter / unit_volume)
+  e()   internal energy (unit_energy / unit_matter)
+  gam() spec. heat ratio (dless)
+  h()   enthalpy        (unit_energy / unit_matter)
+  mw()  molecular weight (unit_mass / unit_molar)
+  s()   entropy         (unit_energy / unit_temperature / unit_matter)
+  props() all of the above from a single evaluation
+"""
+    def __init__(self, species, bymass=False, bank=None):
+        self.species = list(species)
+        self.bymass = bool(bymass)
+        if bank is None:
+            bank = PMBank(sorted(set(self.species)))
+        self.bank = bank
+
+        index = []
+        for sid in self.species:
+            if sid not in bank.species:
+                utility.print_error('The species ' + repr(sid) + 
+                        ' is not in the bank.')
+                raise utility.PMParamError('Invalid substance name.')
+            index.append(bank.species.index(sid))
+        self._index = np.array(index, dtype=int)
+        # Molecular weight in kg/kmol and reference pressure in Pa
+        self._mw = bank._mw[self._index]
+        self._pref = bank._pref[self._index]
+
+
+    def __len__(self):
+        return len(self.species)
+
+
+    def __repr__(self):
+        return '<PMMixture of %d species>'%len(self.species)
+
+
+    def _argparse(self, X, T=None, p=None):
+        """Parse the composition, temperature, and pressure arguments
+    x, T, p, shape = _argparse(X, T, p)
+
+Applies the default temperature and pressure, converts them to K and 
+Pa, and broadcasts them with the composition.  x is an array of mole 
+fractions with shape (N, M), T and p are one-dimensional arrays with N
+elements, and shape is the broadcast shape of the states.
+"""
+        X = np.asarray(X, dtype=float)
+        if X.ndim < 1 or X.shape[-1] != len(self.species):
+            utility.print_error('The last dimension of the fraction array ' +
+                    'must have one element for each of the %d species.'%len(self.species))
+            raise utility.PMParamError('Fraction array has the wrong shape.')
+        if T is None:
+            T = pyro.config['def_T']
+        if p is None:
+            p = pyro.config['def_p']
+        T = pyro.units.temperature_scale(np.asarray(T, dtype=float), to_units='K')
+        p = pyro.units.pressure(np.asarray(p, dtype=float), to_units='Pa')
+        shape = np.broadcast(X[...,0], T, p).shape
+        m = len(self.species)
+        x = np.broadcast_to(X, shape + (m,)).reshape((-1, m))
+        T = np.broadcast_to(T, shape).flatten()
+        p = np.broadcast_to(p, shape).flatten()
+
+        if self.bymass:
+            x = x / self._mw
+        total = np.sum(x, axis=1)
+        if (x < 0.).any() or (total <= 0.).any():
+            utility.print_error('The fractions must be non-negative, and ' +
+                    'each state must have at least one positive fraction.')
+            raise utility.PMParamError('Invalid fractions.')
+        x = x / total[:, np.newaxis]
+        return x, T, p, shape
+
+
+    def _eval(self, x, T, p, cp=False, h=False, s=False):
+        """Evaluate the mixture polynomials
+    cp, h, s = _eval(x, T, p, cp=False, h=False, s=False)
+
+x, T, and p are the mole fractions, temperatures in K, and pressures in
+Pa returned by _argparse().  Returns one-dimensional arrays in kJ/kmol/K
+and kJ/kmol per kmol of mixture.  Only the properties requested by the
+keywords are calculated; the others are None.
+"""
+        result = list(self.bank._eval(T, cp=cp, h=h, s=s))
+        present = x > 0.
+        for kk in range(3):
+            if result[kk] is None:
+                continue
+            # (N, M) properties of the species
+            this = result[kk][self._index].T
+            if kk == 2:
+                # Evaluate each species at its partial pressure
+                with np.errstate(divide='ignore'):
+                    this = this - pyro.units.const_Ru * np.log(
+                            x * p[:, np.newaxis] / self._pref)
+            result[kk] = np.sum(x * np.where(present, this, 0.), axis=1)
+        return tuple(result)
+
+
+    def _scale(self, out, mw, shape, temperature=False):
+        """Convert a result from kJ/kmol(/K) into the user units
+    out = _scale(out, mw, shape, temperature=False)
+
+MW is the molecular weight of the mixture in each state in kg/kmol.
+"""
+        pyro.units.energy(out, from_units='kJ', inplace=True)
+        pyro.units.matter(out, mw, from_units='kmol', exponent=-1, inplace=True)
+        if temperature:
+            pyro.units.temperature(out, from_units='K', exponent=-1, inplace=True)
+        return out.reshape(shape)
+
+
+    def _props(self, X, T, p, keys):
+        """Calculate the properties in KEYS in the user units
+    out = _props(X, T, p, keys)
+"""
+        x,T,p,shape = self._argparse(X, T, p)
+        R = pyro.units.const_Ru
+        mw = np.dot(x, self._mw)
+        cp,h,s = self._eval(x, T, p, 
+                cp=bool(set(keys) & set(['cp', 'cv', 'gam'])), 
+                h=bool(set(keys) & set(['h', 'e'])), 
+                s=('s' in keys))
+        out = {}
+        if 'gam' in keys:
+            out['gam'] = (cp / (cp - R)).reshape(shape)
+        if 'cv' in keys:
+            out['cv'] = self._scale(cp - R, mw, shape, temperature=True)
+        if 'cp' in keys:
+            out['cp'] = self._scale(cp, mw, shape, temperature=True)
+        if 'e' in keys:
+            out['e'] = self._scale(h - R*T, mw, shape)
+        if 'h' in keys:
+            out['h'] = self._scale(h, mw, shape)
+        if 's' in keys:
+            out['s'] = self._scale(s, mw, shape, temperature=True)
+        if 'd' in keys:
+            # kmol/m3
+            d = p / (1000. * R * T)
+            pyro.units.volume(d, from_units='m3', exponent=-1, inplace=True)
+            pyro.units.matter(d, mw, from_units='kmol', inplace=True)
+            out['d'] = d.reshape(shape)
+        if 'mw' in keys:
+            mw = pyro.units.mass(mw, from_units='kg')
+            pyro.units.molar(mw, from_units='kmol', exponent=-1, inplace=True)
+            out['mw'] = mw.reshape(shape)
+        return out
+
+
+    def cp(self, X, T=None, p=None):
+        """Constant-pressure specific heat
+    cp = m.cp(X,T,p)
+T and p are optional, and will default to 'def_T' and 'def_p' 
+configuration parameters if they are left undefined.
+
+Accepts unit_temperature
+        unit_pressure
+Returns unit_energy / unit_matter / unit_temperature
+"""
+        return self._props(X, T, p, ['cp'])['cp']
+
+
+    def cv(self, X, T=None, p=None):
+        """Constant-volume specific heat
+    cv = m.cv(X,T,p)
+T and p are optional, and will default to 'def_T' and 'def_p' 
+configuration parameters if they are left undefined.
+
+Accepts unit_temperature
+        unit_pressure
+Returns unit_energy / unit_matter / unit_temperature
+"""
+        return self._props(X, T, p, ['cv'])['cv']
+
+
+    def d(self, X, T=None, p=None):
+        """Density
+    d = m.d(X,T,p)
+T and p are optional, and will default to 'def_T' and 'def_p' 
+configuration parameters if they are left undefined.
+
+Accepts unit_temperature
+        unit_pressure
+Returns unit_matter / unit_volume
+"""
+        return self._props(X, T, p, ['d'])['d']
+
+
+    def e(self, X, T=None, p=None):
+        """Internal energy
+    e = m.e(X,T,p)
+T and p are optional, and will default to 'def_T' and 'def_p' 
+configuration parameters if they are left undefined.
+
+Accepts unit_temperature
+        unit_pressure
+Returns unit_energy / unit_matter
+"""
+        return self._props(X, T, p, ['e'])['e']
+
+
+    def gam(self, X, T=None, p=None):
+        """Specific heat ratio
+    gam = m.gam(X,T,p)
+T and p are optional, and will default to 'def_T' and 'def_p' 
+configuration parameters if they are left undefined.
+
+Accepts unit_temperature
+        unit_pressure
+Returns dimensionless
+"""
+        return self._props(X, T, p, ['gam'])['gam']
+
+
+    def h(self, X, T=None, p=None):
+        """Enthalpy
+    h = m.h(X,T,p)
+T and p are optional, and will default to 'def_T' and 'def_p' 
+configuration parameters if they are left undefined.  The enthalpy 
+includes the enthalpies of formation of the species.
+
+Accepts unit_temperature
+        unit_pressure
+Returns unit_energy / unit_matter
+"""
+        return self._props(X, T, p, ['h'])['h']
+
+
+    def mw(self, X):
+        """Molecular weight
+    mw = m.mw(X)
+Returns the molecular weight of the mixture in each state.
+
+Returns unit_mass / unit_molar
+"""
+        return self._props(X, None, None, ['mw'])['mw']
+
+
+    def s(self, X, T=None, p=None):
+        """Entropy
+    s = m.s(X,T,p)
+T and p are optional, and will default to 'def_T' and 'def_p' 
+configuration parameters if they are left undefined.  The entropy 
+includes the entropy of mixing.
+
+Accepts unit_temperature
+        unit_pressure
+Returns unit_energy / unit_matter / unit_temperature
+"""
+        return self._props(X, T, p, ['s'])['s']
+
+
+    def props(self, X, T=None, p=None):
+        """Evaluate all of the mixture properties at once
+    P = m.props(X,T,p)
+T and p are optional, and will default to 'def_T' and 'def_p' 
+configuration parameters if they are left undefined.  P is a dictionary
+with the 'cp', 'cv', 'd', 'e', 'gam', 'h', 'mw', and 's' results.  This
+is faster than calling the methods separately, because the species are
+only evaluated once.
+
+Accepts unit_temperature
+        unit_pressure
+Returns the same units as the individual methods
+"""
+        return self._props(X, T, p, 
+                ['cp', 'cv', 'd', 'e', 'gam', 'h', 'mw', 's'])
+
+
+
+def _coef(data):
+    """Re-write a species' coefficients in the common form
+    Tlim, A = _coef(data)
+
+DATA is the data dictionary of an ig or ig2 species.  Tlim is a list of
+the temperature range limits in K.  A is a list with one row per
+range.  Each row is the list
+    [a0, a1, a2, a3, a4, a5, bh, bs]
+where a0..a5 are the specific heat coefficients of T**-2, T**0 .. T**4,
+and bh and bs are the enthalpy and entropy constants.  All coefficients
+are in kJ, kmol, and K.
+"""
+    A = []
+    if data['class'] == 'ig':
+        # Shomate; cp in J/mol/K with t=T/1000, and h in kJ/mol
+        for C in data['C']:
+            A.append([C[4]*1e6, C[0], C[1]*1e-3, C[2]*1e-6, C[3]*1e-9, 0.,
+                    C[5]*1e3, C[6] - C[0]*np.log(1000.)])
+    else:
+        # NASA; cp/R, h/R, and s/R
+        R = pyro.units.const_Ru
+        for C in data['C']:
+            A.append([0., R*C[0], R*C[1], R*C[2], R*C[3], R*C[4],
+                    R*C[5], R*C[6]])
+    return list(data['Tlim']), A
+
+
+
+def _stack(A):
+    """Build the coefficient arrays for a group of species
+    Acp, Ah, As = _stack(A)
+
+A is a list of the coefficient rows returned by _coef() for species
+with the same number of ranges, m.  Returns three arrays with shape
+(m, n, k) that multiply the basis functions of T in _eval() for the
+specific heat, enthalpy, and entropy.
+"""
+    A = np.array(A, dtype=float).transpose((1,0,2))
+    a0,a1,a2,a3,a4,a5,bh,bs = [A[:,:,kk] for kk in range(8)]
+    Acp = np.stack((a0, a1, a2, a3, a4, a5), axis=2)
+    Ah = np.stack((-a0, a1, a2/2., a3/3., a4/4., a5/5., bh), axis=2)
+    As = np.stack((-a0/2., a1, a2, a3/2., a4/3., a5/4., bs), axis=2)
+    return Acp, Ah, As
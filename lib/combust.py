@@ -0,0 +1,369 @@
+"""PYROMAT.COMBUST
+
+The combust module calculates the adiabatic flame temperature and the
+products of the combustion of ideal gas fuels and oxidizers.  A PMFlame
+object is built for a fuel and an oxidizer, and its solve() method
+finds the products and flame temperature over arrays of equivalence
+ratio, inlet temperature, and pressure.
+
+>>> import pyromat as pm
+>>> f = pm.combust.PMFlame('ig.CH4', {'ig.O2':1., 'ig.N2':3.76})
+>>> result = f.solve(phi=[0.6, 0.8, 1.0], T=300.)
+>>> result['T'].shape
+(3,)
+
+The products are either frozen at complete combustion or in chemical
+equilibrium (see the equil module).  The enthalpy balance of every
+case is solved at once by Newton iteration, so large parametric
+studies do not need to call T_h() one case at a time.
+"""
+
+import pyromat as pyro
+import pyromat.bank
+import pyromat.equil
+import numpy as np
+utility = pyro.utility
+
+
+
+# The products of complete combustion
+_MAJOR = ['ig.CO2', 'ig.H2O', 'ig.CO', 'ig.H2', 'ig.O2', 'ig.N2', 'ig.Ar', 'ig.He']
+# The dissociation products added for equilibrium
+_MINOR = ['ig.OH', 'ig.H', 'ig.O', 'ig.NO', 'ig.N']
+
+
+
+class PMFlame(object):
+    """Adiabatic combustion of a fuel and an oxidizer
+    f = PMFlame(fuel, oxidizer)
+        or
+    f = PMFlame(fuel, oxidizer, equilibrium=False, products=None, bank=None)
+
+FUEL and OXIDIZER are species id strings or dictionaries of the mole
+amounts of species keyed by id; e.g. {'ig.O2':1., 'ig.N2':3.76} for
+air.  The amounts do not need to add up to one.  Every species must
+belong to the ig or ig2 class, and its id must be a chemical formula
+(see pyromat.dat.formula()).
+
+When EQUILIBRIUM is False, the products are frozen at complete
+combustion.  Carbon is burned to CO, then hydrogen is burned to H2O,
+and the remaining oxygen burns CO to CO2.  Excess oxygen is left as O2,
+hydrogen that is not burned is left as H2, and nitrogen, argon, and
+helium are N2, Ar, and He.  Frozen products can only be found for fuels
+and oxidizers of C, H, O, N, Ar, and He, and mixtures so rich that
+carbon cannot be burned to CO (soot) are NaN.
+
+When EQUILIBRIUM is True, the products are in chemical equilibrium at
+the flame temperature and pressure (see pyromat.equil.PMEquilibrium).
+PRODUCTS is an optional list of the product species.  By default, the
+products are the complete combustion products with OH, H, O, NO, and N.
+
+The species' polynomials are evaluated through a PMBank.  An existing
+bank that includes all of the fuel, oxidizer, and product species may
+be passed with the BANK keyword.
+
+The product species are listed in f.species, and the amount of fuel
+per mole of oxidizer in a stoichiometric mixture is f.stoich.
+  solve()   flame temperature and products
+"""
+    def __init__(self, fuel, oxidizer, equilibrium=False, products=None,
+            bank=None):
+        self.fuel = _contents(fuel, 'fuel')
+        self.oxidizer = _contents(oxidizer, 'oxidizer')
+        self.equilibrium = bool(equilibrium)
+
+        # The atomic contents of one mole of fuel and of oxidizer
+        af = _atoms(self.fuel)
+        ao = _atoms(self.oxidizer)
+        elements = set(af.keys()) | set(ao.keys())
+        if products is None:
+            products = list(_MAJOR)
+            if self.equilibrium:
+                products += _MINOR
+            products = [sid for sid in products if sid in pyro.dat.data and
+                    set(pyro.dat.formula(sid)[0].keys()) <= elements]
+        elif not self.equilibrium:
+            utility.print_error('The products can only be set for equilibrium.')
+            raise utility.PMParamError('Invalid products.')
+        self.species = list(products)
+
+        for sid in self.species:
+            elements.update(pyro.dat.formula(sid)[0].keys())
+        self.elements = sorted(elements)
+        if not self.equilibrium:
+            extra = elements - set(['C', 'H', 'O', 'N', 'Ar', 'He'])
+            if extra:
+                utility.print_error('Frozen products can only be found for ' +
+                        'C, H, O, N, Ar, and He.  Found: ' + ', '.join(sorted(extra)))
+                raise utility.PMParamError('Unsupported elements.')
+
+        # Oxygen needed by a mole of fuel and supplied by a mole of
+        # oxidizer to burn C to CO2 and H to H2O
+        need = 2.*af.get('C',0.) + 0.5*af.get('H',0.) - af.get('O',0.)
+        supply = ao.get('O',0.) - 2.*ao.get('C',0.) - 0.5*ao.get('H',0.)
+        if need <= 0. or supply <= 0.:
+            utility.print_error('The fuel must need oxygen to burn, and the ' +
+                    'oxidizer must supply it.')
+            raise utility.PMParamError('Invalid fuel or oxidizer.')
+        self.stoich = supply / need
+
+        reactants = sorted(set(self.fuel.keys()) | set(self.oxidizer.keys()))
+        if bank is None:
+            bank = pyro.bank.PMBank(sorted(set(reactants) | set(self.species)))
+        self.bank = bank
+        self._rmix = pyro.bank.PMMixture(reactants, bank=bank)
+        self._pmix = pyro.bank.PMMixture(self.species, bank=bank)
+        if self.equilibrium:
+            self._eq = pyro.equil.PMEquilibrium(self.species, bank=bank)
+            self._eqindex = np.array([self.elements.index(el)
+                    for el in self._eq.elements], dtype=int)
+            missing = set(self.elements) - set(self._eq.elements)
+            if missing:
+                utility.print_error('None of the products contain ' +
+                        ', '.join(sorted(missing)) + '.')
+                raise utility.PMParamError('Invalid products.')
+
+        # The reactant fractions and element amounts of one mole of fuel
+        # and of oxidizer
+        self._xf = np.array([self.fuel.get(sid, 0.) for sid in reactants])
+        self._xo = np.array([self.oxidizer.get(sid, 0.) for sid in reactants])
+        self._af = np.array([af.get(el, 0.) for el in self.elements])
+        self._ao = np.array([ao.get(el, 0.) for el in self.elements])
+        # The temperature limits of the products in K
+        Tmin,Tmax = bank.Tlim()
+        Tmin = pyro.units.temperature_scale(Tmin, to_units='K')[self._pmix._index]
+        Tmax = pyro.units.temperature_scale(Tmax, to_units='K')[self._pmix._index]
+        self._Tlim = (np.max(Tmin), np.min(Tmax))
+
+
+    def __repr__(self):
+        return '<PMFlame of %s in %s>'%(
+                '+'.join(sorted(self.fuel.keys())),
+                '+'.join(sorted(self.oxidizer.keys())))
+
+
+    def _frozen(self, b):
+        """Complete combustion products
+    n = _frozen(b)
+
+B is the (N, L) element inventory.  Returns the (N, M) mole numbers of
+the products.  Cases with too little oxygen to burn carbon to CO are
+NaN.
+"""
+        def get(el):
+            if el in self.elements:
+                return b[:, self.elements.index(el)].copy()
+            return np.zeros((b.shape[0],), dtype=float)
+
+        C,H,O = get('C'), get('H'), get('O')
+        n = {}
+        n['ig.CO'] = np.minimum(C, O)
+        O -= n['ig.CO']
+        soot = C > n['ig.CO']
+        n['ig.H2O'] = np.minimum(0.5*H, O)
+        n['ig.H2'] = 0.5*H - n['ig.H2O']
+        O -= n['ig.H2O']
+        n['ig.CO2'] = np.minimum(n['ig.CO'], O)
+        n['ig.CO'] -= n['ig.CO2']
+        O -= n['ig.CO2']
+        n['ig.O2'] = 0.5*O
+        n['ig.N2'] = 0.5*get('N')
+        n['ig.Ar'] = get('Ar')
+        n['ig.He'] = get('He')
+
+        out = np.zeros((b.shape[0], len(self.species)), dtype=float)
+        for jj,sid in enumerate(self.species):
+            out[:,jj] = n[sid]
+        out[soot] = np.nan
+        return out
+
+
+    def solve(self, phi=1., T=None, p=None, tol=1e-6, maxiter=50):
+        """Calculate the adiabatic flame temperature and products
+    result = f.solve(phi, T, p)
+        or
+    result = f.solve(phi, T, p, tol=1e-6, maxiter=50)
+
+PHI is the equivalence ratio; the amount of fuel per mole of oxidizer
+is phi * f.stoich.  T is the temperature of the reactants, and p is the
+pressure.  T and p are optional, and will default to 'def_T' and
+'def_p' configuration parameters if they are left undefined.  The
+arguments are broadcast, and every case is solved at once.
+
+The flame temperature is found by Newton iteration on the enthalpy
+balance.  With frozen products, the derivative is the analytic
+specific heat of the products.  With equilibrium products, the first
+step uses the specific heat of the products, and later steps use the
+secant slope, which includes the effect of the shifting composition.
+The equilibrium at each step starts from the composition of the
+previous step.  The iteration stops when the temperature changes by
+less than TOL K.  Cases that do not converge in MAXITER iterations
+(or whose flame temperature is outside the limits of the products) are
+NaN, and a warning is printed.
+
+The result is a dictionary with the following keys:
+T
+    The adiabatic flame temperature.
+X
+    The mole fractions of the products with shape (..., M) in the
+    order of f.species.
+converged
+    A boolean array that is True where the iteration converged.
+p
+    The pressure.
+cp, cv, d, e, gam, h, mw, s
+    The properties of the products at the flame temperature (see
+    PMMixture).
+
+Accepts unit_temperature
+        unit_pressure
+"""
+        if T is None:
+            T = pyro.config['def_T']
+        if p is None:
+            p = pyro.config['def_p']
+        T = pyro.units.temperature_scale(np.asarray(T, dtype=float), to_units='K')
+        p = pyro.units.pressure(np.asarray(p, dtype=float), to_units='Pa')
+        phi = np.asarray(phi, dtype=float)
+        if (phi < 0.).any():
+            utility.print_error('The equivalence ratio must be non-negative.')
+            raise utility.PMParamError('Invalid equivalence ratio.')
+        shape = np.broadcast(phi, T, p).shape
+        phi = np.broadcast_to(phi, shape).flatten()
+        T = np.broadcast_to(T, shape).flatten()
+        p = np.broadcast_to(p, shape).flatten()
+        N = phi.size
+
+        # Reactants per mole of oxidizer
+        nf = phi * self.stoich
+        nr = nf[:, np.newaxis]*self._xf + self._xo
+        b = nf[:, np.newaxis]*self._af + self._ao
+        # Reactant enthalpy in kJ
+        total = np.sum(nr, axis=1)
+        Hr = self._rmix._eval(nr / total[:, np.newaxis], T, p, h=True)[1] * total
+        if not np.isfinite(Hr).all():
+            utility.print_error('The inlet temperature is outside of the ' +
+                    'limits of one or more of the reactants.')
+            raise utility.PMParamError('Temperature is out of range.')
+
+        Tmin,Tmax = self._Tlim
+        Tf = np.full((N,), min(max(2000., Tmin), Tmax))
+        converged = np.zeros((N,), dtype=bool)
+        index = self._pmix._index
+        if self.equilibrium:
+            beq = b[:, self._eqindex]
+            n = np.full((N, len(self.species)), np.nan)
+            # The previous temperature and enthalpy for the secant steps
+            Tlast = np.full((N,), np.nan)
+            Hlast = np.full((N,), np.nan)
+        else:
+            n = self._frozen(b)
+        I = np.nonzero(np.isfinite(n).all(axis=1) | self.equilibrium)[0]
+
+        for count in range(maxiter):
+            if self.equilibrium:
+                g0,h,cp = self._eq._species(Tf[I], p[I], cp=True)
+                nI,ok = self._eq._solve(beq[I], g0, 1e-9, 100, n=n[I])
+                nI[~ok] = np.nan
+                n[I] = nI
+                H = np.sum(nI*h, axis=1)
+                slope = np.sum(nI*cp, axis=1)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    secant = (H - Hlast[I]) / (Tf[I] - Tlast[I])
+                J = np.isfinite(secant) & (secant > 0.)
+                slope[J] = secant[J]
+                Tlast[I] = Tf[I]
+                Hlast[I] = H
+            else:
+                cp,h,_ = self.bank._eval(Tf[I], cp=True, h=True)
+                H = np.sum(n[I]*h[index].T, axis=1)
+                slope = np.sum(n[I]*cp[index].T, axis=1)
+            dT = (Hr[I] - H) / slope
+            Tnew = np.minimum(np.maximum(Tf[I] + dT, Tmin), Tmax)
+            # Stop cases that are stuck at a limit
+            stuck = (Tnew == Tf[I]) & (np.abs(dT) >= tol)
+            Tf[I] = Tnew
+            done = np.abs(dT) < tol
+            converged[I[done]] = True
+            I = I[~(done | stuck | ~np.isfinite(dT))]
+            if not I.size:
+                break
+
+        if self.equilibrium:
+            # Update the composition to the final temperature
+            I = np.nonzero(converged)[0]
+            g0 = self._eq._species(Tf[I], p[I])[0]
+            nI,ok = self._eq._solve(beq[I], g0, 1e-9, 100, n=n[I])
+            n[I] = nI
+            converged[I[~ok]] = False
+
+        if not converged.all():
+            utility.print_warning('The flame temperature failed to converge ' +
+                    'in %d of %d cases.  They are NaN.'%(np.sum(~converged), N))
+        X = n / np.sum(n, axis=1)[:, np.newaxis]
+        Tf[~converged] = np.nan
+        # Use a placeholder composition for the unconverged cases
+        Xp = np.where(converged[:, np.newaxis], X, 1.)
+        Tp = np.where(converged, Tf, Tmax)
+        out = self._pmix.props(Xp,
+                pyro.units.temperature_scale(Tp, from_units='K'),
+                pyro.units.pressure(p, from_units='Pa'))
+        for key in out:
+            out[key][~converged] = np.nan
+            out[key] = out[key].reshape(shape)
+        X[~converged] = np.nan
+        out['X'] = X.reshape(shape + (len(self.species),))
+        out['T'] = pyro.units.temperature_scale(Tf, from_units='K').reshape(shape)
+        out['p'] = pyro.units.pressure(p, from_units='Pa').reshape(shape)
+        out['converged'] = converged.reshape(shape)
+        return out
+
+
+
+def _contents(value, name):
+    """Parse a fuel or oxidizer argument
+    contents = _contents(value, name)
+
+VALUE is a species id or a dictionary of amounts keyed by species id.
+Returns a dictionary of mole fractions.  NAME is used in error
+messages.
+"""
+    if isinstance(value, str):
+        value = {value:1.}
+    value = dict(value)
+    total = float(sum(value.values()))
+    if not value or total <= 0. or min(value.values()) < 0.:
+        utility.print_error('The ' + name + ' amounts must be non-negative, ' +
+                'and at least one must be positive.')
+        raise utility.PMParamError('Invalid ' + name + '.')
+    for sid in value:
+        if sid not in pyro.dat.data:
+            utility.print_error('No substance named "' + str(sid) +
+                    '" was found in the loaded data.')
+            raise utility.PMParamError('Invalid substance name.')
+        if pyro.dat.data[sid].data['class'] not in pyro.bank.CLASSES:
+            utility.print_error('The ' + name + ' may only contain ig and ' +
+                    'ig2 species.  ' + sid + ' is ' +
+                    pyro.dat.data[sid].data['class'] + '.')
+            raise utility.PMParamError('Invalid substance class.')
+    return dict((sid, amount/total) for sid,amount in value.items())
+
+
+
+def _atoms(contents):
+    """Atomic contents of a mixture
+    atoms = _atoms(contents)
+
+CONTENTS is a dictionary of mole fractions keyed by species id.
+Returns a dictionary of the number of atoms of each element per mole.
+"""
+    atoms = {}
+    for sid,x in contents.items():
+        this,charge = pyro.dat.formula(sid)
+        if charge or not this:
+            utility.print_error('The atomic contents of ' + sid +
+                    ' could not be found from its id.')
+            raise utility.PMParamError('Invalid substance.')
+        for el,count in this.items():
+            atoms[el] = atoms.get(el, 0.) + x*count
+    return atoms
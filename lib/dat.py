@@ -11,6 +11,13 @@ Chris Martin (c) 2015,2017
 
 # load the root of the module
 import pyromat as pyro
+import hashlib
+import fnmatch
+import threading
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
 utility = pyro.utility
 reg = pyro.reg
 
@@ -24,7 +31,161 @@ reg = pyro.reg
 ##  The master data dictionary
 ##
 ######################################
-data = {}
+class PMLazyEntry(object):
+    """Placeholder for a species that has been found but not yet built
+
+When load() runs in lazy mode (see the 'dat_lazy' configuration 
+parameter), the data dictionary is populated with PMLazyEntry objects 
+instead of the species objects.  They only record the file from which
+the species should be loaded.  The first time the entry is retrieved 
+from the data dictionary, the file is parsed, the data class is built, 
+and the result replaces the entry in the dictionary.
+
+If the data have already been parsed (e.g. from the snapshot cache), 
+they may be kept with the entry so that only the class construction is
+deferred.
+
+The species is only built once, even when several threads retrieve it
+at the same time, so every copy of the data dictionary that holds the 
+entry ends up with the same species object.
+"""
+    def __init__(self, fromfile, data=None):
+        self.fromfile = fromfile
+        self.data = data
+        self._obj = None
+
+    def __repr__(self):
+        return 'PMLazyEntry(' + repr(self.fromfile) + ')'
+
+    def build(self):
+        """Load the file and return the species object
+    obj = entry.build()
+
+The object is built the first time build() is called, and later calls 
+return the same object.  The module lock is held while it is built.
+"""
+        with _lock:
+            if self._obj is None:
+                self._obj = self._build()
+        return self._obj
+
+    def _build(self):
+        """Construct the species object for build()"""
+        if self.data is None:
+            temp = utility.load_file(self.fromfile)
+        else:
+            temp = self.data
+        temp['fromfile'] = self.fromfile
+        if _store is not None:
+            _store_apply(temp, stats)
+        if temp['class'] in reg.registry:
+            dataclass = reg.registry[temp['class']]
+        else:
+            utility.print_error('Species ' + repr(temp['id']) + ' called for data class ' + repr(temp['class']) + '.  That class does not exist in the registry.  The data file is corrupt or out of date.')
+            raise utility.PMDataError()
+        tic = utility.time.time()
+        obj = dataclass(temp)
+        _stats_build(stats, temp['class'], utility.time.time() - tic)
+        return obj
+
+
+
+class PMDataDict(dict):
+    """The PYroMat data dictionary
+
+This behaves exactly like a dictionary of species objects keyed by their
+species ID strings.  The only difference is that values may be stored as
+PMLazyEntry placeholders.  Those are transparently built into species 
+objects the first time they are retrieved, so users never see them.
+
+To force all pending entries to be built, call the build() method.
+
+The copy() method returns another PMDataDict, which shares the pending
+entries.  Building an entry through either one builds it for both.  On
+the other hand, dict(data) and the other methods of the builtin dict 
+that read the values directly (e.g. dict.values(data)) skip the lazy 
+build, so they may return PMLazyEntry objects.
+"""
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if isinstance(value, PMLazyEntry):
+            value = value.build()
+            dict.__setitem__(self, key, value)
+        return value
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def pop(self, key, *default):
+        value = dict.pop(self, key, *default)
+        if isinstance(value, PMLazyEntry):
+            value = value.build()
+        return value
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def copy(self):
+        return PMDataDict(dict.items(self))
+
+    def pending(self):
+        """Return a list of the IDs that have not been built yet
+    ids = data.pending()
+"""
+        return [key for key,value in dict.items(self) if isinstance(value, PMLazyEntry)]
+
+    def build(self, key=None):
+        """Build entries that are still pending
+    data.build()
+        or
+    data.build('ig.N2')
+
+When called without an argument, all pending entries are built.
+"""
+        if key is None:
+            for key in self.pending():
+                self[key]
+        else:
+            self[key]
+
+
+data = PMDataDict()
+
+# The state of the files at the last load() or reload().  This is a
+# dictionary with the 'time' the load started, the species id found in each
+# of the 'files', and the (mtime, size) of each file in 'stat' if it is 
+# known.
+_record = {}
+# reload() holds this lock while it updates the data dictionary, and lazy
+# entries hold it while they are built
+_lock = threading.RLock()
+
+# Background loading (see start() and wait()).  Threads waiting for a 
+# species are notified through _loading each time one is added.
+_loading = threading.Condition()
+_loader = None
+_loader_error = None
+_pending = False
+
+# Timing and counts from the last load() (see pyromat.startup_report)
+stats = {}
+
+# The environment variable set for the process pool workers started by 
+# _parse_files().  PYroMat does not load its data when it is imported in
+# a process where this is set.
+_WORKER_FLAG = 'PYROMAT_DAT_WORKER'
+
+# The packed coefficient store mapped by the last load() (see updatestore())
+_store = None
+
+# The species index built by index().  Anything that changes the data 
+# dictionary resets it to None so it is rebuilt.
+_index = None
 
 
 
@@ -37,7 +198,7 @@ data = {}
 ##
 #############################
 def load(datasource=None, check=None, verbose=None):
-    """Import all *.hpd files in a directory
+    """Import all *.hpd and *.hpb files in a directory
     load()
         or
     load('/path/to/files/')
@@ -49,7 +210,7 @@ def load(datasource=None, check=None, verbose=None):
 By default, load() will use the values in pyro.config['dat_dir'] to 
 find the files to load.  Alternatively, if the first argument can be 
 an explicit path to a file or a directory in which to find files.  
-All *.hpd files will be opened.
+All *.hpd (JSON) and *.hpb (binary) files will be opened.
 
 The pyro.config parameters that affect load() are:
 'dat_verbose'
@@ -62,6 +223,36 @@ The pyro.config parameters that affect load() are:
     Overwrite existing data? (default=True)
 'dat_recursive'
     Recurse into subdirectories? (default=True)
+'dat_lazy'
+    Wait to build each species until it is first 
+    retrieved from the data dictionary? (default=False)
+    Each file still has to be opened to find its id
+    unless 'dat_manifest' is also True, so lazy mode
+    saves little without manifests.
+'dat_cache'
+    Path to a snapshot cache of the parsed data.  When 
+    it is empty, no cache is used. (default='')
+'dat_workers'
+    The number of workers to use when parsing files.
+    (default=1)
+'dat_pool'
+    Use a 'thread' or 'process' pool for the workers?
+    (default='thread')
+'dat_manifest'
+    Use the manifest files in the data directories
+    instead of walking them? (default=False)
+'dat_include', 'dat_exclude'
+    Patterns for the species ids to load or to skip 
+    when loading from the 'dat_dir' directories.
+    (default='')
+'dat_store'
+    Path to the packed coefficient store of the ig 
+    and ig2 species.  When it is empty, no store is 
+    used. (default='')
+
+Unless load() is run in check mode, the time spent in each phase and the
+number of files and species by directory and by class are recorded in
+the dat.stats dictionary.
 
 The separate optional keyword argument, 'check' prompts load() to run a 
 data test instead of actually loading data if it is True.
@@ -85,7 +276,7 @@ redundant
     A list of species IDs for which there are
     multiple files.  These are redundant.
 suppressed
-    A list of files with a .hpd~ extension. 
+    A list of files with a .hpd~ or .hpb~ extension. 
     These files are ignored at load and may have
     been renamed by the utility.red_repair()
     function to correct a redundant definition.
@@ -93,8 +284,15 @@ data
     The loaded data dictionary.
 """
 
+    global _loader_error
     lead = 'load-> '
-    root = False    # is this the root recursion in a check?
+
+    # Never run alongside a background load
+    _join()
+    # A load run by the caller supersedes a failed background load, so 
+    # wait() should not raise that old error again.
+    if _loader is not threading.current_thread():
+        _loader_error = None
 
     # fetch the configuration parameters
     if verbose == None:
@@ -102,15 +300,30 @@ data
     exist_fatal = pyro.config['dat_exist_fatal']
     exist_overwrite = pyro.config['dat_overwrite']
     recursive = pyro.config['dat_recursive']
+    lazy = pyro.config['dat_lazy']
+    cachefile = pyro.config['dat_cache']
+    workers = pyro.config['dat_workers']
+    pool = pyro.config['dat_pool']
+    use_manifest = pyro.config['dat_manifest']
+    storefile = pyro.config['dat_store']
+
+    st = {'time':0., 'listing':0., 'parsing':0., 'merging':0., 
+            'construction':0., 'files':0, 'species':0, 'lazy':lazy, 
+            'snapshot':False, 'manifest':0, 'excluded':0, 'store':0, 
+            'dirs':{}, 'classes':{}}
+    if not check:
+        global stats
+        stats = st
+    tic = utility.time.time()
+    # Only loads from the configured directories are recorded for reload()
+    record = not check and not datasource
+    start = tic
 
     # If the load function is called with check=True, then it's time to 
-    # make a few changes to the typical operation.  All recursive calls
-    # will be called with check equal to the dictionary containing the
-    # check results. 
+    # make a few changes to the typical operation.  The data are loaded
+    # into the check dictionary instead of the data dictionary.
     if check:
-        if not isinstance(check, dict):
-            check = {'changed':[], 'added':pyro.dat.data.keys(), 'removed':[], 'redundant':{}, 'suppressed':[], 'bad':[], 'data':{}}
-            root = True
+        check = {'changed':[], 'added':list(pyro.dat.data.keys()), 'removed':[], 'redundant':{}, 'suppressed':[], 'bad':[], 'data':PMDataDict()}
         loadto = check['data']
         CH = check['changed']
         ADD = check['added']
@@ -121,144 +334,252 @@ data
     else:
         # if this is real, load the data into the hotpy data dictionary
         loadto = data
+        SUP = []
 
 
-    # load is recursive. Unless load is called explicitly
-    # with a path to a file to load, it will expand directories and
-    # call itself with specific file names.  This arrangement prevents 
-    # multiple copies of the same algorithm and saves an extra helper 
-    # function.
+    # Loading happens in three phases.  First, the directory trees are 
+    # walked to build a sorted list of the files to load.  Second, the
+    # files are parsed (or recovered from the snapshot cache).  Finally,
+    # the parsed data are merged into the data dictionary in order.
     if datasource:
-        # Expand references to the users' home directories
-        # and environment variables
-        datasource = pyro.utility.os.path.expanduser(datasource)
-        datasource = pyro.utility.os.path.expandvars(datasource)
-        datasource=utility.os.path.abspath(datasource)
-        # if the data source is a directory
-        if utility.os.path.isdir(datasource):
-            # list the contents of the directory
-            contents = utility.os.listdir(datasource)
-            contents.sort()
-            out='In directory ' + repr(datasource) + ' found files: '
-            for this in contents:
-                this_long = utility.os.path.join(datasource,this)
-                # if recursion is enabled, and we come across a directory
-                if recursive and utility.os.path.isdir(this_long):
-                    #
-                    # recurse into sub-directories
-                    load(this_long,check=check,verbose=verbose)
-                # if this is a file and it has the .hpd extension
-                elif len(this)>4 and this[-4:]=='.hpd':
-                    #
-                    # recurse with the actual file name
-                    load(this_long,check=check,verbose=verbose)
-
-                    # assemble an output string
-                    if verbose:
-                        out += (this+', ')
-
-                elif check and len(this)>5 and this[-5:]=='.hpd~':
-                    #
-                    # note if there are suppressed files
-                    SUP.append(this_long)
-
-            if verbose:
-                utility.print_line('',lead)
-                utility.print_line(out,lead)
+        sources = [datasource]
+        # The snapshot cache only represents the configured directories
+        cachefile = None
+        # Explicit sources are never filtered
+        include = exclude = []
+    else:
+        sources = pyro.config['dat_dir']
+        include = _patterns(pyro.config['dat_include'])
+        exclude = _patterns(pyro.config['dat_exclude'])
+
+    #
+    # Phase 1: Discover the files
+    #
+    # A snapshot cache stands in for the first two phases as long as none 
+    # of the directories it walked and none of its files have changed.
+    snapshot = None
+    if cachefile and not check:
+        key = _cache_key(sources, include, exclude, recursive, use_manifest)
+        snapshot = _cache_read(cachefile, key)
+    # known is a dictionary of manifest entries keyed by file name
+    known = {}
+    # The files that were peeked for their ids
+    peeked = {}
+    # The species id found in each file
+    sids = {}
+    if snapshot is not None:
+        files = snapshot['files']
+        for name in ('dirs', 'manifest', 'excluded'):
+            st[name] = snapshot[name]
+    else:
+        # The directories that were walked
+        walked = []
+        files = []
+        for dd in sources:
+            nfiles = len(files)
+            nsup = len(SUP)
+            # Directories with a valid manifest do not need to be walked
+            if use_manifest and _manifest_read(dd, files, SUP, known,
+                    recursive=recursive, verbose=verbose):
+                st['manifest'] += 1
+            else:
+                _discover(dd, files, SUP, recursive=recursive, verbose=verbose,
+                        walked=walked)
+            st['dirs'][dd] = {'files':len(files)-nfiles, 
+                    'suppressed':len(SUP)-nsup}
+
+        # Apply the include and exclude patterns to the species ids.  The ids
+        # come from the manifest when there is one.  Otherwise, the files are
+        # peeked, so excluded files are never parsed.
+        if include or exclude:
+            todo = [fil for fil in files if fil not in known]
+            for fil,temp in zip(todo, 
+                    _parse_files(todo, peek=True, workers=workers, pool=pool)):
+                peeked[fil] = temp
+            keep = []
+            for fil in files:
+                if fil in known:
+                    sid = known[fil]['id']
+                elif peeked[fil] is not None:
+                    sid = peeked[fil]['id']
+                else:
+                    # Let bad files through so they are reported
+                    sid = None
+                sids[fil] = sid
+                if sid is None or _selected(sid, include, exclude):
+                    keep.append(fil)
+            st['excluded'] = len(files) - len(keep)
+            files = keep
+
+    st['files'] = len(files)
+    toc = utility.time.time()
+    st['listing'] = toc - tic
+
+    #
+    # Phase 2: Parse the files
+    #
+    # hashes is a dictionary of the manifest content hashes for files 
+    # that were never opened.  They are keyed by file name.
+    hashes = {}
+    # Were the files parsed completely (not only peeked)?
+    whole = True
+    # Check mode always goes to the files
+    if snapshot is not None:
+        parsed = snapshot['parsed']
+        st['snapshot'] = True
+    elif cachefile and not check:
+        # The state of the files is recorded before they are parsed, so
+        # a file that changes while it is parsed invalidates the cache.
+        watch = _cache_watch(walked, sources, files, use_manifest)
+        # Parse everything so the cache can be written
+        parsed = _parse_files(files, workers=workers, pool=pool)
+        _cache_write(cachefile, key, watch, {'files':files, 
+                'parsed':parsed, 'dirs':st['dirs'], 
+                'manifest':st['manifest'], 'excluded':st['excluded']},
+                verbose=verbose)
+    else:
+        peek = lazy and not check
+        whole = not peek
+        parsed = [None] * len(files)
+        todo = []
+        for index,fil in enumerate(files):
+            entry = known.get(fil)
+            # If only the id and class are needed, the manifest has them.
+            # In check mode, the manifest is only trusted if the file 
+            # still has the size and time recorded there.
+            if entry is not None and \
+                    (peek or (check and _manifest_match(fil, entry))):
+                if entry['id'] is not None:
+                    parsed[index] = {'id':entry['id'], 'class':entry['class']}
+                hashes[fil] = entry['hash']
+            elif peek and fil in peeked:
+                parsed[index] = peeked[fil]
+            else:
+                todo.append(index)
+        for index,temp in zip(todo, _parse_files(
+                [files[index] for index in todo], 
+                peek=peek, workers=workers, pool=pool)):
+            parsed[index] = temp
+
+    #
+    # Phase 3: Merge the results into the dictionary
+    #
+    tic = utility.time.time()
+    st['parsing'] = tic - toc
+
+    # Map the packed coefficient store
+    if not check:
+        global _store
+        _store = _store_read(storefile) if storefile else None
+
+    # The file each id was loaded from
+    origin = {}
+    for datasource,temp in zip(files,parsed):
+        # If the file could not be read
+        if temp is None:
+            if check:
+                BAD.append(datasource)
+            continue
 
-        # if the data source is a file
-        elif utility.os.path.isfile(datasource):
+        # Log the file source in the loaded data dictionary
+        temp['fromfile'] = datasource
+        # Swap in the coefficients from the store
+        if _store is not None and not check:
+            _store_apply(temp, st)
 
+        # test for existance
+        if temp['id'] in loadto:
+            # if this identifier already exists in the loaded data
 
-            # 
-            # Load the data!
-            # All recursive calls end here.
-            #
-            
-            # If running in check mode, test to see if the load fails
             if check:
-                try:
-                    temp = utility.load_file(datasource)
-                except:
-                    BAD.append(datasource)
-                    return
-            else:
-                try:
-                    temp = utility.load_file(datasource)
-                except:
-                    return
-
-            # Log the file source in the loaded data dictionary
-            temp['fromfile'] = datasource
-
-            # test for existance
-            if temp['id'] in loadto:
-                # if this identifier already exists in the loaded data
-
-                if check:
-                    # if run in check mode, we need to note the redundancy
-                    if temp['id'] in RED:
-                        # if the ID is already in the redundancy dictionary,
-                        # add this file to the respective list
-                        RED[temp['id']].append(datasource)
-                    else:
-                        # if this is the first time this file appears in the
-                        # redundancy dictionary, construct a new list
-                        RED[temp['id']] = [ loadto[temp['id']].data['fromfile'], datasource ]
-
-                if exist_fatal:
-                    # panic!
-                    utility.print_error('Found an existing entry for ' + repr(temp['id']))
-                    raise utility.HotPyDataError()
-
-                elif not exist_overwrite:
-                    # stop this recursion branch instead of overwriting the data
-                    if verbose:
-                        utility.print_warning('Found an existing entry for ' + repr(temp['id']) 
-                            + '. Ignoring.')
-                    return
-                elif verbose:
-                    # keep going, but warn the user that data is being overwritten
+                # if run in check mode, we need to note the redundancy
+                if temp['id'] in RED:
+                    # if the ID is already in the redundancy dictionary,
+                    # add this file to the respective list
+                    RED[temp['id']].append(datasource)
+                else:
+                    # if this is the first time this file appears in the
+                    # redundancy dictionary, construct a new list
+                    RED[temp['id']] = [ origin[temp['id']], datasource ]
+
+            if exist_fatal:
+                # panic!
+                utility.print_error('Found an existing entry for ' + repr(temp['id']))
+                raise utility.HotPyDataError()
+
+            elif not exist_overwrite:
+                # skip this file instead of overwriting the data
+                if verbose:
                     utility.print_warning('Found an existing entry for ' + repr(temp['id']) 
-                        + '. Overwriting.')
-
-            # only execute the rest of the data checks if the file isn't redundant
-            elif check:
-                # if run in check mode, it's time to do some extra work
-                # if the identifier is in the add list, remove it
-                if temp['id'] in ADD:
-                    ADD.remove(temp['id'])
-                # next, check to see if this identifier is in the hotpy data
-                if not (temp['id'] in pyro.dat.data):
-                    # this identifier seems to have been removed
-                    REM.append(temp['id'])
-                # finally check the data for identity
-                elif data[temp['id']].data != temp:
+                        + '. Ignoring.')
+                continue
+            elif verbose:
+                # keep going, but warn the user that data is being overwritten
+                utility.print_warning('Found an existing entry for ' + repr(temp['id']) 
+                    + '. Overwriting.')
+
+        # only execute the rest of the data checks if the file isn't redundant
+        elif check:
+            # if run in check mode, it's time to do some extra work
+            # if the identifier is in the add list, remove it
+            if temp['id'] in ADD:
+                ADD.remove(temp['id'])
+            # next, check to see if this identifier is in the hotpy data
+            if not (temp['id'] in pyro.dat.data):
+                # this identifier seems to have been removed
+                REM.append(temp['id'])
+            # finally check the data for identity
+            elif datasource in hashes:
+                # The file was not opened, so compare the content hashes
+                if not _hash_match(temp['id'], hashes[datasource]):
                     CH.append(temp['id'])
-
-
-            # look for the data class in the registry
-            if temp['class'] in reg.registry:
-                dataclass = reg.registry[temp['class']]
+            elif _data_differ(data[temp['id']].data, temp):
+                CH.append(temp['id'])
+
+
+        # look for the data class in the registry
+        if temp['class'] not in reg.registry:
+            utility.print_error('Species ' + repr(temp['id']) + ' called for data class ' + repr(temp['class']) + '.  That class does not exist in the registry.  The data file is corrupt or out of date.')
+            raise utility.PMDataError()
+        # write the data
+        origin[temp['id']] = datasource
+        if lazy and not check:
+            # Wait to build the class until the species is requested
+            # If the data were already parsed, keep them with the entry
+            if not whole:
+                loadto[temp['id']] = PMLazyEntry(datasource)
             else:
-                utility.print_error('Species ' + repr(temp['id']) + ' called for data class ' + repr(temp['class']) + '.  That class does not exist in the registry.  The data file is corrupt or out of date.')
-                raise utility.PMDataError()
-            # write the data
-            loadto[temp['id']] = dataclass(temp)
-
+                loadto[temp['id']] = PMLazyEntry(datasource, temp)
+        elif datasource in hashes:
+            # In check mode, files that were never opened are only loaded
+            # if their data are retrieved.
+            loadto[temp['id']] = PMLazyEntry(datasource)
         else:
-            # does not exist
-            utility.print_warning('Data file or directory does not exist: ' + repr(datasource))
-
-    # if called without an argument, use the config directories
-    else:        
+            # Retrieving the class will load it if the registry is lazy
+            toc = utility.time.time()
+            loadto[temp['id']] = reg.registry[temp['class']](temp)
+            _stats_build(st, temp['class'], utility.time.time() - toc)
+        _stats_class(st, temp['class'])['count'] += 1
+        # Wake up anyone waiting for this species
+        if _pending and not check:
+            with _loading:
+                _loading.notify_all()
+    st['species'] = len(loadto)
+    toc = utility.time.time()
+    st['merging'] = toc - tic
+    st['time'] = st['listing'] + st['parsing'] + st['merging']
+
+    if record:
+        for fil,temp in zip(files,parsed):
+            sids[fil] = temp['id'] if temp is not None else None
+        global _record
+        _record = {'time':start, 'files':sids, 'stat':{}}
+    if not check:
+        global _index
+        _index = None
 
-        for dd in pyro.config['dat_dir']:
-            load(dd, check=check, verbose=verbose)
 
-
-    if check and root:
-        # if in check mode and this is the root of the recursion tree...
+    if check:
         if verbose:
             # if running verbosely, print a summary of the findings
             utility.print_line( '' , lead)
@@ -313,9 +634,912 @@ data
 
 
 
+def _patterns(value):
+    """Split a 'dat_include' or 'dat_exclude' string into a list of patterns"""
+    return value.replace(',',' ').split()
+
+
+
+
+def _selected(sid, include, exclude):
+    """Test a species id against the include and exclude patterns
+    selected = _selected(sid, include, exclude)
+
+If there are include patterns, the id must match at least one of them.
+The id must not match any of the exclude patterns.  Matching is case 
+sensitive and follows the rules of the fnmatch module.
+"""
+    if include:
+        for pattern in include:
+            if fnmatch.fnmatchcase(sid, pattern):
+                break
+        else:
+            return False
+    for pattern in exclude:
+        if fnmatch.fnmatchcase(sid, pattern):
+            return False
+    return True
+
+
+
+
+def _stats_class(st, dataclass):
+    """Return the per-class entry of a load() stats dictionary"""
+    if dataclass not in st['classes']:
+        st['classes'][dataclass] = {'count':0, 'built':0, 'time':0.}
+    return st['classes'][dataclass]
+
+
+
+
+def _stats_build(st, dataclass, elapsed):
+    """Record the construction of a species in a load() stats dictionary
+    _stats_build(st, dataclass, elapsed)
+
+Lazy entries are recorded when they are finally built, so the 
+construction time in stats grows as species are used.
+"""
+    if not st:
+        return
+    entry = _stats_class(st, dataclass)
+    entry['built'] += 1
+    entry['time'] += elapsed
+    st['construction'] += elapsed
+
+
+
+
+def _discover(datasource, files, suppressed, recursive=True, verbose=False,
+        walked=None):
+    """Build a list of the data files found in a directory tree
+    _discover(datasource, files, suppressed)
+
+This is the first phase of load().  The path, datasource, may be a file
+or a directory.  Data files are appended to the files list, and 
+suppressed files (with the .hpd~ or .hpb~ extension) are appended to the 
+suppressed list.  Directories are walked in sorted order, so the order
+in which files appear in the list is deterministic.  If walked is a 
+list, the path of each directory is appended to it.
+"""
+    lead = 'load-> '
+    # Expand references to the users' home directories
+    # and environment variables
+    datasource = utility.os.path.expanduser(datasource)
+    datasource = utility.os.path.expandvars(datasource)
+    datasource = utility.os.path.abspath(datasource)
+
+    # if the data source is a directory
+    if utility.os.path.isdir(datasource):
+        if walked is not None:
+            walked.append(datasource)
+        # list the contents of the directory
+        contents = utility.os.listdir(datasource)
+        contents.sort()
+        out='In directory ' + repr(datasource) + ' found files: '
+        for this in contents:
+            this_long = utility.os.path.join(datasource,this)
+            # if recursion is enabled, and we come across a directory
+            if recursive and utility.os.path.isdir(this_long):
+                _discover(this_long, files, suppressed, 
+                        recursive=recursive, verbose=verbose, walked=walked)
+            # if this is a file and it has the .hpd or .hpb extension
+            elif len(this)>4 and this[-4:] in ('.hpd', '.hpb'):
+                files.append(this_long)
+                # assemble an output string
+                if verbose:
+                    out += (this+', ')
+            elif len(this)>5 and this[-5:] in ('.hpd~', '.hpb~'):
+                # note if there are suppressed files
+                suppressed.append(this_long)
+
+        if verbose:
+            utility.print_line('',lead)
+            utility.print_line(out,lead)
+
+    # if the data source is a file
+    elif utility.os.path.isfile(datasource):
+        files.append(datasource)
+
+    else:
+        # does not exist
+        utility.print_warning('Data file or directory does not exist: ' + repr(datasource))
+
+
+
+
+def _parse_file(fil, peek=False):
+    """Parse a single data file for load()
+    temp = _parse_file(fil)
+
+Returns the data dictionary or None if the file could not be loaded.  
+When peek is True, only the 'id' and 'class' entries are read.
+"""
+    if peek:
+        try:
+            return utility.peek_file(fil)
+        except:
+            pass
+    try:
+        return utility.load_file(fil)
+    except:
+        return None
+
+
+
+
+def _parse_peek(fil):
+    """Parse only the id and class of a data file (see _parse_file)"""
+    return _parse_file(fil, peek=True)
+
+
+
+
+def _parse_files(files, peek=False, workers=1, pool='thread'):
+    """Parse a list of data files for load()
+    parsed = _parse_files(files)
+
+Returns a list of data dictionaries in the same order as the files list.
+Files that could not be loaded are represented by None.  When workers is
+greater than 1, the files are parsed by a pool of threads or processes, 
+depending on whether pool is 'thread' or 'process'.
+"""
+    if pool not in ('thread', 'process'):
+        utility.print_error('The dat_pool parameter must be "thread" or "process". Found: ' + repr(pool))
+        raise utility.PMParamError('Unrecognized pool type')
+
+    fn = _parse_peek if peek else _parse_file
+    if workers <= 1 or len(files) < 2:
+        return [fn(fil) for fil in files]
+    # multiprocessing is only imported when a pool is needed
+    import multiprocessing
+    import multiprocessing.pool
+    # Never let a worker process start a pool of its own
+    if multiprocessing.current_process().name != 'MainProcess':
+        return [fn(fil) for fil in files]
+
+    if pool == 'process':
+        # Where fork is not available, the workers import PYroMat again.
+        # The flag in their environment keeps them from loading the data
+        # before they parse anything (see pyromat/__init__.py).
+        former = utility.os.environ.get(_WORKER_FLAG)
+        utility.os.environ[_WORKER_FLAG] = '1'
+        try:
+            P = utility._mp_context().Pool(workers)
+        finally:
+            if former is None:
+                del utility.os.environ[_WORKER_FLAG]
+            else:
+                utility.os.environ[_WORKER_FLAG] = former
+    else:
+        P = multiprocessing.pool.ThreadPool(workers)
+    try:
+        # Large chunks keep the dispatch overhead down
+        chunksize = max(1, len(files) // (4*workers))
+        return P.map(fn, files, chunksize)
+    finally:
+        P.close()
+        P.join()
+
+
+
+
+def _cache_key(sources, include, exclude, recursive, manifest):
+    """Construct the key that identifies a snapshot cache
+    key = _cache_key(sources, include, exclude, recursive, manifest)
+
+The key includes the PYroMat version and the configuration parameters
+that determine which files are loaded.  Any change to these will cause
+the snapshot to be discarded.  The files themselves are checked by 
+_cache_read().
+"""
+    return [pyro.__version__, list(sources), list(include), list(exclude),
+            bool(recursive), bool(manifest)]
+
+
+
+
+def _cache_state(path):
+    """Return the modification time and size of a file or directory
+
+If the path does not exist, both are None.
+"""
+    try:
+        st = utility.os.stat(path)
+        return (st.st_mtime, st.st_size)
+    except:
+        return (None, None)
+
+
+
+
+def _cache_watch(walked, sources, files, manifest):
+    """List the paths that a snapshot cache depends on
+    watch = _cache_watch(walked, sources, files, manifest)
+
+Returns a list of (path, mtime, size) for every directory that was 
+walked, every data source that was not found, every manifest that was
+used, and every data file.  Adding, removing, or renaming a file 
+changes the time of its directory, and editing a file changes its own
+time and size, so the snapshot is valid as long as none of these 
+change.  When the directories have not changed, checking them is much 
+faster than walking them again.
+"""
+    paths = list(walked)
+    for dd in sources:
+        dd = utility.os.path.abspath(utility.os.path.expandvars(
+                utility.os.path.expanduser(dd)))
+        if manifest and utility.os.path.isfile(
+                utility.os.path.join(dd, MANIFEST)):
+            paths.append(utility.os.path.join(dd, MANIFEST))
+        elif not utility.os.path.exists(dd):
+            paths.append(dd)
+    return [(path,) + _cache_state(path) for path in paths + list(files)]
+
+
+
+
+def _cache_read(cachefile, key):
+    """Read the snapshot cache
+    snapshot = _cache_read(cachefile, key)
+
+Returns the dictionary written by _cache_write(), with the parsed data 
+in the 'parsed' list.  If the cache does not exist, cannot be read, its
+key does not match, or any of the paths it depends on have changed, 
+the snapshot is None.  Like the .hpb files, the float arrays are stored
+in a single block, and they are returned as views of it.
+"""
+    cachefile = utility.os.path.abspath(utility.os.path.expandvars(
+            utility.os.path.expanduser(cachefile)))
+    if not utility.os.path.isfile(cachefile):
+        return None
+    try:
+        with open(cachefile, 'rb') as ff:
+            # The key and the paths are stored first so the snapshot is 
+            # not unpickled unless it will be used.
+            if pickle.load(ff) != key:
+                return None
+            for path,mtime,size in pickle.load(ff):
+                if _cache_state(path) != (mtime, size):
+                    return None
+            snapshot = pickle.load(ff)
+    except:
+        return None
+    block = snapshot.pop('block')
+    for path,begin,end,shape in snapshot.pop('arrays'):
+        parent = snapshot['parsed']
+        for key in path[:-1]:
+            parent = parent[key]
+        parent[path[-1]] = block[begin:end].reshape(shape)
+    return snapshot
+
+
+
+
+def _cache_write(cachefile, key, watch, snapshot, verbose=False):
+    """Write the snapshot cache
+    _cache_write(cachefile, key, watch, snapshot)
+
+WATCH is the list of paths from _cache_watch(), and SNAPSHOT is a 
+dictionary with the list of 'files', the list of their 'parsed' data, 
+and the statistics to restore.  The float arrays in the parsed data are
+packed into one block the same way as in the .hpb files (see 
+utility.save_file()), since unpickling one array is much faster than 
+unpickling thousands of small lists.
+
+The snapshot is written to a temporary file first, and then it is moved
+into place so that other processes never see a partially written cache.
+Failure to write the cache is never fatal.
+"""
+    cachefile = utility.os.path.abspath(utility.os.path.expandvars(
+            utility.os.path.expanduser(cachefile)))
+    temp = cachefile + '.' + str(utility.os.getpid())
+    try:
+        arrays = []
+        block = []
+        snapshot = dict(snapshot)
+        snapshot['parsed'] = utility._hpb_pack(snapshot['parsed'], arrays, 
+                [], block)
+        snapshot['arrays'] = arrays
+        snapshot['block'] = utility.np.array(block, dtype='<f8')
+        cachedir = utility.os.path.dirname(cachefile)
+        if not utility.os.path.isdir(cachedir):
+            utility.os.makedirs(cachedir)
+        with open(temp, 'wb') as ff:
+            pickle.dump(key, ff, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(watch, ff, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(snapshot, ff, pickle.HIGHEST_PROTOCOL)
+        # Windows will not rename over an existing file
+        if utility.os.path.isfile(cachefile):
+            utility.os.remove(cachefile)
+        utility.os.rename(temp, cachefile)
+    except:
+        if verbose:
+            utility.print_warning('Failed to write the data snapshot cache: ' + repr(cachefile))
+        try:
+            utility.os.remove(temp)
+        except:
+            pass
+
+
+
+
+def _store_read(storefile):
+    """Map the packed coefficient store
+    store = _store_read(storefile)
+
+Returns the dictionary written by updatestore(), where the coefficient
+arrays are read-only views of the memory-mapped file.  If the store does
+not exist or cannot be read, the store is None.
+"""
+    storefile = utility.os.path.abspath(utility.os.path.expandvars(
+            utility.os.path.expanduser(storefile)))
+    if not utility.os.path.isfile(storefile):
+        return None
+    try:
+        with open(storefile, 'rb') as ff:
+            store = utility._hpb_read(ff, mmap=True)
+        if store.get('store') != 1:
+            return None
+        return store
+    except:
+        return None
+
+
+
+
+def _store_apply(temp, st):
+    """Replace a species' coefficients with views of the store
+    _store_apply(temp, st)
+
+TEMP is the parsed data dictionary of a species, including its 
+'fromfile'.  If the store has an entry for the file with the same id, 
+modification time, and size, the 'C' and 'Tlim' lists are replaced by 
+the arrays from the store, and the 'store' count in the stats 
+dictionary, st, is incremented.  Data that were only peeked are left 
+alone; they are handled when the species is built.
+"""
+    if 'C' not in temp:
+        return
+    entry = _store['files'].get(temp['fromfile'])
+    if entry is None or entry['id'] != temp['id']:
+        return
+    try:
+        fs = utility.os.stat(temp['fromfile'])
+    except:
+        return
+    if fs.st_mtime != entry['mtime'] or fs.st_size != entry['size']:
+        return
+    temp['C'] = entry['C']
+    temp['Tlim'] = entry['Tlim']
+    st['store'] = st.get('store', 0) + 1
+
+
+
+
+
+def formula(sid):
+    """Parse the chemical formula in a species id
+    contents, charge = formula(sid)
+
+The formula is the part of the id after the collection (e.g. 'CO2' in 
+'ig.CO2').  Contents is a dictionary with an integer count for each 
+element, and charge is the integer charge indicated by trailing '+' or 
+'-' characters.  The electron, 'ig.e', has no contents and a charge of 
+-1.  Ids that are not chemical formulas (like the 'ig.air' mixture) 
+return an empty dictionary.
+"""
+    text = sid.split('.')[-1]
+    if text == 'e':
+        return {}, -1
+    charge = text.count('+') - text.count('-')
+    text = text.rstrip('+-')
+    contents = {}
+    if not utility.re.match('^([A-Z][a-z]*[0-9]*)+$', text):
+        return contents, charge
+    for key,value in utility.re.findall('([A-Z][a-z]*)([0-9]*)', text):
+        contents[str(key)] = contents.get(str(key), 0) + (int(value) if value else 1)
+    return contents, charge
+
+
+
+
+def index():
+    """Return the species index
+    idx = index()
+
+The index is built the first time it is requested after the data are 
+loaded or changed.  It is a dictionary with two keys:
+species
+    A dictionary keyed by species id.  Each entry is a dictionary with 
+    the species 'class', its atomic 'contents' (see formula()), its 
+    'charge', its temperature limits 'Tlim' in K, and its molecular 
+    weight 'mw' in kg/kmol.  The contents of ideal gas mixtures are the 
+    average numbers of each atom per molecule, and their limits are the
+    intersection of the limits of their constituents.  Values that are 
+    not available are None.
+elements
+    An inverted index keyed by element.  Each entry is a dictionary with
+    the count of that element keyed by the ids of the species that 
+    contain it.
+
+In lazy mode, the data files are parsed to build the index, but the
+species are not built.
+"""
+    global _index
+    # Do not index a partial load
+    wait()
+    with _lock:
+        if _index is not None:
+            return _index
+        species = {}
+        mixtures = []
+        for sid in list(data.keys()):
+            temp = dict.get(data, sid)
+            if isinstance(temp, PMLazyEntry):
+                temp = temp.data if temp.data is not None \
+                        else utility.load_file(temp.fromfile)
+            else:
+                temp = temp.data
+            if temp['class'] == 'igmix':
+                mixtures.append((sid, temp))
+                continue
+            contents, charge = formula(sid)
+            entry = {'class':temp['class'], 'contents':contents, 
+                    'charge':charge, 'Tlim':None, 'mw':temp.get('mw')}
+            if 'Tlim' in temp:
+                entry['Tlim'] = (float(temp['Tlim'][0]), float(temp['Tlim'][-1]))
+            species[sid] = entry
+
+        # Mixtures are built from the entries of their constituents
+        for sid,temp in mixtures:
+            entry = {'class':temp['class'], 'contents':{}, 'charge':0, 
+                    'Tlim':None, 'mw':None}
+            parts = [species.get(ss) for ss in temp['contents']]
+            if None not in parts and None not in [part['mw'] for part in parts]:
+                # Convert the composition to mole fractions
+                N = 0.
+                mw = 0.
+                X = {}
+                for ss,part in zip(temp['contents'], parts):
+                    X[ss] = temp['contents'][ss]
+                    if temp.get('bymass'):
+                        X[ss] /= part['mw']
+                    N += X[ss]
+                Tmin = float('-inf')
+                Tmax = float('inf')
+                for ss,part in zip(temp['contents'], parts):
+                    x = X[ss] / N
+                    mw += x * part['mw']
+                    for key,value in part['contents'].items():
+                        entry['contents'][key] = \
+                                entry['contents'].get(key, 0.) + x*value
+                    if part['Tlim'] is not None:
+                        Tmin = max(Tmin, part['Tlim'][0])
+                        Tmax = min(Tmax, part['Tlim'][1])
+                entry['mw'] = mw
+                entry['Tlim'] = (Tmin, Tmax)
+            species[sid] = entry
+
+        elements = {}
+        for sid,entry in species.items():
+            for key,value in entry['contents'].items():
+                elements.setdefault(key, {})[sid] = value
+        _index = {'species':species, 'elements':elements}
+        return _index
+
+
+
+
+
+MANIFEST = 'manifest.json'
+
+def _data_hash(data):
+    """Calculate the content hash of a species data dictionary
+    hash = _data_hash(data)
+
+The hash is calculated from the canonical JSON representation of the
+data with the 'fromfile' entry removed, so it does not depend on the
+formatting of the file or on where the file was found.
+"""
+    temp = dict(data)
+    temp.pop('fromfile', None)
+    text = utility.json.dumps(temp, sort_keys=True, 
+            default=utility.json_default)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+
+
+def _data_differ(a, b):
+    """Test whether two species data dictionaries are different
+    differ = _data_differ(a, b)
+
+Data read from binary files contain numpy arrays, which cannot be 
+compared directly, so the content hashes are compared instead.
+"""
+    try:
+        return bool(a != b)
+    except ValueError:
+        return _data_hash(a) != _data_hash(b)
+
+
+
+
+def _hash_match(key, filehash):
+    """Test whether a species in memory matches a content hash
+    match = _hash_match(key, filehash)
+
+Entries that are still waiting to be built have not been changed, so 
+they always match.
+"""
+    value = dict.__getitem__(data, key)
+    if isinstance(value, PMLazyEntry) and value.data is None:
+        return True
+    return _data_hash(value.data) == filehash
+
+
+
+
+def _manifest_read(datasource, files, suppressed, known, 
+        recursive=True, verbose=False):
+    """Read the manifest of a data directory for load()
+    found = _manifest_read(datasource, files, suppressed, known)
+
+This is the alternative to _discover() when the 'dat_manifest' parameter
+is True.  If datasource is a directory with a valid manifest, the files 
+it lists are appended to the files list, suppressed files are appended 
+to the suppressed list, and the manifest entry for each file is added 
+to the known dictionary.  Returns True if the manifest was used and 
+False if the directory still needs to be walked.
+
+Manifests written with a different 'dat_recursive' setting are ignored.
+"""
+    lead = 'load-> '
+    datasource = utility.os.path.expanduser(datasource)
+    datasource = utility.os.path.expandvars(datasource)
+    datasource = utility.os.path.abspath(datasource)
+    try:
+        with open(utility.os.path.join(datasource, MANIFEST), 'r') as ff:
+            manifest = utility.json.load(ff)
+        if manifest['recursive'] != recursive:
+            return False
+        entries = manifest['files']
+        sup = manifest['suppressed']
+    except:
+        return False
+
+    for entry in entries:
+        fil = utility.os.path.join(datasource, entry['file'])
+        files.append(fil)
+        known[fil] = entry
+    for fil in sup:
+        suppressed.append(utility.os.path.join(datasource, fil))
+
+    if verbose:
+        utility.print_line('',lead)
+        utility.print_line('In directory ' + repr(datasource) + ' found a manifest of ' + str(len(entries)) + ' files.', lead)
+    return True
+
+
+
+
+def _manifest_match(fil, entry):
+    """Test whether a file still matches its manifest entry
+    match = _manifest_match(fil, entry)
+
+The file matches if its size and modification time have not changed.
+"""
+    try:
+        st = utility.os.stat(fil)
+    except:
+        return False
+    return st.st_mtime == entry['mtime'] and st.st_size == entry['size']
+
+
+
+
+
+
+
+
+
+
 def clear():
     """Empty the data dictionary."""
-    pyro.dat.data = {}
+    global _record, _index, _loader_error
+    _join()
+    _loader_error = None
+    pyro.dat.data = PMDataDict()
+    _record = {}
+    _index = None
+
+
+
+
+
+
+
+
+
+
+def start(verbose=None):
+    """Load the data in a background thread
+    start()
+
+The load() function is run on a separate thread, so start() returns 
+immediately.  Species are available in the data dictionary as soon as
+they are added, and get() will wait for a species that has not been 
+added yet.  Use wait() to wait for a species or for the load to finish.
+When the 'dat_thread' configuration parameter is True, PYroMat uses 
+start() instead of load() when it is imported.
+
+Code that inspects the data dictionary directly (instead of through 
+get()) should call wait() first, since the dictionary is incomplete 
+until the load is finished.
+"""
+    global _loader, _loader_error, _pending
+    _join()
+    _loader_error = None
+    _pending = True
+    _loader = threading.Thread(target=_background, args=(verbose,), 
+            name='pyromat.dat.load')
+    # Never keep the interpreter alive just to finish loading
+    _loader.daemon = True
+    _loader.start()
+
+
+
+
+def _background(verbose):
+    """The target of the start() thread"""
+    global _loader_error, _pending
+    try:
+        with _lock:
+            load(verbose=verbose)
+    except:
+        _loader_error = utility.sys.exc_info()[1]
+    finally:
+        with _loading:
+            _pending = False
+            _loading.notify_all()
+
+
+
+
+def _join():
+    """Wait for a background load to finish unless this is the loader"""
+    loader = _loader
+    if loader is not None and loader is not threading.current_thread():
+        loader.join()
+
+
+
+
+def loading():
+    """Test whether a background load is in progress
+    status = loading()
+"""
+    return _pending
+
+
+
+
+def wait(name=None, timeout=None):
+    """Wait for a background load
+    wait()
+        or
+    wait('ig.N2')
+        or
+    wait(timeout=1.)
+
+When called without a species name, wait() blocks until the background
+load started by start() has finished.  When a name is given, it only 
+waits until that species has been added to the data dictionary (or 
+until the load finishes without finding it).  If there is no load in 
+progress, wait() returns immediately.  
+
+Returns True unless the timeout (in seconds) expired first.  If the 
+background load failed, its error is raised.
+"""
+    loader = _loader
+    if loader is not None and loader is not threading.current_thread():
+        if timeout is not None:
+            stop = utility.time.time() + timeout
+        with _loading:
+            while _pending:
+                if name is not None and name in data:
+                    break
+                if timeout is None:
+                    _loading.wait()
+                else:
+                    remaining = stop - utility.time.time()
+                    if remaining <= 0:
+                        return False
+                    _loading.wait(remaining)
+    if _loader_error is not None:
+        utility.print_error('The background data load failed.')
+        raise _loader_error
+    return True
+
+
+
+
+
+
+
+
+
+
+def reload(verbose=None):
+    """Bring the data dictionary up to date with the data files
+    summary = reload()
+
+Unlike clear() followed by load(), reload() only parses and builds the
+species whose files have changed since the last load() or reload().  
+Files are considered changed if they are new, if their size or time of
+last modification have changed, or (the first time reload() is called 
+after load()) if they were modified after the load started.  Changed 
+files whose content hash still matches the data in memory are left 
+alone.  Species whose files have been removed are dropped.
+
+The new species objects are completely built before any of them are 
+written to the data dictionary, so other threads that are evaluating
+properties never see a partially built species.  If an error occurs, 
+the data dictionary is left untouched.
+
+Entries that were created by new() or loaded explicitly from files 
+outside of the 'dat_dir' directories are left alone.  The same 
+configuration parameters that affect load() apply here, except that 
+the manifest and the snapshot cache are never used, since reload() 
+has to look at the files themselves.
+
+Returns a dictionary with lists of the species ids that were 'added',
+'changed', and 'removed'.
+"""
+    lead = 'reload-> '
+    if verbose is None:
+        verbose = pyro.config['dat_verbose']
+    exist_fatal = pyro.config['dat_exist_fatal']
+    exist_overwrite = pyro.config['dat_overwrite']
+    recursive = pyro.config['dat_recursive']
+    lazy = pyro.config['dat_lazy']
+    workers = pyro.config['dat_workers']
+    pool = pyro.config['dat_pool']
+    include = _patterns(pyro.config['dat_include'])
+    exclude = _patterns(pyro.config['dat_exclude'])
+
+    summary = {'added':[], 'changed':[], 'removed':[]}
+
+    with _lock:
+        # If there is nothing to compare against, this is a load()
+        if not _record:
+            before = set(data.keys())
+            load(verbose=verbose)
+            summary['added'] = [sid for sid in data.keys() if sid not in before]
+            return summary
+
+        start = utility.time.time()
+        prev = _record['files']
+        prevstat = _record['stat']
+
+        # Find the files and the ones that have changed
+        files = []
+        suppressed = []
+        for dd in pyro.config['dat_dir']:
+            _discover(dd, files, suppressed, recursive=recursive)
+        stat = {}
+        touched = []
+        for fil in files:
+            try:
+                ss = utility.os.stat(fil)
+                stat[fil] = (ss.st_mtime, ss.st_size)
+            except:
+                stat[fil] = None
+            if fil not in prev:
+                touched.append(fil)
+            elif fil in prevstat:
+                if stat[fil] != prevstat[fil]:
+                    touched.append(fil)
+            elif stat[fil] is None or stat[fil][0] >= _record['time']:
+                touched.append(fil)
+
+        parsed = dict(zip(touched, 
+                _parse_files(touched, peek=lazy, workers=workers, pool=pool)))
+
+        sids = {}
+        for fil in files:
+            if fil in parsed:
+                temp = parsed[fil]
+                sids[fil] = temp['id'] if temp is not None else None
+            else:
+                sids[fil] = prev[fil]
+
+        # The file that currently provides each species
+        current = {}
+        for sid,value in dict.items(data):
+            if isinstance(value, PMLazyEntry):
+                current[sid] = value.fromfile
+            else:
+                current[sid] = value.data.get('fromfile')
+        managed = set(prev)
+        managed.update(files)
+
+        # Apply the same precedence rules as load()
+        origin = {}
+        for fil in files:
+            sid = sids[fil]
+            if sid is None:
+                if verbose:
+                    utility.print_warning('Failed to load file: ' + repr(fil))
+                continue
+            elif not _selected(sid, include, exclude):
+                continue
+            exists = sid in origin or \
+                    (sid in current and current[sid] not in managed)
+            if exists:
+                if exist_fatal:
+                    utility.print_error('Found an existing entry for ' + repr(sid))
+                    raise utility.PMDataError()
+                elif not exist_overwrite:
+                    if verbose:
+                        utility.print_warning('Found an existing entry for ' + repr(sid) + '. Ignoring.')
+                    continue
+            origin[sid] = fil
+
+        # Species that have moved to a file that was not parsed still need
+        # their data (unless they are going to wait for it anyway)
+        extra = [fil for sid,fil in origin.items() 
+                if current.get(sid) != fil and fil not in parsed]
+        if not lazy:
+            parsed.update(zip(extra, 
+                    _parse_files(extra, workers=workers, pool=pool)))
+
+        # Build the new entries
+        update = {}
+        for sid,fil in origin.items():
+            if current.get(sid) == fil:
+                if fil not in parsed:
+                    continue
+                # The file was touched, but its content may be the same
+                if not lazy and _hash_match(sid, _data_hash(parsed[fil])):
+                    continue
+            if lazy:
+                update[sid] = PMLazyEntry(fil)
+                continue
+            temp = parsed[fil]
+            if temp is None:
+                utility.print_error('Failed to load file: ' + repr(fil))
+                raise utility.PMDataError()
+            temp['fromfile'] = fil
+            if temp['class'] not in reg.registry:
+                utility.print_error('Species ' + repr(sid) + ' called for data class ' + repr(temp['class']) + '.  That class does not exist in the registry.  The data file is corrupt or out of date.')
+                raise utility.PMDataError()
+            update[sid] = reg.registry[temp['class']](temp)
+
+        remove = [sid for sid,fil in current.items() 
+                if fil in managed and sid not in origin]
+
+        # Swap the entries into place.  Each assignment is atomic.
+        for sid,value in update.items():
+            if sid in current:
+                summary['changed'].append(sid)
+            else:
+                summary['added'].append(sid)
+            dict.__setitem__(data, sid, value)
+        for sid in remove:
+            dict.pop(data, sid, None)
+            summary['removed'].append(sid)
+
+        _record['time'] = start
+        _record['files'] = sids
+        _record['stat'] = stat
+        global _index
+        _index = None
+
+    if verbose:
+        for key in ['added', 'changed', 'removed']:
+            utility.print_line('Found ' + str(len(summary[key])) + ' species that were ' + key.upper() + ': ' + ', '.join(summary[key]), lead)
+    return summary
 
 
 
@@ -343,10 +1567,12 @@ The new() function will load the data element into the data dictionary
 and add the 'fromfile' descriptor as if it had been created by the load()
 function. 
 """
+    global _index
     lead = 'new-> '
     if ('id' in newdata) and ('class' in newdata):
         if newdata['class'] in reg.registry:
             data[newdata['id']] = reg.registry[newdata['class']]( newdata )
+            _index = None
         else:
             utility.print_error(
 'Could not find the class "' + newdata['class'] + '" in the registry.', lead)
@@ -367,7 +1593,7 @@ function.
 
 
 
-def updatefiles(dest=None, verbose=True, deletefiles=False):
+def updatefiles(dest=None, verbose=True, deletefiles=False, binary=False):
     """Bring the files into agreement with data changes
     updatefiles()
         or
@@ -402,6 +1628,11 @@ In this mode, it will use the flag found in the
 'deletefiles' keyword to decide whether to delete
 or suppress all files without prompting the user
 for a decision.
+
+Files are written in the same format they were read 
+from.  New files are written as .hpd (JSON) files 
+unless the 'binary' keyword is True, in which case 
+they are written as .hpb (binary) files.
 """
     
     lead = 'updatefiles-> '
@@ -483,19 +1714,14 @@ for a decision.
             fil = dest
             if dest[-1]!=pyro.utility.os.path.sep:
                 fil += pyro.utility.os.path.sep
-            fil +=  this.data['id'] + '.hpd'
+            fil +=  this.data['id'] + ('.hpb' if binary else '.hpd')
         fil = pyro.utility.os.path.abspath(fil)
 
-        FIL = None
         try:
-            FIL = open(fil,'w')
-            pyro.utility.json.dump(this.data,FIL,sort_keys=True,indent=4)
-            FIL.close()
+            pyro.utility.save_file(fil, this.data)
         except:
             pyro.utility.print_warning(
 'Failed to create file: ' + fil + '.  Ignoring.  Check permissions and re-run to correct.')
-            if FIL:
-                FIL.close()
         if verbose:
             pyro.utility.print_line('Wrote new file: ' + fil, lead)
             pyro.utility.print_line('',lead)
@@ -529,9 +1755,7 @@ for a decision.
                 charin = raw_input('Overwrite? (y/n):').lower()
 
         try:
-            FIL = open(fil,'w')
-            pyro.utility.json.dump(this.data,FIL,sort_keys=True,indent=4)
-            FIL.close()
+            pyro.utility.save_file(fil, this.data)
             if verbose:
                 pyro.utility.print_line('Updated file: ' + fil, lead)
                 pyro.utility.print_line('',lead)
@@ -572,5 +1796,152 @@ for a decision.
                 pyro.utility.print_warning(
 'Failed to suppress file: ' + fil + '.  Ignoring.  Check permissions and re-run to correct.')
 
+    # finally, bring the manifests up to date
+    if pyro.config['dat_manifest']:
+        updatemanifest(verbose=verbose)
+
+
+
+
+
+
+
+
+
+
+def updatemanifest(dest=None, verbose=True):
+    """Rebuild the manifest files in the data directories
+    updatemanifest()
+        or
+    updatemanifest('/path/to/data/dir')
+
+A manifest is a file named 'manifest.json' at the top of a data directory
+that lists the id, class, modification time, size, and content hash of
+every data file in the directory tree and the names of the suppressed 
+files.  When the 'dat_manifest' parameter is True, load() reads the 
+manifest instead of walking the directory, and in lazy mode, it does not
+need to open the data files at all.  load(check=True) uses the content 
+hashes to find changes without re-parsing files that have not been 
+touched.
+
+The manifest is trusted, so it must be rebuilt whenever files are added
+to or removed from the directory.  This happens automatically when the
+files are written by updatefiles().  Files that cannot be loaded are 
+listed with an id of None so that load(check=True) will report them.
+
+By default, the manifests are rebuilt for all the directories in the 
+'dat_dir' parameter.
+"""
+    lead = 'updatemanifest-> '
+    if dest is None:
+        sources = pyro.config['dat_dir']
+    else:
+        sources = [dest]
+    recursive = pyro.config['dat_recursive']
+
+    for dd in sources:
+        dd = utility.os.path.expanduser(dd)
+        dd = utility.os.path.expandvars(dd)
+        dd = utility.os.path.abspath(dd)
+        if not utility.os.path.isdir(dd):
+            utility.print_warning('Data directory does not exist: ' + repr(dd))
+            continue
+
+        files = []
+        suppressed = []
+        _discover(dd, files, suppressed, recursive=recursive)
+        parsed = _parse_files(files, workers=pyro.config['dat_workers'],
+                pool=pyro.config['dat_pool'])
+
+        entries = []
+        for fil,temp in zip(files, parsed):
+            st = utility.os.stat(fil)
+            entry = {'file':utility.os.path.relpath(fil, dd), 
+                    'mtime':st.st_mtime, 'size':st.st_size,
+                    'id':None, 'class':None, 'hash':None}
+            if temp is not None:
+                entry['id'] = temp['id']
+                entry['class'] = temp['class']
+                entry['hash'] = _data_hash(temp)
+            entries.append(entry)
+
+        manifest = {'version':pyro.__version__, 'recursive':recursive, 
+                'files':entries, 
+                'suppressed':[utility.os.path.relpath(fil, dd) for fil in suppressed]}
+
+        fil = utility.os.path.join(dd, MANIFEST)
+        try:
+            with open(fil, 'w') as ff:
+                utility.json.dump(manifest, ff, sort_keys=True, indent=1)
+            if verbose:
+                utility.print_line('Wrote manifest of ' + str(len(entries)) + ' files: ' + fil, lead)
+        except:
+            utility.print_warning('Failed to write manifest: ' + fil + '.  Ignoring.  Check permissions and re-run to correct.')
+
+
 
 
+
+
+
+def updatestore(dest=None, verbose=True):
+    """Write the packed coefficient store
+    updatestore()
+        or
+    updatestore('/path/to/dat.store')
+
+The 'C' and 'Tlim' coefficients of every ig and ig2 species in the data
+dictionary are written to a single binary file in the .hpb format (see 
+utility.save_file()).  All of the coefficients are packed into one 
+contiguous float64 payload, and the header records the offsets of each 
+species' arrays along with the id, size, and modification time of the 
+file it was loaded from.
+
+When dest is omitted, the store is written to the path in the 
+'dat_store' configuration parameter.  The store is written to a 
+temporary file first, and then it is moved into place, so processes 
+that have the old store mapped are not disturbed.  The new store is 
+used by the next load().  In lazy mode, every ig and ig2 species is 
+built so that its coefficients can be written.
+"""
+    lead = 'updatestore-> '
+    if dest is None:
+        dest = pyro.config['dat_store']
+    if not dest:
+        utility.print_error('updatestore() needs a destination, and the ' +
+                'dat_store configuration parameter is empty.')
+        raise utility.PMParamError('No store file.')
+    dest = utility.os.path.abspath(utility.os.path.expandvars(
+            utility.os.path.expanduser(dest)))
+
+    wait()
+    files = {}
+    for sid in sorted(data.keys()):
+        obj = data[sid]
+        if obj.data['class'] not in ('ig', 'ig2'):
+            continue
+        fil = obj.data['fromfile']
+        try:
+            fs = utility.os.stat(fil)
+        except:
+            if verbose:
+                utility.print_warning('Could not find the file for ' + 
+                        repr(sid) + '. Skipping.')
+            continue
+        files[fil] = {'id':sid, 'mtime':fs.st_mtime, 'size':fs.st_size,
+                'C':utility.np.asarray(obj.data['C'], dtype=float),
+                'Tlim':utility.np.asarray(obj.data['Tlim'], dtype=float)}
+
+    temp = dest + '.' + str(utility.os.getpid())
+    destdir = utility.os.path.dirname(dest)
+    if not utility.os.path.isdir(destdir):
+        utility.os.makedirs(destdir)
+    utility.save_file(temp, {'store':1, 'version':pyro.__version__, 
+            'files':files}, binary=True)
+    # Windows will not rename over an existing file
+    if utility.os.path.isfile(dest):
+        utility.os.remove(dest)
+    utility.os.rename(temp, dest)
+    if verbose:
+        utility.print_line('Wrote ' + str(len(files)) + ' species to ' + 
+                dest, lead)
@@ -107,6 +107,89 @@ dat_exist_fatal = False
 # this setting locally.  PYroMat's recursion is an all-or-none.
 dat_recursive = True
 
+# Should load() wait to build each species until it is first requested?  In
+# lazy mode, load() only scans the files for their id and remembers where
+# they are.  The file is parsed and the species object is built the first
+# time it is retrieved by get(), info(), or from the dat.data dictionary.
+# Opening and reading each file costs nearly as much as parsing it, so by 
+# itself, lazy mode saves little.  It shortens the import time considerably
+# for applications that only use a handful of species when it is combined 
+# with manifests (see dat_manifest below), so that the files are not opened
+# at all.
+dat_lazy = False
+
+# Where should load() keep a snapshot of the parsed data?  Parsing the data
+# files is the most expensive part of importing PYroMat.  When a snapshot 
+# cache is configured, the parsed data are saved in a single file that can be 
+# read much faster than the original files, and the data directories do not 
+# need to be walked again.  The snapshot records the PYroMat version, the 
+# settings that choose the files, the modification time of every directory 
+# walked, and the size and modification time of every data file.  If any of 
+# them change, the snapshot is discarded and rebuilt automatically.  The 
+# cache is disabled when this is an empty string.
+#
+#> dat_cache = '~/.pyromat/dat.cache'
+
+# How many workers should load() use to parse data files?  Sites with large
+# private data directories (especially on network file systems) may load 
+# faster when files are parsed in parallel.  The workers may be a 'thread' or
+# a 'process' pool.  Process pools fork where the platform allows it.  
+# Elsewhere, each worker starts a new interpreter and imports PYroMat 
+# (without loading any data), so a process pool only pays off for very 
+# large data sets.  Regardless of the number of workers, the results are 
+# always merged in the same order, so dat_overwrite and dat_exist_fatal 
+# behave the same way.
+dat_workers = 1
+dat_pool = 'thread'
+
+# Should load() read the manifest files in the data directories instead of 
+# walking them?  A manifest lists the id, class, size, modification time, and
+# content hash of every file in a directory tree.  Walking large directories 
+# can be slow on network file systems, and in lazy mode, the manifest means 
+# the data files do not need to be opened at all.  Manifests are written by
+# pyromat.dat.updatemanifest() and updatefiles().  They are trusted, so they 
+# must be rebuilt whenever files are added or removed by hand.  Directories 
+# without a manifest are walked as usual.
+dat_manifest = False
+
+# Which species should load() read from the data directories?  These are 
+# lists of patterns for the species ids separated by spaces or commas.  They
+# follow the usual shell rules, so '*' matches anything.  When dat_include is
+# empty, all species are included.  Species matching any of the dat_exclude 
+# patterns are skipped.  Applications that only need a few species can load
+# much faster this way, and they do not have to suppress files on disk.  
+# These only apply to the dat_dir directories; files loaded explicitly with
+# pyromat.dat.load('/path/to/file.hpd') are never filtered.
+#
+#> dat_include = 'mp.*'
+#
+#   or
+#
+#> dat_exclude = 'ig.* ig2.*'
+dat_include = ''
+dat_exclude = ''
+
+# Should the data be loaded in a background thread when PYroMat is imported?
+# The import returns as soon as the registry is loaded, and get() waits for 
+# each species to be loaded as it is requested.  Applications that have other
+# work to do at startup (like parsing arguments or building a user interface)
+# can overlap it with loading the data.  Code that reads the 
+# pyromat.dat.data dictionary directly should call pyromat.dat.wait() first.
+dat_thread = False
+
+# Where is the packed coefficient store?  The store is a single binary file 
+# with the coefficients of every ig and ig2 species.  When it is configured,
+# the species use read-only views of the memory-mapped file instead of 
+# keeping their own copies of the coefficients.  Servers that fork many 
+# worker processes after importing PYroMat share one copy of the store 
+# instead of each process copying the coefficients as they are used.  The 
+# store is written by pyromat.dat.updatestore().  It records the size and 
+# modification time of each data file, so species whose files have changed
+# simply keep their own coefficients until the store is rebuilt.  The store 
+# is disabled when this is an empty string.
+#
+#> dat_store = '~/.pyromat/dat.store'
+
 
 #** Registry behavior **
 # By default, the registry will consist of class definitions found in 
@@ -138,6 +221,12 @@ reg_overwrite = True
 # serves the same function as the dat_exist_fatal directive
 reg_exist_fatal = False
 
+# Should regload() wait to load each registry file until a species calls for
+# its class?  In lazy mode, each file is assumed to define a class with the 
+# same name as the file (e.g. "ig2.py" defines "ig2").  The file is not 
+# loaded until that class is first retrieved from the registry.
+reg_lazy = False
+
 # What is the default temperature and pressure that property functions
 # should use when entries are omitted?  These must be in the same units
 # specified by unit_pressure and unit_temperature
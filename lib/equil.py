@@ -0,0 +1,355 @@
+"""PYROMAT.EQUIL
+
+The equil module calculates the chemical equilibrium of ideal gas
+mixtures of the ig and ig2 species.  A PMEquilibrium object is built
+for a set of species, and its solve() method finds the composition that
+minimizes the Gibbs energy of a mixture with a given inventory of
+elements at a given temperature and pressure.
+
+>>> import pyromat as pm
+>>> eq = pm.equil.PMEquilibrium(['ig.N2', 'ig.O2', 'ig.NO', 'ig.N', 'ig.O'])
+>>> b = eq.inventory({'ig.N2':0.79, 'ig.O2':0.21})
+>>> result = eq.solve(b, T=[1500., 2000., 2500.], p=1.01325)
+>>> result['X'].shape
+(3, 5)
+
+The temperature, pressure, and inventory are arrays, and every state is
+solved at once.  Each Newton step is taken for all of the states that
+have not yet converged together, so thousands of states cost about as
+much as a few dozen iterations of vectorized operations.
+"""
+
+import pyromat as pyro
+import pyromat.bank
+import numpy as np
+utility = pyro.utility
+
+
+
+# ln(1e8); species with smaller mole fractions are treated as trace
+# species when the Newton step is limited.
+_SIZE = 18.420681
+# The smallest ln(n_j/n) that is kept.  Smaller amounts are zero.
+_LNMIN = -230.
+
+
+
+class PMEquilibrium(object):
+    """Chemical equilibrium of ideal gas mixtures
+    eq = PMEquilibrium(species)
+        or
+    eq = PMEquilibrium(species, bank=None)
+
+SPECIES is a list of M species id strings.  Every species must belong to
+the ig or ig2 class, and its id must be a chemical formula, so that its
+atomic contents can be found (see pyromat.dat.formula()).  Ions are not
+supported.  The elements of the species are listed in eq.elements.
+
+The species' polynomials are evaluated through a PMBank.  An existing
+bank that includes all of the species may be passed with the BANK
+keyword.  Otherwise, a bank is built with only the species that are
+needed.
+
+The equilibrium is found with the element potential method (as in the
+NASA CEA program).  The mole numbers of the species are found by Newton
+iteration on the element potentials and the total number of moles.  The
+steps of all states are taken together, and states that have converged
+are dropped from the working set.  In each state, species that contain
+an element that is absent from the inventory are excluded.
+  inventory()  element inventory from species amounts
+  solve()      equilibrium compositions and mixture properties
+"""
+    def __init__(self, species, bank=None):
+        self.species = list(species)
+        if bank is None:
+            bank = pyro.bank.PMBank(sorted(set(self.species)))
+        self.bank = bank
+        self.mix = pyro.bank.PMMixture(self.species, bank=bank)
+
+        contents = []
+        elements = set()
+        for sid in self.species:
+            this,charge = pyro.dat.formula(sid)
+            if charge:
+                utility.print_error('PMEquilibrium does not support ions.  ' +
+                        sid + ' has a charge of %d.'%charge)
+                raise utility.PMParamError('Invalid substance.')
+            if not this:
+                utility.print_error('The atomic contents of ' + sid +
+                        ' could not be found from its id.')
+                raise utility.PMParamError('Invalid substance.')
+            contents.append(this)
+            elements.update(this.keys())
+        self.elements = sorted(elements)
+
+        # The number of atoms of each element (row) in each species (column)
+        self._A = np.zeros((len(self.elements), len(self.species)), dtype=float)
+        for jj,this in enumerate(contents):
+            for el,count in this.items():
+                self._A[self.elements.index(el), jj] = count
+
+
+    def __len__(self):
+        return len(self.species)
+
+
+    def __repr__(self):
+        return '<PMEquilibrium of %d species and %d elements>'%(
+                len(self.species), len(self.elements))
+
+
+    def inventory(self, contents):
+        """Calculate the element inventory of a mixture
+    b = eq.inventory(contents)
+
+CONTENTS is a dictionary of the amounts of species keyed by species id.
+The species do not need to be in the equilibrium species list, but all
+of their elements must be.  The amounts may be arrays, which are
+broadcast.  Returns an array with shape (..., L) of the amount of each
+element in eq.elements, in the same units as the species amounts.
+"""
+        b = 0.
+        for sid,value in contents.items():
+            this,charge = pyro.dat.formula(sid)
+            if charge or not this:
+                utility.print_error('The atomic contents of ' + str(sid) +
+                        ' could not be found from its id.')
+                raise utility.PMParamError('Invalid substance.')
+            a = np.zeros((len(self.elements),), dtype=float)
+            for el,count in this.items():
+                if el not in self.elements:
+                    utility.print_error('The element ' + el + ' in ' + sid +
+                            ' is not in any of the equilibrium species.')
+                    raise utility.PMParamError('Invalid substance.')
+                a[self.elements.index(el)] = count
+            b = b + np.asarray(value, dtype=float)[..., np.newaxis] * a
+        return np.asarray(b, dtype=float)
+
+
+    def _argparse(self, b, T=None, p=None):
+        """Parse the inventory, temperature, and pressure arguments
+    b, T, p, shape = _argparse(b, T, p)
+
+B is an array of element amounts or a dictionary keyed by element.
+Applies the default temperature and pressure, converts them to K and
+Pa, and broadcasts them with the inventory.  b is returned with shape
+(N, L), T and p are returned as one-dimensional arrays with N elements,
+and shape is the broadcast shape of the states.
+"""
+        L = len(self.elements)
+        if isinstance(b, dict):
+            for el in b:
+                if el not in self.elements:
+                    utility.print_error('The element ' + repr(el) +
+                            ' is not in any of the equilibrium species.')
+                    raise utility.PMParamError('Invalid element.')
+            b = np.stack(np.broadcast_arrays(*[
+                    np.asarray(b.get(el, 0.), dtype=float)
+                    for el in self.elements]), axis=-1)
+        b = np.asarray(b, dtype=float)
+        if b.ndim < 1 or b.shape[-1] != L:
+            utility.print_error('The last dimension of the inventory array ' +
+                    'must have one element for each of the %d elements.'%L)
+            raise utility.PMParamError('Inventory array has the wrong shape.')
+        if (b < 0.).any() or (np.sum(b, axis=-1) <= 0.).any():
+            utility.print_error('The element amounts must be non-negative, ' +
+                    'and each state must have at least one element.')
+            raise utility.PMParamError('Invalid inventory.')
+
+        if T is None:
+            T = pyro.config['def_T']
+        if p is None:
+            p = pyro.config['def_p']
+        T = pyro.units.temperature_scale(np.asarray(T, dtype=float), to_units='K')
+        p = pyro.units.pressure(np.asarray(p, dtype=float), to_units='Pa')
+        shape = np.broadcast(b[...,0], T, p).shape
+        b = np.broadcast_to(b, shape + (L,)).reshape((-1, L))
+        T = np.broadcast_to(T, shape).flatten()
+        p = np.broadcast_to(p, shape).flatten()
+        return b, T, p, shape
+
+
+    def _species(self, T, p, cp=False):
+        """Evaluate the species' properties
+    g0, h, cp = _species(T, p, cp=False)
+
+T and p are one-dimensional arrays in K and Pa.  Returns (N, M) arrays
+of the species' Gibbs energies divided by R*T at p, their enthalpies in
+kJ/kmol, and (if requested) their specific heats in kJ/kmol/K.
+Otherwise cp is None.
+"""
+        cp,h,s = self.bank._eval(T, cp=cp, h=True, s=True)
+        index = self.mix._index
+        h = h[index].T
+        s = s[index].T
+        if cp is not None:
+            cp = cp[index].T
+        R = pyro.units.const_Ru
+        g0 = (h - T[:, np.newaxis]*s) / (R*T[:, np.newaxis]) + \
+                np.log(p[:, np.newaxis] / self.mix._pref)
+        return g0, h, cp
+
+
+    def _solve(self, b, g0, tol, maxiter, n=None):
+        """Newton iteration for the equilibrium mole numbers
+    n, converged = _solve(b, g0, tol, maxiter, n=None)
+
+B is the (N, L) element inventory, and G0 is the (N, M) array of the
+species' Gibbs energies divided by R*T at the mixture pressure.  N is
+an optional (N, M) array of mole numbers to start from, like a solution
+at a nearby temperature.  Returns the (N, M) mole numbers and a boolean
+array that is True where the iteration converged.
+"""
+        A = self._A
+        N,M = g0.shape
+        L = A.shape[0]
+        # Elements that are present, and the species that can exist
+        belem = b > 0.
+        active = ~np.dot(~belem, A > 0)
+        nactive = np.sum(active, axis=1)
+        # Initial guess (as in CEA)
+        n0 = 0.1 * np.sum(b, axis=1)
+        lnn = np.where(active, np.log(n0 / np.maximum(nactive, 1))[:, np.newaxis], 0.)
+        lntot = np.log(n0)
+        if n is not None:
+            # Start from the mole numbers where they are available
+            I = np.isfinite(n).all(axis=1)
+            ntot = np.sum(n[I], axis=1)
+            lntot[I] = np.log(ntot)
+            lnn[I] = np.where(active[I], np.log(np.maximum(n[I],
+                    ntot[:, np.newaxis] * np.exp(_LNMIN))), 0.)
+        btol = tol * np.max(b, axis=1)
+        converged = np.zeros((N,), dtype=bool)
+        # The states still being iterated
+        I = np.arange(N)
+        eye = np.eye(L + 1)
+        # The products of the atom counts, a_kj * a_ij, with one row per
+        # species, so that sum_j(a_kj a_ij n_j) is a matrix product
+        AA = (A[:, np.newaxis, :] * A[np.newaxis, :, :]).reshape((L*L, M)).T
+
+        for count in range(maxiter):
+            act = active[I]
+            nj = np.where(act, np.exp(lnn[I]), 0.)
+            ntot = np.exp(lntot[I])
+            mu = g0[I] + lnn[I] - lntot[I, np.newaxis]
+            nmu = np.where(act, nj*mu, 0.)
+            bk = np.dot(nj, A.T)
+            sumn = np.sum(nj, axis=1)
+
+            # Build the (L+1) x (L+1) system for each state
+            J = np.empty((I.size, L+1, L+1), dtype=float)
+            J[:, :L, :L] = np.dot(nj, AA).reshape((I.size, L, L))
+            J[:, :L, L] = bk
+            J[:, L, :L] = bk
+            J[:, L, L] = sumn - ntot
+            r = np.empty((I.size, L+1), dtype=float)
+            r[:, :L] = b[I] - bk + np.dot(nmu, A.T)
+            r[:, L] = ntot - sumn + np.sum(nmu, axis=1)
+            # Absent elements have no species; their potentials are zero
+            absent = ~belem[I]
+            J[:, :L, :][absent] = eye[:L][np.nonzero(absent)[1]]
+            J[:, :L, L][absent] = 0.
+            J[:, L, :L][absent] = 0.
+            r[:, :L][absent] = 0.
+            x = np.linalg.solve(J, r[..., np.newaxis])[..., 0]
+            pi = x[:, :L]
+            dlntot = x[:, L]
+            dlnn = np.where(act, -mu + np.dot(pi, A) + dlntot[:, np.newaxis], 0.)
+
+            # Limit the step (as in CEA)
+            lnx = mu - g0[I]
+            major = act & (lnx > -_SIZE)
+            minor = act & (lnx <= -_SIZE) & (dlnn >= 0.)
+            big = np.maximum(5.*np.abs(dlntot),
+                    np.max(np.where(major, np.abs(dlnn), 0.), axis=1))
+            lam = np.ones((I.size,), dtype=float)
+            II = big > 2.
+            lam[II] = 2. / big[II]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                lam2 = np.abs((-lnx - 9.2103404) / (dlnn - dlntot[:, np.newaxis]))
+            lam2 = np.min(np.where(minor, lam2, np.inf), axis=1)
+            lam = np.minimum(lam, lam2)
+
+            lntot[I] += lam * dlntot
+            lnn[I] = np.where(act, np.maximum(lnn[I] + lam[:, np.newaxis]*dlnn,
+                    lntot[I, np.newaxis] + _LNMIN), 0.)
+
+            # Test for convergence
+            done = (np.max(nj * np.abs(dlnn), axis=1) <= tol * sumn) & \
+                    (ntot * np.abs(dlntot) <= tol * sumn) & \
+                    (np.max(np.abs(b[I] - bk), axis=1) <= btol[I])
+            converged[I[done]] = True
+            I = I[~done]
+            if not I.size:
+                break
+
+        n = np.where(active, np.exp(lnn), 0.)
+        return n, converged
+
+
+    def solve(self, b, T=None, p=None, tol=1e-9, maxiter=100):
+        """Calculate the equilibrium compositions
+    result = eq.solve(b, T, p)
+        or
+    result = eq.solve(b, T, p, tol=1e-9, maxiter=100)
+
+B is the inventory of elements.  It may be an array with shape (..., L)
+of the amounts of the elements in eq.elements, like the arrays returned
+by inventory(), or a dictionary of amounts keyed by element symbol.  T
+and p are optional, and will default to 'def_T' and 'def_p'
+configuration parameters if they are left undefined.  The inventory,
+temperature, and pressure are broadcast, so a single inventory can be
+solved at many temperatures and pressures.
+
+The result is a dictionary with the following keys:
+X
+    The mole fractions with shape (..., M) in the order of eq.species.
+n
+    The amounts of the species in the same units as the inventory.
+converged
+    A boolean array that is True where the iteration converged.
+T, p
+    The temperature and pressure.
+cp, cv, d, e, gam, h, mw, s
+    The properties of the equilibrium mixture (see PMMixture).  The
+    specific heats are frozen; they do not include the effect of the
+    composition shifting with temperature.
+
+The iteration stops when the change of each species' amount and of the
+total is less than TOL times the total, and the element balances are
+satisfied to TOL times the largest element amount.  States that have
+not converged after MAXITER iterations are NaN, and a warning is
+printed.
+
+Accepts unit_temperature
+        unit_pressure
+"""
+        b,T,p,shape = self._argparse(b, T, p)
+        M = len(self.species)
+        g0 = self._species(T, p)[0]
+        if not np.isfinite(g0).all():
+            utility.print_error('The temperature is outside of the limits ' +
+                    'of one or more of the equilibrium species.')
+            raise utility.PMParamError('Temperature is out of range.')
+
+        n,converged = self._solve(b, g0, tol, maxiter)
+        if not converged.all():
+            utility.print_warning('The equilibrium failed to converge in ' +
+                    '%d of %d states.  They are NaN.'%(np.sum(~converged), converged.size))
+            n[~converged] = np.nan
+
+        X = n / np.sum(n, axis=1)[:, np.newaxis]
+        # Use a placeholder composition for the unconverged states
+        Xp = np.where(converged[:, np.newaxis], X, 1.)
+        out = self.mix.props(Xp,
+                pyro.units.temperature_scale(T, from_units='K'),
+                pyro.units.pressure(p, from_units='Pa'))
+        for key in out:
+            out[key][~converged] = np.nan
+            out[key] = out[key].reshape(shape)
+        out['X'] = X.reshape(shape + (M,))
+        out['n'] = n.reshape(shape + (M,))
+        out['converged'] = converged.reshape(shape)
+        out['T'] = pyro.units.temperature_scale(T, from_units='K').reshape(shape)
+        out['p'] = pyro.units.pressure(p, from_units='Pa').reshape(shape)
+        return out
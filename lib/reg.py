@@ -22,10 +22,83 @@ Chris Martin (c) 2015,2017
 
 # bring in the root package
 import pyromat as pyro
+# Registry files are loaded through the import machinery so that their
+# compiled bytecode is cached.
+try:
+    import importlib.util
+    def _exec_file(name, path):
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        # Register the module first, so that pickle and copy find these
+        # classes instead of importing a second copy of the file.
+        pyro.utility.sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except:
+            del pyro.utility.sys.modules[name]
+            raise
+        return vars(module)
+except ImportError:
+    # Python 2.7 
+    import imp
+    def _exec_file(name, path):
+        return vars(imp.load_source(name, path))
+
+
+
+class PMRegistryEntry(object):
+    """Placeholder for a data class that has not been loaded yet
+
+When regload() runs in lazy mode (see the 'reg_lazy' configuration 
+parameter), registry files are not executed.  Instead, each file is 
+assumed to define a class with the same name as the file, and a 
+PMRegistryEntry is registered in its place.  The first time the class is
+retrieved from the registry, the file is loaded.
+"""
+    def __init__(self, fromfile, name):
+        self.fromfile = fromfile
+        self.name = name
+
+    def __repr__(self):
+        return 'PMRegistryEntry(' + repr(self.fromfile) + ')'
+
+
+
+class PMRegistry(dict):
+    """The PYroMat data class registry
+
+This behaves exactly like a dictionary of data classes keyed by their
+names.  Values may be PMRegistryEntry placeholders, which are loaded 
+transparently the first time they are retrieved.
+"""
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if isinstance(value, PMRegistryEntry):
+            _regfile(value.fromfile, value.name)
+            value = dict.__getitem__(self, key)
+            if isinstance(value, PMRegistryEntry):
+                pyro.utility.print_error(
+'Registry file "' + value.fromfile + '" did not define the data class "' + 
+key + '".')
+                raise pyro.utility.PMDataError()
+        return value
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
 
 
 # initialize the registry dicitonary
-registry = {}
+registry = PMRegistry()
+# Timing and counts from the last regload() (see pyromat.startup_report)
+stats = {'time':0., 'lazy':False, 'dirs':{}, 'files':[]}
 
 
 
@@ -251,6 +324,99 @@ it is vital to have psolve() support, install version 1.3.
 #
 #   Go load the contents of the reg directory
 #
+def _regadd(new, value, thisfile, verbose=False):
+    """Add an entry to the registry, respecting the redundancy rules
+    _regadd(name, value, thisfile)
+
+value may be a data class or a PMRegistryEntry.  thisfile is the file
+responsible for the definition.  It is used to recognize when a class is
+replacing its own placeholder.
+"""
+    lead = 'regload->'
+    exist_fatal = pyro.config['reg_exist_fatal']
+    exist_overwrite = pyro.config['reg_overwrite']
+
+    # if the class is already registered, either raise 
+    # an exception, or throw a warning
+    if new in registry:
+        existing = dict.__getitem__(registry, new)
+        # A placeholder is always replaced by the class it promised
+        if isinstance(existing, PMRegistryEntry) and existing.fromfile == thisfile:
+            dict.__setitem__(registry, new, value)
+            return
+            
+        fullfile = pyro.utility.os.path.abspath( thisfile )
+        if exist_fatal:
+            pyro.utility.print_error(
+'Encountered a redundant definition for data class "' + new + '" in file "' + 
+fullfile + '"')
+            raise pyro.utility.PyroFileError()
+        elif exist_overwrite:
+            pyro.utility.print_warning(
+'Overwriting a redundant definition for data class "' + new + 
+'" with the definition in file "' + fullfile + '"')
+            dict.__setitem__(registry, new, value)
+        else:
+            pyro.utility.print_warning(
+'Ignoring a redundant definition for data class "' + new + '" in file "' + 
+fullfile + '"')
+
+    # if everything is fine, add the class to the registry
+    else:
+        dict.__setitem__(registry, new, value)
+        if verbose:
+            pyro.utility.print_line(
+'Found class "' + new + '"', lead)
+
+
+
+def _regname(index, fil):
+    """Return the module name for a registry file
+    name = _regname(index, fil)
+
+index is the position of the file's directory in the 'reg_dir' list.
+Each directory gets its own name space so that redundant definitions in
+different directories do not collide.
+"""
+    if index == 0:
+        return 'pyromat.registry.' + fil[:-3]
+    return 'pyromat.registry%d.'%index + fil[:-3]
+
+
+
+def _regfile(thisfile, name, verbose=False):
+    """Load a registry file and add its classes to the registry
+    _regfile(thisfile, name)
+
+name is the module name to use for the file (see _regname).
+"""
+    lead = 'regload->'
+    if verbose:
+        pyro.utility.print_line('Examining file "' + thisfile + '"', lead)
+
+    tic = pyro.utility.time.time()
+    temp = {}
+    try:
+        temp = _exec_file(name, thisfile)
+    except:
+        pyro.utility.print_warning(
+'Failed to execute file: ' + thisfile +
+'.  Encountered exception: ' + repr(pyro.utility.sys.exc_info()[1]))
+
+    # loop through all variables created in the file
+    valid = False
+    for new in temp:
+        if isinstance(temp[new],type) and issubclass(temp[new],__basedata__):
+            valid = True
+            _regadd(new, temp[new], thisfile, verbose=verbose)
+    if not valid:
+        pyro.utility.print_warning(
+'File "' + pyro.utility.os.path.abspath(thisfile) + 
+'" was found in a registry directory, but contained no data class definition.')
+    stats['files'].append({'file':thisfile, 'time':pyro.utility.time.time()-tic})
+
+
+
 def regload(verbose = None):
     """regload - reloads the data class registry
 
@@ -259,6 +425,9 @@ but it can be re-run at any time to update the contents of the reg
 directory, or to bring the registry up to date with changes to the
 registry search path.
 
+Registry files are loaded through Python's import machinery, so their
+compiled bytecode is cached in the usual __pycache__ directories.
+
 pyro.config parameters that affect the behavior of regload() are
 'reg_dir'
     directories in which to search
@@ -268,21 +437,27 @@ pyro.config parameters that affect the behavior of regload() are
     overwrite existing classes with redundant ones?
 'reg_exist_fatal'
     exit with an error when a redundant class is discovered?
+'reg_lazy'
+    wait to load each file until a class it defines is needed?
+
+The time spent and the files loaded are recorded in the reg.stats 
+dictionary.
 """
 
     # initialize the registry
-    global registry 
-    registry = {}
-    lead = 'regload->'
+    global registry, stats
+    registry = PMRegistry()
+    stats = {'time':0., 'lazy':False, 'dirs':{}, 'files':[]}
+    tic = pyro.utility.time.time()
 
     # fetch the configuration parameters
     if verbose == None:
         verbose = pyro.config['reg_verbose']
-    exist_fatal = pyro.config['reg_exist_fatal']
-    exist_overwrite = pyro.config['reg_overwrite']
+    lazy = pyro.config['reg_lazy']
+    stats['lazy'] = lazy
 
     # search each directory in the registry search path
-    for loc in pyro.config['reg_dir']:
+    for index,loc in enumerate(pyro.config['reg_dir']):
         # Expand references to the users' home directories
         # and environment variables
         loc = pyro.utility.os.path.expanduser(loc)
@@ -290,6 +465,7 @@ pyro.config parameters that affect the behavior of regload() are
         loc = pyro.utility.os.path.abspath(loc)
 
         cont = pyro.utility.os.listdir(loc)
+        stats['dirs'][loc] = 0
         # modules to load should not begin with an underscore or period
         # modules to load should end with .py
         # modules should contain a single class matching the name of the file
@@ -298,56 +474,14 @@ pyro.config parameters that affect the behavior of regload() are
             f_go = f_go & (len(fil)>3) & (fil[-3:]=='.py')
             # if the filename qualifies.
             if f_go:
-                temp = {}
+                stats['dirs'][loc] += 1
                 thisfile = pyro.utility.os.path.join(loc,fil)
-                if verbose:
-                    pyro.utility.print_line('Examining file "' + thisfile + '"', lead)
-                try:
-                    with open(thisfile,'r') as ff:
-                        exec(compile(ff.read(),thisfile,'exec'),temp)
-                    # In Python 2.7, this used to work
-                    # Use exec() for 3.4 compatibility
-                    # execfile(thisfile,globals(),temp)
-                except:
-                    pyro.utility.print_warning(
-'Failed to execute file: ' + pyro.utility.os.path.join(loc,fil) +
-'.  Encountered exception: ' + repr(pyro.utility.sys.exc_info()[1]))
-
-                # loop through all variables created in the file
-                valid = False
-                for new in temp:
-                    if isinstance(temp[new],type) and issubclass(temp[new],__basedata__):
-                        valid = True
-                        # if the class is already registered, either raise 
-                        # an exception, or throw a warning
-                        if new in registry:
-                            fullfile = pyro.utility.os.path.abspath( thisfile )
-                            if exist_fatal:
-                                pyro.utility.print_error(
-'Encountered a redundant definition for data class "' + new + '" in file "' + 
-fullfile + '"')
-                                raise pyro.utility.PyroFileError()
-                            elif exist_overwrite:
-                                pyro.utility.print_warning(
-'Overwriting a redundant definition for data class "' + new + 
-'" with the definition in file "' + fullfile + '"')
-                                registry[new] = temp[new]
-                            else:
-                                pyro.utility.print_warning(
-'Ignoring a redundant definition for data class "' + new + '" in file "' + 
-fullfile + '"')
-
-                        # if everything is fine, add the class to the registry
-                        else:
-                            registry[new] = temp[new]
-                            if verbose:
-                                pyro.utility.print_line(
-'Found class "' + new + '"', lead)
-                if not valid:
-                    pyro.utility.print_warning(
-'File "' + pyro.utility.os.path.abspath(thisfile) + 
-'" was found in a registry directory, but contained no data class definition.')
-
-
-
-
+                name = _regname(index, fil)
+                if lazy:
+                    # Trust the convention that the class is named for 
+                    # the file, and wait to load it.
+                    _regadd(fil[:-3], PMRegistryEntry(thisfile, name), 
+                            thisfile, verbose=verbose)
+                else:
+                    _regfile(thisfile, name, verbose=verbose)
+    stats['time'] = pyro.utility.time.time() - tic
@@ -47,22 +47,41 @@ Some meta-data on the species can be obtained using methods
 
 
     def _crange(self, T):
-        """Return the temperature range index and raise a meaningful exception
-if it is out of range."""
-        Tlim = self.data['Tlim']
-        if T<Tlim[0]:
+        """Return the temperature range indices and raise a meaningful exception
+if any temperature is out of range.
+    index = _crange(T)
+
+T is an array of temperatures in K.  index is an integer array with the
+same shape indicating the row of the 'C' coefficients to use for each
+temperature.  Each range includes its upper limit, and the first range 
+also includes its lower limit.
+"""
+        Tlim = np.asarray(self.data['Tlim'], dtype=float)
+        index = np.searchsorted(Tlim, T) - 1
+        index = np.where(T == Tlim[0], 0, index)
+        # NaN sorts to the end, so it is caught here too
+        bad = (index < 0) | (index >= len(Tlim)-1)
+        if bad.any():
             raise pyro.utility.PMParamError(
                 'Temperature, %f, is out of range for %s (%f to %f)'%(
-                T, self.data['id'], Tlim[0], Tlim[-1]))
-        for index in range(1,len(self.data['Tlim'])):
-            if T<=Tlim[index]:
-                return index-1
-        raise pyro.utility.PMParamError(
-            'Temperature, %f, is out of range for %s (%f to %f)'%(
-            T, self.data['id'], Tlim[0], Tlim[-1]))
+                np.asarray(T)[bad][0], self.data['id'], Tlim[0], Tlim[-1]))
+        return index
+
+
+    def _coef(self, T):
+        """Gather the coefficients for each temperature
+    C0, C1, ... C7 = _coef(T)
+
+T is an array of temperatures in K.  Returns an array with shape 
+(8,) + T.shape so that C[k] holds the k-th coefficient for the 
+temperature range of each element of T.  Raises a PMParamError if any
+of the temperatures is out of range (see _crange).
+"""
+        C = np.asarray(self.data['C'], dtype=float)
+        return C.T[:, self._crange(T)]
 
 
-    def _invT(self, value, prop, p=None):
+    def _invT(self, value, prop, dprop, p=None):
         """Inverse property function
     T = _invT(value, prop, dprop, p=None)
 
@@ -70,14 +89,21 @@ This is an internal service method used to provide T_s and T_h.
 Iterate on values of temperature so that the property method, prop,
 returns value.
 
-The algorithm uses a modified Newton iteration.  The property derivative
-is approximated numerically instead of relying on explicit derivatives.
-The numerical cost of explicitly evaluating a function's derivatives is 
-approximately equal to numerical approximation in 1D, but this 
-drastically simplifies the implementation.
+The algorithm is a modified Newton iteration that operates on all of 
+the elements at once.  Only the elements that have not yet converged 
+are evaluated in each iteration.  The derivative of the property with 
+respect to temperature is calculated explicitly by dprop (e.g. cp for 
+enthalpy).  If an iteration increases the error, the step is cut in 
+half, and steps are shortened until the temperature is in bounds.
+
+The initial guess is interpolated from a table of the property over 
+the species' temperature limits at the default pressure.  Its pressure
+dependence (if any) is accounted for with a shift at the mean 
+temperature, which is exact for the ideal gas entropy.
 
 value   the property value to obtain
 prop    the property method to be inverted
+dprop   the method for the derivative of prop with respect to T
 p       the pressure
 """
         if p is None:
@@ -88,55 +114,78 @@ p       the pressure
         small = 1e-8    # A "small" number
         epsilon = 1e-6  # Iteration precision
 
-        it = np.nditer((None,value,p),op_flags=[['readwrite','allocate'],['readonly','copy'],['readonly','copy']],op_dtypes='float')
-        for T_,y_,p_ in it:
-            # Use Tk as the iteration parameter.  We will write to T_ later.
-            # Initialize it to be in the center of the species' legal range.
-            Tk = 0.5*(self.data['Tlim'][0] + self.data['Tlim'][-1])
-            Tk1 = Tk
-            # Initialize dT - the change in T
-            dT = 0.
-            # Calculate an error threshold
-            thresh = max(small, abs(epsilon * y_))
-            # Initialize absek1 - the absolute error from the last iteration
-            #    Using +infty will force the error reduction criterion to be met
-            abs_ek1 = float('inf')
-            fail = True
-            for count in range(N):
-                ## CALL THE PROPERTY FUNCTION ##
-                yk = prop(T=Tk,p=p_)
-                # Calculate error
-                ek = yk-y_
-                abs_ek = abs(ek)
-                # Test for convergence
-                if abs_ek < thresh:
-                    T_[...] = Tk
-                    fail = False
-                    break
-                # If the error did not reduce from the last iteration
-                elif abs_ek > abs_ek1:
-                    dT /= 2.
-                    Tk = Tk1 + dT
-                # Continue normal iteration
-                else:
-                    # Shift out the old values
-                    abs_ek1 = abs_ek
-                    Tk1 = Tk
-                    ## ESTIMATE THE DERIVATIVE ##
-                    dT = max(small, epsilon*Tk)    # Make a small perturbation
-                    dydx = (prop(T=Tk+dT,p=p_) - yk)/dT
-                    # Calculate the next step size
-                    dT = -ek / dydx
-                    # Produce a tentative next value
-                    Tk = Tk1 + dT
-                    # Test the guess for containment in the temperature limits
-                    # Shrink the increment until Tk is contained
-                    while Tk<self.data['Tlim'][0] or Tk>self.data['Tlim'][-1]:
-                        dT /= 2.
-                        Tk = Tk1 + dT
-            if fail:
-                raise pyro.utility.PMAnalysisError('_invT() failed to converge!')
-        return it.operands[0]
+        Tmin,Tmax = self.Tlim()
+        value = np.asarray(value, dtype=float)
+        p = np.asarray(p, dtype=float)
+        shape = np.broadcast(value, p).shape
+        y = np.broadcast_to(value, shape).flatten()
+        pp = np.broadcast_to(p, shape).flatten()
+
+        # Build the initial guess
+        p0 = pyro.config['def_p']
+        Tmid = 0.5*(Tmin + Tmax)
+        Tgrid = np.linspace(Tmin, Tmax, 17)
+        ygrid = prop(T=Tgrid, p=p0)
+        shift = np.broadcast_to(prop(T=Tmid, p=p) - prop(T=Tmid, p=p0), 
+                shape).flatten()
+        Tk = np.interp(y - shift, ygrid, Tgrid)
+
+        # Use Tk as the iteration parameter.  Tk1 and abs_ek1 are the 
+        # temperature and absolute error from the last successful step.
+        Tk1 = Tk.copy()
+        dT = np.zeros_like(Tk)
+        abs_ek1 = np.full_like(Tk, float('inf'))
+        # Calculate an error threshold
+        thresh = np.maximum(small, np.abs(epsilon * y))
+        # The indices of the elements still being iterated
+        ii = np.arange(y.size)
+        for count in range(N):
+            ## CALL THE PROPERTY FUNCTION ##
+            ek = prop(T=Tk[ii], p=pp[ii]) - y[ii]
+            abs_ek = np.abs(ek)
+            # Test for convergence
+            go = ~(abs_ek < thresh[ii])
+            # If the error did not reduce from the last iteration
+            worse = go & (abs_ek > abs_ek1[ii])
+            jj = ii[worse]
+            dT[jj] /= 2.
+            Tk[jj] = Tk1[jj] + dT[jj]
+            # Continue normal iteration
+            normal = go & ~worse
+            jj = ii[normal]
+            abs_ek1[jj] = abs_ek[normal]
+            Tk1[jj] = Tk[jj]
+            dT[jj] = -ek[normal] / dprop(T=Tk[jj], p=pp[jj])
+            Tk[jj] = Tk1[jj] + dT[jj]
+            # Shrink the increment until Tk is contained in the limits
+            ii = ii[go]
+            jj = ii[(Tk[ii] < Tmin) | (Tk[ii] > Tmax)]
+            while jj.size:
+                dT[jj] /= 2.
+                Tk[jj] = Tk1[jj] + dT[jj]
+                jj = jj[(Tk[jj] < Tmin) | (Tk[jj] > Tmax)]
+            if not ii.size:
+                return Tk.reshape(shape)
+        raise pyro.utility.PMAnalysisError('_invT() failed to converge!')
+
+
+    def _dsdT(self, T=None, p=None):
+        """Derivative of entropy with respect to temperature
+    dsdT = _dsdT(T,p)
+
+This is an internal service method used by T_s.  At constant pressure,
+ds/dT = cp/T, where T is the absolute temperature.
+
+Accepts unit_temperature
+        unit_pressure
+Returns unit_energy / unit_matter / unit_temperature**2
+"""
+        if T is None:
+            T = pyro.config['def_T']
+        # The absolute temperature in units of unit_temperature
+        Tabs = pyro.units.temperature(
+                pyro.units.temperature_scale(T, to_units='K'), from_units='K')
+        return self.cp(T,p) / Tabs
 
     def _test(self, report_file=None, report_level=2, basic=False):
         """Test the data and algorithm against tabulated data
@@ -709,17 +758,14 @@ Returns unit_energy / unit_matter
         scale = pyro.units.matter(scale,self.data['mw'],from_units='mol',exponent=-1)
         scale = pyro.units.temperature(scale,from_units='K',exponent=-1)
 
-        # Create an iterator over T and out
-        it = np.nditer((T,None),op_flags=[['readonly','copy'],['readwrite','allocate']],op_dtypes='float')
-
-        for TT,oo in it:
-            C = self.data['C'][self._crange(TT)]
-            t = TT/1000.
-            oo[...] = C[0] + t*(C[1] + t*(C[2] + t*C[3]))
-            oo[...] += C[4]/t/t
-            oo[...] *= scale
-        # Broadcast the result to match the dims of p
-        return it.operands[1]
+        T = np.array(T, dtype=float)
+        C = self._coef(T)
+        t = T/1000.
+        out = np.empty_like(T)
+        out[...] = C[0] + t*(C[1] + t*(C[2] + t*C[3]))
+        out += C[4]/t/t
+        out *= scale
+        return out
         
     def h(self,T=None,p=None,hf=True):
         """Enthalpy
@@ -751,20 +797,18 @@ Returns unit_energy / unit_matter
         scale = pyro.units.energy(from_units='kJ')
         scale = pyro.units.matter(scale,self.data['mw'],from_units='mol',exponent=-1)
 
-        # Create an iterator over T and out
-        it = np.nditer((T,None),op_flags=[['readonly','copy'],['readwrite','allocate']],op_dtypes='float')
         if hf:
             C7 = 0.
         else:
             C7 = self.data['C'][0][7]
-        for TT,oo in it:
-            C = self.data['C'][self._crange(TT)]
-            t = TT/1000.
-            oo[...] = C[5] + t*(C[0] + t*(C[1]/2. + t*(C[2]/3. + t*C[3]/4.)))
-            oo[...] -= C[4]/t + C7
-            oo[...] *= scale
-        # Broadcast the result to match the dims of p
-        return it.operands[1]
+        T = np.array(T, dtype=float)
+        C = self._coef(T)
+        t = T/1000.
+        out = np.empty_like(T)
+        out[...] = C[5] + t*(C[0] + t*(C[1]/2. + t*(C[2]/3. + t*C[3]/4.)))
+        out -= C[4]/t + C7
+        out *= scale
+        return out
 
     def s(self,T=None,p=None):
         """Entropy
@@ -797,19 +841,17 @@ Returns unit_energy / unit_matter / unit_temperature
         scale = pyro.units.matter(scale,self.data['mw'],from_units='mol',exponent=-1)
         scale = pyro.units.temperature(scale,from_units='K',exponent=-1)
 
-        # Create an iterator over T, p, and out
-        it = np.nditer((T,p,None),op_flags=[['readonly','copy'],['readonly','copy'],['readwrite','allocate']],op_dtypes='float')
-
-        for TT,pp,oo in it:
-            C = self.data['C'][self._crange(TT)]
-            t = TT/1000.
-            oo[...] = C[6] + C[0]*np.log(t)
-            oo[...] += t*(C[1] + t*(C[2]/2. + t*C[3]/3.))
-            oo[...] -= C[4]/t/t/2.
-            oo[...] -= pyro.units.const_Ru * np.log(pp/self._pref_bar)
-            oo[...] *= scale
-        # Broadcast the result to match the dims of p
-        return it.operands[2]
+        T = np.array(T, dtype=float)
+        p = np.asarray(p, dtype=float)
+        C = self._coef(T)
+        t = T/1000.
+        out = np.empty(np.broadcast(T,p).shape)
+        out[...] = C[6] + C[0]*np.log(t)
+        out += t*(C[1] + t*(C[2]/2. + t*C[3]/3.))
+        out -= C[4]/t/t/2.
+        out -= pyro.units.const_Ru * np.log(p/self._pref_bar)
+        out *= scale
+        return out
 
     def e(self,T=None,p=None,hf=True):
         """Energy
@@ -842,23 +884,20 @@ Returns unit_energy / unit_matter
         scale = pyro.units.energy(from_units='kJ')
         scale = pyro.units.matter(scale,self.data['mw'],from_units='mol',exponent=-1)
 
-        # Create an iterator over T and out
-        it = np.nditer((T,None),op_flags=[['readonly','copy'],['readwrite','allocate']],op_dtypes='float')
-
         R = 1e-3 * pyro.units.const_Ru
         if hf:
             C7 = 0.
         else:
             C7 = self.data['C'][0][7]
-        for TT,oo in it:
-            C = self.data['C'][self._crange(TT)]
-            t = TT/1000.
-            oo[...] = C[5] + t*(C[0] + t*(C[1]/2. + t*(C[2]/3. + t*C[3]/4.)))
-            oo[...] -= C[4]/t + C7
-            oo[...] -= TT * R
-            oo[...] *= scale
-        # Broadcast the result to match the dims of p
-        return it.operands[1]
+        T = np.array(T, dtype=float)
+        C = self._coef(T)
+        t = T/1000.
+        out = np.empty_like(T)
+        out[...] = C[5] + t*(C[0] + t*(C[1]/2. + t*(C[2]/3. + t*C[3]/4.)))
+        out -= C[4]/t + C7
+        out -= T * R
+        out *= scale
+        return out
 
 
     def d(self,T=None,p=None):
@@ -993,7 +1032,7 @@ Accepts unit_energy / unit_matter / unit_temperature
         unit_pressure
 Returns unit_temperature
 """
-        return self._invT(s, self.s, p)
+        return self._invT(s, self.s, self._dsdT, p)
 
 
     def T_h(self,h,p=None):
@@ -1008,7 +1047,7 @@ Accepts unit_energy / unit_matter / unit_temperature
         unit_pressure
 Returns unit_temperature
 """
-        return self._invT(h, self.h, p)
+        return self._invT(h, self.h, self.cp, p)
 
     def T_d(self,d,p=None):
         """Temperature from density and pressure
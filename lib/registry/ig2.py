@@ -19,6 +19,7 @@ methods and their unit conventions:
   mw() molecular weight (unit_mass / unit_molar)
   R()  gas constant     (unit_energy / unit_temperature / unit_matter)
   s()  entropy          (unit_energy / unit_temperature / unit_matter)
+  state()  all of the properties above at once, in a dictionary
 
 There are also routines to invert properties; e.g. calculating 
 temperature from enthalpy or from entropy and pressure.
@@ -36,6 +37,46 @@ Some meta-data on the species can be obtained using methods
               quantity of each.
 """
 
+    def __init__(self,*arg,**kwarg):
+        super(ig2,self).__init__(*arg,**kwarg)
+        # The inverse tables are built the first time they are needed
+        self._invtab = {}
+
+
+    def _invtable(self, prop):
+        """Return a table for the inverse of a property
+    y, T = _invtable(prop)
+
+PROP is 'h' or 's'.  The table is a pair of arrays with the enthalpy, h, 
+or the standard entropy, s (at p=pref), evaluated on a grid of 
+temperatures spanning Tlim.  Both properties increase monotonically 
+with temperature, so np.interp(value, y, T) is a good initial guess for 
+the temperature.  The grid includes the range limits (moved inside by 
+1e-6K) and points every 25K or less in each range.  The tables are built the first time they 
+are requested, and they are kept in the _invtab member.
+
+Expects and returns kJ, kmol, and K.
+"""
+        if prop not in self._invtab:
+            Tlim = self.data['Tlim']
+            T = [np.linspace(Tlim[ii], Tlim[ii+1], 
+                    int(np.ceil((Tlim[ii+1] - Tlim[ii])/25.)) + 1)[:-1] 
+                    for ii in range(len(Tlim)-1)]
+            T.append(Tlim[-1:])
+            T = np.concatenate(T)
+            # Keep the end points just inside the limits.  _iter1() 
+            # cannot recover from a guess on the boundary if the first
+            # step points out of bounds.
+            T[0] += 1e-6
+            T[-1] -= 1e-6
+            if prop == 'h':
+                y = self._h(T)[0]
+            else:
+                y = self._s(T)[0]
+            self._invtab[prop] = (y, T)
+        return self._invtab[prop]
+
+
     def _argparse(self, T=None, p=None, d=None,\
         temperature=False, pressure=False, density=False):
         """Parse the arguments supplied to an IG2 property method
@@ -83,7 +124,7 @@ They are always returned in the order T, p, d.
                 p = np.reshape(p,(1,))
             
         if d is not None:
-            d = pm.units.matter(np.asarray(d,dtype=float), to_units='kmol')
+            d = pm.units.matter(np.asarray(d,dtype=float), self.data['mw'], to_units='kmol')
             d = pm.units.volume(d, to_units='m3', exponent=-1)
             if d.ndim==0:
                 d = np.reshape(d, (1,))
@@ -131,24 +172,37 @@ They are always returned in the order T, p, d.
         return
             
 
-    def _crange(self, T, index):
-        """Return the down-select boolean array for temperature values in range "index".
-    I = _crange(T,index)
+    def _crange(self, T):
+        """Return the temperature range indices
+    index = _crange(T)
 
-I is a boolean array used for boolean indexing of the state properties.    
-I will be returned such that Tlim[index] <= T[I] < Tlim[index]
+T is an array of temperatures in K.  index is an integer array with the
+same shape indicating the row of the 'C' coefficients to use for each
+temperature.  Each range includes its lower limit, and the last range 
+also includes its upper limit.  Temperatures that are out of range are
+given the index len(C), which _coef() uses for a row of zeros.
 """
-        # If the index corresponds to the last range segment, then make
-        # the upper boundary inclusive.
-        if index == len(self.data['Tlim'])-2:
-            return np.logical_and(\
-                    T >= self.data['Tlim'][index],
-                    T <= self.data['Tlim'][index+1])
-                    
-        return np.logical_and(\
-                    T >= self.data['Tlim'][index],
-                    T < self.data['Tlim'][index+1])
-            
+        Tlim = np.asarray(self.data['Tlim'], dtype=float)
+        index = np.searchsorted(Tlim, T, side='right') - 1
+        index = np.where(T == Tlim[-1], len(Tlim)-2, index)
+        # NaN sorts to the end, so it is caught here too
+        index[(index < 0) | (index >= len(Tlim)-1)] = len(Tlim)-1
+        return index
+
+
+    def _coef(self, T):
+        """Gather the coefficients for each temperature
+    C = _coef(T)
+
+T is an array of temperatures in K.  Returns an array with shape 
+(7,) + T.shape so that C[k] holds the k-th coefficient for the 
+temperature range of each element of T.  The coefficients for 
+temperatures that are out of range are all zero, so the properties
+evaluate to zero there.
+"""
+        C = np.zeros((len(self.data['C'])+1, 7), dtype=float)
+        C[:-1] = self.data['C']
+        return np.take(C.T, self._crange(T), axis=1)
 
     
     def _iter1(self, fn, prop, y, x, Ids, xmin, xmax,
@@ -246,23 +300,25 @@ param       A dicitonary of keyword arguments are passed directly to the
 
 
 
-    def _cp(self, T):
+    def _cp(self, T, C=None):
         """Constant pressure specific heat
     _cp(T)
 
 Expects temperature in Kelvin and returns cp in kJ/kmol/K
+
+The optional keyword, C, accepts the coefficients already gathered by
+_coef(T) so that they can be shared between the inner routines.
 """
-        out = np.zeros_like(T,dtype=float)
-        # Loop through the piece-wise temperature ranges
-        for index in range(len(self.data['Tlim'])-1):
-            # Which elements are in-range?
-            I = self._crange(T,index)
-            for c in self.data['C'][index][4::-1]:
-                out[I] = c + out[I]*T[I]
+        if C is None:
+            C = self._coef(T)
+        out = C[4].copy()
+        for c in C[3::-1]:
+            out *= T
+            out += c
         return pm.units.const_Ru * out
             
 
-    def _h(self, T, diff=False):
+    def _h(self, T, diff=False, C=None):
         """Enthalpy
     h,hT = _h(T)
 
@@ -270,30 +326,31 @@ Expects temperature in Kelvin and returns h in kJ/kmol
 
 If the optional keyword, diff, is True, then the first derivative of 
 enthalpy is also returned; otherwise it is None.  This is more 
-efficient than calculating specific heat separately.
+efficient than calculating specific heat separately.  The optional 
+keyword, C, accepts the coefficients already gathered by _coef(T).
 """
+        if C is None:
+            C = self._coef(T)
         out = np.zeros_like(T,dtype=float)
         dh = None
         if diff:
             dh = np.zeros_like(T,dtype=float)
-        # Loop through the piece-wise temperature ranges
-        for index in range(len(self.data['Tlim'])-1):
-            # Which elements are in-range?
-            I = self._crange(T,index)
-            term = 5.
-            for c in self.data['C'][index][4::-1]:
-                temp = (c/term + out[I])
-                if diff:
-                    dh[I] = temp + T[I]*dh[I]
-                out[I] = T[I]*temp
-                term -= 1.
-            out[I] += self.data['C'][index][5]
+        # Evaluate the polynomial and its derivative in a single pass
+        term = 5.
+        for c in C[4::-1]:
+            temp = c/term + out
+            if diff:
+                dh *= T
+                dh += temp
+            out = T*temp
+            term -= 1.
+        out += C[5]
         if diff:
             dh *= pm.units.const_Ru
         return pm.units.const_Ru * out, dh
 
 
-    def _s(self, T, diff=False):
+    def _s(self, T, diff=False, C=None):
         """Standard entropy (at p=pref)
     s,sT = _s(T)
     
@@ -301,29 +358,33 @@ Expects temperature in Kelvin, p in bar, and returns s in kJ/kmol/K
 
 If the optional keyword, diff, is True, then the first derivative of 
 entropy is also returned; otherwise it is None.  This is more 
-efficient than calculating ds/dT from specific heat separately.
+efficient than calculating ds/dT from specific heat separately.  The 
+optional keyword, C, accepts the coefficients already gathered by 
+_coef(T).
 """
+        if C is None:
+            C = self._coef(T)
         out = np.zeros_like(T,dtype=float)
         ds = None
         if diff:
             ds = np.zeros_like(T,dtype=float)
-        # Loop through the piece-wise temperature ranges
-        for index in range(len(self.data['Tlim'])-1):
-            # Which elements are in-range?
-            I = self._crange(T,index)
-            term = 4.
-            for c in self.data['C'][index][4:0:-1]:
-                if diff:
-                    ds[I] = out[I] + T[I]*ds[I]
-                out[I] = c/term + T[I]*out[I]
-                term -= 1.
+        # Evaluate the polynomial and its derivative in a single pass
+        term = 4.
+        for c in C[4:0:-1]:
             if diff:
-                ds[I] = out[I] + T[I]*ds[I]
-                ds[I] += self.data['C'][index][0] / T[I]
-                ds[I] *= pm.units.const_Ru
-            out[I] = T[I]*out[I]\
-                    + self.data['C'][index][6]\
-                    + self.data['C'][index][0] * np.log(T[I])
+                ds *= T
+                ds += out
+            out = c/term + T*out
+            term -= 1.
+        # Out of range, where T may be zero or negative, the coefficients 
+        # are all zero.  Only take the log and reciprocal where C[0] is not.
+        I = C[0] != 0.
+        if diff:
+            ds *= T
+            ds += out
+            ds += np.divide(C[0], T, out=np.zeros_like(ds), where=I)
+            ds *= pm.units.const_Ru
+        out = T*out + C[6] + C[0] * np.log(T, out=np.zeros_like(out), where=I)
         return pm.units.const_Ru * out, ds
 
 
@@ -343,11 +404,10 @@ their constituents by their species ID.  These include the collection
 and and the chemical formula, and all constituents MUST have a valid 
 species ID.
 
-After the first call to contents(), the dictionary is stored in
-the _contents member so that subsequent calls will not result in
-redundant string parsing.  
+The contents are parsed from the species ID by pyromat.dat.formula(),
+so the charge of ions (e.g. ig.N2+) is ignored.
 """
-        return self.data['contents'].copy()
+        return pm.dat.formula(self.data['id'])[0]
 
 
     def Tlim(self):
@@ -575,11 +635,61 @@ Returns dimensionless
 """
         # Prep temperature and the result arrays
         T = self._argparse(*varg, temperature=True, **kwarg)
-        out = self._cp(T)[0]
+        out = self._cp(T)
         out = out / (out - pm.units.const_Ru)
         return out
 
 
+    def state(self, *varg, **kwarg):
+        """Evaluate all of the properties at once
+    S = state(T,p)   OR  state(T=T, d=d)   OR  state(p=p, d=d)
+
+Accepts any combination of state parameters that permit the calculation
+of temperature.  Missing parameters will calculated from PYroMat's 
+default temperature and pressure values in config['def_T'] and 
+config['def_p'].
+
+S is a dictionary with the following keys:
+  T     temperature      [unit_temperature]
+  p     pressure         [unit_pressure]
+  d     density          [unit_matter / unit_volume]
+  cp    spec. heat       [unit_energy / unit_matter / unit_temperature]
+  cv    spec. heat       [unit_energy / unit_matter / unit_temperature]
+  h     enthalpy         [unit_energy / unit_matter]
+  e     internal energy  [unit_energy / unit_matter]
+  s     entropy          [unit_energy / unit_matter / unit_temperature]
+  gam   spec. heat ratio [dless]
+
+The arguments are only parsed once, and the temperature range 
+coefficients are only gathered once for all of the properties, so this 
+is much faster than calling each of the property methods separately.
+"""
+        T,p,d = self._argparse(*varg, temperature=True, pressure=True,
+                density=True, **kwarg)
+        R = pm.units.const_Ru
+        C = self._coef(T)
+        out = {}
+        out['cp'] = self._cp(T, C=C)
+        out['cv'] = out['cp'] - R
+        out['gam'] = out['cp'] / out['cv']
+        out['h'] = self._h(T, C=C)[0]
+        out['e'] = out['h'] - R*T
+        out['s'] = self._s(T, C=C)[0] - R * np.log(p/self.data['pref'])
+        # Unit conversions
+        for key in ['cp', 'cv', 'h', 'e', 's']:
+            pm.units.energy(out[key], from_units='kJ', inplace=True)
+            pm.units.matter(out[key], self.data['mw'], exponent=-1, 
+                    from_units='kmol', inplace=True)
+        for key in ['cp', 'cv', 's']:
+            pm.units.temperature(out[key], exponent=-1, from_units='K', 
+                    inplace=True)
+        out['T'] = pm.units.temperature_scale(T, from_units='K')
+        out['p'] = pm.units.pressure(p, from_units='Pa')
+        d = pm.units.volume(d, from_units='m3', exponent=-1)
+        out['d'] = pm.units.matter(d, self.data['mw'], from_units='kmol')
+        return out
+
+
     def p_s(self,s,T=None):
         """Pressure as a function of entropy
     p = p_s(s)
@@ -637,33 +747,39 @@ Returns temperature in  [unit_temperature]
         s += pm.units.const_Ru * np.log(p/self.data['pref'])
         
         Ids = np.ones_like(s, dtype=bool)
-        T = np.ones_like(s, dtype=float) * (self.data['Tlim'][0] + self.data['Tlim'][1]) * 0.5
+        # Interpolate the initial guess from the inverse table
+        T = np.interp(s, *self._invtable('s'))
         
         self._iter1(self._s, 'T', s, T, Ids, self.data['Tlim'][0], self.data['Tlim'][-1])
         pm.units.temperature_scale(T, from_units='K', inplace=True)
         return T
 
 
-    def T_h(self,h):
+    def T_h(self,h,p=None):
         """Temperature as a function of enthalpy
     T = T_h(h)
         or
-    T = T_h(h)
+    T = T_h(h,p)
 
-Returns the temperature as a function of enthalpy and pressure
+Returns the temperature as a function of enthalpy and pressure.  Ideal
+gas enthalpy is not actually a function of p, but it is permitted as an
+argument for cross-compatibility between species' function calls.
 
 Enthalpy is            [unit_energy / unit_matter]
+Pressure is            [unit_pressure]
 Returns temperature as [unit_temperature]
 """
         h = pm.units.energy(np.asarray(h, dtype=float), to_units='kJ')
         h = pm.units.matter(h, self.data['mw'], to_units='kmol', exponent=-1)
         if h.ndim==0:
             h = np.reshape(h, (1,))
+        if p is not None:
+            h = np.broadcast_arrays(h, np.asarray(p, dtype=float))[0].copy()
         
         Ids = np.ones_like(h, dtype=bool)
-        T = np.ones_like(h, dtype=float) * (self.data['Tlim'][0] + self.data['Tlim'][1]) * 0.5
+        # Interpolate the initial guess from the inverse table
+        T = np.interp(h, *self._invtable('h'))
         
         self._iter1(self._h, 'T', h, T, Ids, self.data['Tlim'][0], self.data['Tlim'][-1])
         pm.units.temperature_scale(T, from_units='K', inplace=True)
         return T
-        
@@ -1,5 +1,12 @@
 import pyromat as pyro
 import numpy as np
+
+
+# Merged mixture polynomials keyed by composition (see igmix._merge)
+_merged = {}
+# The maximum number of compositions to keep in _merged
+_MERGED_MAX = 256
+
 ######################
 ##                  ##
 ##  Mixture class   ##
@@ -35,6 +42,14 @@ temperature from enthalpy or from entropy and pressure.
 The Tlim() method returns the intersection of all the supported 
 temperature intervals of the constituents.
   Tlim() temperature limits  (unit_temperature)
+
+When all of the constituents belong to the ig and ig2 classes, their
+polynomials are merged into a single polynomial for the mixture over 
+the union of their temperature ranges.  Then, cp(), cv(), e(), h(), and
+s() cost the same as they would for a single species.  The merged 
+polynomials are cached by composition, so mixtures with the same 
+composition share them.  Mixtures can be created at run time from any
+ig and ig2 species with pyromat.mixture().
 """
 
     def __init__(self,*arg,**kwarg):
@@ -44,10 +59,12 @@ temperature intervals of the constituents.
         # Initialize the static molar and mass fractions
         self._x = None
         self._y = None
+        # The composition key for the merged polynomial cache
+        self._key = None
       
 
 
-    def _invT(self, value, prop, p=None):
+    def _invT(self, value, prop, dprop, p=None):
         """Inverse property function
     T = _invT(value, prop, dprop, p=None)
 
@@ -55,14 +72,21 @@ This is an internal service method used to provide T_s and T_h.
 Iterate on values of temperature so that the property method, prop,
 returns value.
 
-The algorithm uses a modified Newton iteration.  The property derivative
-is approximated numerically instead of relying on explicit derivatives.
-The numerical cost of explicitly evaluating a function's derivatives is 
-approximately equal to numerical approximation in 1D, but this 
-drastically simplifies the implementation.
+The algorithm is a modified Newton iteration that operates on all of 
+the elements at once.  Only the elements that have not yet converged 
+are evaluated in each iteration.  The derivative of the property with 
+respect to temperature is calculated explicitly by dprop (e.g. cp for 
+enthalpy).  If an iteration increases the error, the step is cut in 
+half, and steps are shortened until the temperature is in bounds.
+
+The initial guess is interpolated from a table of the property over 
+the species' temperature limits at the default pressure.  Its pressure
+dependence (if any) is accounted for with a shift at the mean 
+temperature, which is exact for the ideal gas entropy.
 
 value   the property value to obtain
 prop    the property method to be inverted
+dprop   the method for the derivative of prop with respect to T
 p       the pressure
 """
         if p is None:
@@ -74,56 +98,239 @@ p       the pressure
         epsilon = 1e-6  # Iteration precision
 
         Tmin,Tmax = self.Tlim()
-
-        it = np.nditer((None,value,p),op_flags=[['readwrite','allocate'],['readonly','copy'],['readonly','copy']],op_dtypes='float')
-        for T_,y_,p_ in it:
-            # Use Tk as the iteration parameter.  We will write to T_ later.
-            # Initialize it to be in the center of the species' legal range.
-            Tk = 0.5*(Tmin + Tmax)
-            Tk1 = Tk
-            # Initialize dT - the change in T
-            dT = 0.
-            # Calculate an error threshold
-            thresh = max(small, abs(epsilon * y_))
-            # Initialize absek1 - the absolute error from the last iteration
-            #    Using +infty will force the error reduction criterion to be met
-            abs_ek1 = float('inf')
-            fail = True
-            for count in range(N):
-                ## CALL THE PROPERTY FUNCTION ##
-                yk = prop(T=Tk,p=p_)
-                # Calculate error
-                ek = yk-y_
-                abs_ek = abs(ek)
-                # Test for convergence
-                if abs_ek < thresh:
-                    T_[...] = Tk
-                    fail = False
-                    break
-                # If the error did not reduce from the last iteration
-                elif abs_ek > abs_ek1:
-                    dT /= 2.
-                    Tk = Tk1 + dT
-                # Continue normal iteration
+        value = np.asarray(value, dtype=float)
+        p = np.asarray(p, dtype=float)
+        shape = np.broadcast(value, p).shape
+        y = np.broadcast_to(value, shape).flatten()
+        pp = np.broadcast_to(p, shape).flatten()
+
+        # Build the initial guess
+        p0 = pyro.config['def_p']
+        Tmid = 0.5*(Tmin + Tmax)
+        Tgrid = np.linspace(Tmin, Tmax, 17)
+        ygrid = prop(T=Tgrid, p=p0)
+        shift = np.broadcast_to(prop(T=Tmid, p=p) - prop(T=Tmid, p=p0), 
+                shape).flatten()
+        Tk = np.interp(y - shift, ygrid, Tgrid)
+
+        # Use Tk as the iteration parameter.  Tk1 and abs_ek1 are the 
+        # temperature and absolute error from the last successful step.
+        Tk1 = Tk.copy()
+        dT = np.zeros_like(Tk)
+        abs_ek1 = np.full_like(Tk, float('inf'))
+        # Calculate an error threshold
+        thresh = np.maximum(small, np.abs(epsilon * y))
+        # The indices of the elements still being iterated
+        ii = np.arange(y.size)
+        for count in range(N):
+            ## CALL THE PROPERTY FUNCTION ##
+            ek = prop(T=Tk[ii], p=pp[ii]) - y[ii]
+            abs_ek = np.abs(ek)
+            # Test for convergence
+            go = ~(abs_ek < thresh[ii])
+            # If the error did not reduce from the last iteration
+            worse = go & (abs_ek > abs_ek1[ii])
+            jj = ii[worse]
+            dT[jj] /= 2.
+            Tk[jj] = Tk1[jj] + dT[jj]
+            # Continue normal iteration
+            normal = go & ~worse
+            jj = ii[normal]
+            abs_ek1[jj] = abs_ek[normal]
+            Tk1[jj] = Tk[jj]
+            dT[jj] = -ek[normal] / dprop(T=Tk[jj], p=pp[jj])
+            Tk[jj] = Tk1[jj] + dT[jj]
+            # Shrink the increment until Tk is contained in the limits
+            ii = ii[go]
+            jj = ii[(Tk[ii] < Tmin) | (Tk[ii] > Tmax)]
+            while jj.size:
+                dT[jj] /= 2.
+                Tk[jj] = Tk1[jj] + dT[jj]
+                jj = jj[(Tk[jj] < Tmin) | (Tk[jj] > Tmax)]
+            if not ii.size:
+                return Tk.reshape(shape)
+        raise pyro.utility.PMAnalysisError('_invT() failed to converge!')
+
+
+    def _dsdT(self, T=None, p=None):
+        """Derivative of entropy with respect to temperature
+    dsdT = _dsdT(T,p)
+
+This is an internal service method used by T_s.  At constant pressure,
+ds/dT = cp/T, where T is the absolute temperature.
+
+Accepts unit_temperature
+        unit_pressure
+Returns unit_energy / unit_matter / unit_temperature**2
+"""
+        if T is None:
+            T = pyro.config['def_T']
+        # The absolute temperature in units of unit_temperature
+        Tabs = pyro.units.temperature(
+                pyro.units.temperature_scale(T, to_units='K'), from_units='K')
+        return self.cp(T,p) / Tabs
+
+
+    def _merge(self):
+        """Return the merged mixture polynomial
+    Tlim, A, fatal = _merge()
+
+Tlim is an array of the temperature range limits in K, and A is an 
+array with one row of coefficients per range in the common form used by
+the pyromat.bank module (see pyromat.bank._coef).  The coefficients are
+the mole-weighted sums of the constituents' coefficients, so they 
+represent the mixture in kJ, kmol, and K.  The limits are the union of 
+all of the constituents' range limits.  There are 2*len(Tlim)+1 rows.
+Row 2*k+1 is for the temperature Tlim[k], and the even rows are for the
+ranges between them, starting with the temperatures below Tlim[0] and 
+ending with those above Tlim[-1].
+
+Like the constituents' own methods, an ig2 species contributes nothing
+where it is out of range, so a row may be only partly filled, or all
+zero.  Where any ig species is out of range, its methods raise an 
+exception instead.  fatal is a boolean array with True for those rows.
+
+If any of the constituents is not in the ig or ig2 class, all three are
+None, and the properties are calculated by calling the constituents' 
+methods.
+
+The result is kept in a cache keyed by the composition, so mixtures of
+the same composition share it.  Cache entries are discarded if the 
+constituent species have been replaced in the data dictionary (e.g. by
+pyromat.dat.reload()).
+"""
+        if self._key is None:
+            self._key = tuple(sorted(self.X().items()))
+        key = self._key
+        species = tuple([pyro.dat.data[ss] for ss,x in key])
+        cached = _merged.get(key)
+        if cached is not None and all(
+                [aa is bb for aa,bb in zip(cached[0], species)]):
+            return cached[1]
+
+        if [ss for ss in species if ss.data['class'] not in ('ig', 'ig2')]:
+            poly = (None, None, None)
+        else:
+            # The bank module is only imported when it is first needed
+            from pyromat import bank
+            coef = [bank._coef(ss.data) for ss in species]
+            # The union of all of the breakpoints
+            Tlim = set()
+            for tt,A in coef:
+                Tlim.update(tt)
+            Tlim = np.array(sorted(Tlim), dtype=float)
+            # The constituents disagree on which range a breakpoint belongs
+            # to, so each breakpoint gets a row of its own.  Even rows are
+            # for the open ranges between them, including those below and
+            # above all of the limits.
+            Trow = np.empty((2*Tlim.size + 1,), dtype=float)
+            Trow[1::2] = Tlim
+            Trow[2:-1:2] = 0.5*(Tlim[1:] + Tlim[:-1])
+            Trow[0] = Tlim[0] - 1.
+            Trow[-1] = Tlim[-1] + 1.
+            A = np.zeros((Trow.size, 8), dtype=float)
+            fatal = np.zeros((Trow.size,), dtype=bool)
+            # Find each constituent's range the same way its own class does
+            for ss,(sid,x),(tt,aa) in zip(species, key, coef):
+                tt = np.asarray(tt, dtype=float)
+                if ss.data['class'] == 'ig':
+                    index = np.searchsorted(tt, Trow) - 1
+                    index = np.where(Trow == tt[0], 0, index)
                 else:
-                    # Shift out the old values
-                    abs_ek1 = abs_ek
-                    Tk1 = Tk
-                    ## ESTIMATE THE DERIVATIVE ##
-                    dT = max(small, epsilon*Tk)    # Make a small perturbation
-                    dydx = (prop(T=Tk+dT,p=p_) - yk)/dT
-                    # Calculate the next step size
-                    dT = -ek / dydx
-                    # Produce a tentative next value
-                    Tk = Tk1 + dT
-                    # Test the guess for containment in the temperature limits
-                    # Shrink the increment until Tk is contained
-                    while Tk<Tmin or Tk>Tmax:
-                        dT /= 2.
-                        Tk = Tk1 + dT
-            if fail:
-                raise pyro.utility.PMAnalysisError('_invT() failed to converge!')
-        return it.operands[0]
+                    index = ss._crange(Trow)
+                inside = (index >= 0) & (index < tt.size-1)
+                A[inside] += x * np.asarray(aa, dtype=float)[index[inside]]
+                if ss.data['class'] == 'ig':
+                    fatal |= ~inside
+            poly = (Tlim, A, fatal)
+
+        if len(_merged) >= _MERGED_MAX:
+            _merged.clear()
+        _merged[key] = (species, poly)
+        return poly
+
+
+    def _eval(self, T, p, prop):
+        """Evaluate the merged polynomial
+    out = _eval(T, p, prop)
+
+T and p are in the user units, and prop is 'cp', 'h', or 's'.  Returns
+the property of the mixture in kJ/kmol/K or kJ/kmol and the absolute 
+temperature in K.  The entropy includes the pressure.  Raises a 
+PMParamError if any of the temperatures is out of range for an ig 
+constituent (see _merge()).
+"""
+        Tlim,A,fatal = self._merge()
+        if T is None:
+            T = pyro.config['def_T']
+        if p is None:
+            p = pyro.config['def_p']
+        T = pyro.units.temperature_scale(np.asarray(T, dtype=float), to_units='K')
+        p = pyro.units.pressure(np.asarray(p, dtype=float), to_units='bar')
+        T,p = np.broadcast_arrays(T,p)
+        if T.ndim == 0:
+            T = np.reshape(T, (1,))
+            p = np.reshape(p, (1,))
+
+        # NaN sorts to the end, so it is above all of the ranges
+        index = np.searchsorted(Tlim, T)
+        index = 2*index + (Tlim[np.minimum(index, Tlim.size-1)] == T)
+        bad = fatal[index]
+        if bad.any():
+            Tmin,Tmax = pyro.units.temperature_scale(
+                    np.array(self.Tlim(), dtype=float), to_units='K')
+            raise pyro.utility.PMParamError(
+                'Temperature, %f, is out of range for %s (%f to %f)'%(
+                T[bad].flat[0], self.data['id'], Tmin, Tmax))
+        C = A.T[:, index]
+        # Temperatures at or below zero are always out of range, where the
+        # coefficients are zero.  Keep their reciprocal and log terms finite.
+        Tr = np.where(T > 0., T, 1.)
+        if prop == 'cp':
+            out = C[5]*T + C[4]
+            for c in C[3:0:-1]:
+                out *= T
+                out += c
+            out += C[0]/Tr/Tr
+        elif prop == 'h':
+            out = C[5]/5.*T + C[4]/4.
+            for kk in [3,2]:
+                out *= T
+                out += C[kk]/kk
+            out *= T
+            out += C[1]
+            out *= T
+            out += C[6] - C[0]/Tr
+        else:
+            out = C[5]/4.*T + C[4]/3.
+            out *= T
+            out += C[3]/2.
+            out *= T
+            out += C[2]
+            out *= T
+            out += C[7] + C[1]*np.log(Tr) - C[0]/Tr/Tr/2.
+            # The ig and ig2 reference pressures are both 1 bar
+            out -= pyro.units.const_Ru * np.log(p)
+        return out, T
+
+
+    def _scale(self, out, temperature=False):
+        """Convert a result of _eval() to the user units
+    out = _scale(out, temperature=False)
+"""
+        pyro.units.energy(out, from_units='kJ', inplace=True)
+        pyro.units.matter(out, self._mw(), from_units='kmol', exponent=-1, 
+                inplace=True)
+        if temperature:
+            pyro.units.temperature(out, from_units='K', exponent=-1, 
+                    inplace=True)
+        return out
+
+
+    def _mw(self):
+        """Molecular weight in kg/kmol"""
+        X = self.X()
+        return sum([X[ss]*pyro.dat.data[ss].data['mw'] for ss in X])
 
 
     def Tlim(self):
@@ -147,6 +354,9 @@ Returns unit_temperature
     #
     def cp(self,T=None,p=None):
         """A function for calculating constant-pressure specific heat."""
+        if self._merge()[0] is not None:
+            out = self._eval(T, p, 'cp')[0]
+            return self._scale(out, temperature=True)
         out = 0.
         # If matter is configured to mass, weight by mass
         if pyro.config['unit_matter'] in pyro.units.mass:
@@ -160,6 +370,9 @@ Returns unit_temperature
 
     def cv(self,T=None,p=None):
         """A function for calculating constant-volume specific heat."""
+        if self._merge()[0] is not None:
+            out = self._eval(T, p, 'cp')[0] - pyro.units.const_Ru
+            return self._scale(out, temperature=True)
         out = 0.
         # If matter is configured to mass, weight by mass
         if pyro.config['unit_matter'] in pyro.units.mass:
@@ -181,6 +394,9 @@ Returns unit_temperature
 
     def h(self,T=None,p=None):
         """A function for calculating enthalpy."""
+        if self._merge()[0] is not None:
+            out = self._eval(T, p, 'h')[0]
+            return self._scale(out)
         out = 0.
         # If matter is configured to mass, weight by mass
         if pyro.config['unit_matter'] in pyro.units.mass:
@@ -194,6 +410,10 @@ Returns unit_temperature
 
     def e(self,T=None,p=None):
         """A function for calculating internal energy."""
+        if self._merge()[0] is not None:
+            out,T = self._eval(T, p, 'h')
+            out -= pyro.units.const_Ru*T
+            return self._scale(out)
         out = 0.
         # If matter is configured to mass, weight by mass
         if pyro.config['unit_matter'] in pyro.units.mass:
@@ -215,6 +435,9 @@ Returns unit_temperature
 
     def s(self,T=None,p=None):
         """A function for calculating entropy."""
+        if self._merge()[0] is not None:
+            out = self._eval(T, p, 's')[0]
+            return self._scale(out, temperature=True)
         out = 0.
         # If matter is configured to mass, weight by mass
         if pyro.config['unit_matter'] in pyro.units.mass:
@@ -309,7 +532,7 @@ Accepts unit_energy / unit_matter / unit_temperature
         unit_pressure
 Returns unit_temperature
 """
-        return self._invT(s, self.s, p)
+        return self._invT(s, self.s, self._dsdT, p)
 
 
     def T_h(self,h,p=None):
@@ -324,5 +547,5 @@ Accepts unit_energy / unit_matter / unit_temperature
         unit_pressure
 Returns unit_temperature
 """
-        return self._invT(h, self.h, p)
+        return self._invT(h, self.h, self.cp, p)
 
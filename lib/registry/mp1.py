@@ -200,13 +200,111 @@ There are also the typical mandatory PYroMat meta data elements:
 id              What substance is this?
 doc             Where did it come from?
 class           What class should be used to evaluate the data?
+
+--- COMPILED COEFFICIENTS ---
+When an MP1 instance is created, the polynomial coefficient lists of 
+the ARgroup, AOgroup, PSgroup, DSLgroup, and DSVgroup are compiled into
+arrays of exponents and coefficients (see _compile1() and _compile2()).
+The compiled forms are kept in the _compiled dictionary, and they are
+what the inner routines pass to _poly1() and _poly2().  If the data 
+dictionary is modified, the _compile() method must be called again.
 """
         
+    def __init__(self,*arg,**kwarg):
+        # Call the basedata class
+        super(mp1,self).__init__(*arg,**kwarg)
+        self._compile()
+
 
+    def _compile(self):
+        """Compile the polynomial coefficient groups
+    _compile()
 
-    def _poly2(self,x,y,group,diff=2):    
+Builds the _compiled dictionary from the data dictionary.  The keys are
+'AR' for all of the ARgroup coef0 groups (compiled together by 
+_compile2()), and 'AO', 'PS', 'DSL', and 'DSV' for the AOgroup coef0 and
+the saturation fit coef lists (compiled by _compile1()).  Groups that
+are not in the data are omitted.
+"""
+        self._compiled = {}
+        if 'ARgroup' in self.data:
+            self._compiled['AR'] = self._compile2(self.data['ARgroup']['coef0'])
+        if 'coef0' in self.data.get('AOgroup', {}):
+            self._compiled['AO'] = self._compile1(self.data['AOgroup']['coef0'])
+        for key in ['PS', 'DSL', 'DSV']:
+            if key + 'group' in self.data:
+                self._compiled[key] = self._compile1(
+                        self.data[key + 'group']['coef'])
+
+
+    def _compile1(self, group):
+        """Compile a coefficient list for _poly1()
+    compiled = _compile1(group)
+
+GROUP is a coefficient list in the format described by _poly1().  The
+pre- and post- exponents are folded into the exponent of each term, 
+    x**post * (x**pre)**pow = x**(post + pre*pow)
+and terms with zero coefficients are dropped.  Returns a tuple,
+(e, C), where e is an array of the K exponents, and C is a (K,3) array
+whose columns are the coefficients of x**e in p, x*px, and x**2*pxx.
+"""
+        e = []
+        c = []
+        for coef in group:
+            pre = coef[0]
+            post = coef[1]
+            for power,value in coef[2:]:
+                if value:
+                    e.append(post + pre*power)
+                    c.append(value)
+        e = np.array(e, dtype=float)
+        c = np.array(c, dtype=float)
+        C = np.array([c, c*e, c*e*(e-1.)]).reshape((3,-1)).T
+        return e, C
+
+
+    def _compile2(self, groups):
+        """Compile a list of coefficient lists for _poly2()
+    compiled = _compile2(groups)
+
+GROUPS is a list of G coefficient lists, each in the format described 
+by _poly2(); for example, the ARgroup 'coef0' list.  The pre- and post-
+exponents are folded into the exponents of each term, and terms with
+zero coefficients are dropped.  Returns a tuple,
+    (ux, ix, uy, iy, C)
+ux and uy are arrays of the unique x- and y-exponents, and ix and iy 
+index them for each of the K terms.  C is a (K,6,G) array.  Its rows 
+are the coefficients of x**ex * y**ey in p, x*px, y*py, x**2*pxx, 
+x*y*pxy, and y**2*pyy, and the last dimension identifies the group.
+"""
+        ex = []
+        ey = []
+        c = []
+        g = []
+        for gg,group in enumerate(groups):
+            for coef in group:
+                prex,prey = coef[0]
+                postx,posty = coef[1]
+                for powx,powy,value in coef[2:]:
+                    if value:
+                        ex.append(postx + prex*powx)
+                        ey.append(posty + prey*powy)
+                        c.append(value)
+                        g.append(gg)
+        ex = np.array(ex, dtype=float)
+        ey = np.array(ey, dtype=float)
+        c = np.array(c, dtype=float)
+        ux,ix = np.unique(ex, return_inverse=True)
+        uy,iy = np.unique(ey, return_inverse=True)
+        C = np.zeros((c.size, 6, len(groups)), dtype=float)
+        C[np.arange(c.size), :, np.array(g, dtype=int)] = np.array([
+                c, c*ex, c*ey, c*ex*(ex-1.), c*ex*ey, c*ey*(ey-1.)]).reshape((6,-1)).T
+        return ux, ix.ravel(), uy, iy.ravel(), C
+
+
+    def _poly2(self,x,y,group,diff=2,split=False):    
         """Polynomial evaluation
-(p, px, py, pxx, pxy, pyy) = _poly(x,y,coef,diff=2)
+(p, px, py, pxx, pxy, pyy) = _poly2(x,y,coef,diff=2,split=False)
 
 Evaluates a polynomial on x and y and its derivatives.
 x       x value
@@ -278,172 +376,44 @@ The pre- and post- exponents make this equivalent to
     p(x,y) = x**(-1.5) (xx**10 + 1)
 which is equivalent to the original polynomial, except that the core of
 the evaluation algorithm only operates on positive integers.
-"""
-    
-        g = 0.  # total group
-        gx = 0.
-        gy = 0.
-        gxx = 0.
-        gxy = 0.
-        gyy = 0.
 
-        for coef in group:
-            # initialize the final polynomial and its derivatives
-            p = 0.  # total polynomial
-            px = 0.
-            py = 0.
-            pxx = 0.
-            pxy = 0.
-            pyy = 0.
-            
-            # collect the pre- and post-exponentials
-            prex,prey = coef[0]
-            postx,posty = coef[1]
-            
-            # Apply the pre-exponentials
-            if prex!=1.:
-                x_0 = x**prex
-                if diff>0:
-                    x_1 = x_0*prex/x
-                else:
-                    x_1 = 0.
-                if diff>1:
-                    x_2 = x_1*(prex-1.)/x
-                else:
-                    x_2 = 0.
-            else:
-                x_0 = x
-                x_1 = 1.
-                x_2 = 0.
-                
-            if prey!=1.:
-                y_0 = y**prey
-                if diff>0:
-                    y_1 = y_0*prey/y
-                else:
-                    y_1 = 0.
-                if diff>1:
-                    y_2 = y_1*(prey-1.)/y
-                else:
-                    y_2 = 0.
-            else:
-                y_0 = y
-                y_1 = 1.
-                y_2 = 0.
-
-            # From here, we loop over terms of the form a*(x**ii)*(y**jj)
-            # If a particular ii,jj combination is not found in the data, then
-            # its coefficient is treated as zero.
-            # What is the largest ii?
-            II = coef[2][0]
-            
-            # On which coefficient are we currently operating?
-            index = 2
-            # This is a flag that indicates the active index was used in 
-            # the last loop, so it needs to be incremented.
-            
-            for ii in range(II,-1,-1):
-                # If the current x-exponent is the same one represented in
-                # the active coefficient row, then calculate q.
-                if index<len(coef) and coef[index][0] == ii:
-                    # For this value of ii, what is the largest jj?
-                    JJ = coef[index][1]
-                    # q is a sub-polynomial on y that represents the 
-                    # variation on y of all terms that share the same
-                    # power in x.  This inner loop is much like the loop
-                    # on ii, except that it looks at both the x and y 
-                    # exponents.
-                    q = 0
-                    qy = 0
-                    qyy = 0
-                    for jj in range(JJ,-1,-1):
-                        if diff > 1:
-                            qyy = 2*qy + y_0*qyy
-                        if diff > 0:
-                            qy = q + y_0*qy
-                        # If the current y-exponent is represented in the 
-                        # active coefficient row, then fold it into the q
-                        # expansion.
-                        if index<len(coef) and coef[index][0] == ii and coef[index][1] == jj:
-                            q = coef[index][2] + y_0*q
-                            # increment the active index
-                            index += 1
-                        else:
-                            q *= y_0
-                        
-                    # Fold the current q values into the p expansion
-                    # Update the highest derivatives first since they depend
-                    # on the historical values of the lower derivatives
-                    if diff > 1:
-                        pyy = qyy + x_0 * pyy
-                        pxx = 2*px + x_0 * pxx
-                        pxy = py + x_0 * pxy
-                    if diff > 0:
-                        px = p + x_0 * px
-                        py = qy + x_0 * py
-                    p = q + x_0 * p
-                # If the current x exponent is not represented, execute a
-                # p-expansion with zero q.
-                else:
-                    if diff > 0:
-                        if diff > 1:
-                            pyy = x_0 * pyy
-                            pxx = 2*px + x_0 * pxx
-                            pxy = py + x_0 * pxy
-                        px = p + x_0 * px
-                        py = x_0 * py
-                    p = x_0 * p
-                    
-            # Modify the derivatives for the pre-exponnetials
-            if prex!=1.:
-                if diff>0:
-                    if diff>1:
-                        pxx = pxx*x_1*x_1 + px*x_2
-                        pyy = pyy*y_1*y_1 + py*y_2
-                        pxy = pxy*x_1*y_1
-                    px *= x_1
-                    py *= y_1
-                
-            # Apply the post-exponentials
-            if postx!=0:
-                f = x**postx
-                if diff>0:
-                    fx = postx*f/x
-                    if diff>1:
-                        fxx = fx*(postx-1)/x
-                        pxx = pxx*f + 2.*px*fx + p*fxx
-                        pyy = pyy*f
-                        pxy = pxy*f + py*fx
-                    px = px*f + p*fx
-                    py = py*f
-                p *= f
-            if posty!=0:
-                f = y**posty
-                if diff>0:
-                    fy = posty*f/y
-                    if diff>1:
-                        fyy = fy*(posty-1)/y
-                        pyy = pyy*f + 2.*py*fy + p*fyy
-                        pxx = pxx*f
-                        pxy = pxy*f + px*fy
-                    py = py*f + p*fy
-                    px = px*f
-                p *= f
-            
-            # If the group has only one coefficient set, just return
-            if len(group) == 1:
-                return p,px,py,pxx,pxy,pyy
-                
-            g += p
-            if diff>0:
-                gx += px
-                gy += py
-                if diff>1:
-                    gxx += pxx
-                    gxy += pxy
-                    gyy += pyy
-                    
-        return g,gx,gy,gxx,gxy,gyy
+GROUP may also be the tuple returned by _compile2(), which is how the 
+inner routines call _poly2().  A raw coefficient list is compiled on 
+every call.  The compiled terms are evaluated together; the powers of x
+and y are evaluated once for each unique exponent, and the polynomial 
+and all of its derivatives are formed by a single matrix product.
+
+When the compiled tuple was built from more than one coefficient list,
+their results are added together unless SPLIT is True.  Then, each of
+the returned values has an extra first dimension with one element per 
+list.  _ar() uses this to apply a different exponential to each list.
+"""
+        if not isinstance(group, tuple):
+            group = self._compile2([group])
+        ux,ix,uy,iy,C = group
+        x,y = np.broadcast_arrays(np.asarray(x, dtype=float), 
+                np.asarray(y, dtype=float))
+        shape = x.shape
+
+        # Evaluate every term, x**ex * y**ey, with one row per term
+        P = (x.reshape((1,-1))**ux[:,np.newaxis])[ix] * \
+                (y.reshape((1,-1))**uy[:,np.newaxis])[iy]
+        nd = [1,3,6][max(0,min(diff,2))]
+        K,_,G = C.shape
+        R = np.dot(C[:,:nd,:].reshape((K, nd*G)).T, P).reshape((nd,G) + shape)
+        if not split:
+            R = R.sum(axis=1)
+
+        p = R[0]
+        px = py = pxx = pxy = pyy = 0.
+        if diff>0:
+            px = R[1]/x
+            py = R[2]/y
+            if diff>1:
+                pxx = R[3]/(x*x)
+                pxy = R[4]/(x*y)
+                pyy = R[5]/(y*y)
+        return p,px,py,pxx,pxy,pyy
 
 
     def _poly1(self,x,group,diff=2):    
@@ -512,98 +482,29 @@ In a simple example, the polynomial,
     
 might be specified
 [[  0.5, -1.5, [0, 2.], [4, -1.]]]
-"""
-        g = 0.
-        gx = 0.
-        gxx = 0.
-    
-        for coef in group:
-            # initialize the final polynomial and its derivatives
-            p = 0.  # total polynomial
-            px = 0.
-            pxx = 0.
 
-            # collect the pre- and post-exponentials
-            pre = coef[0]
-            post = coef[1]
-            
-            # Apply the pre-exponentials
-            if pre!=1.:
-                x_0 = x**pre
-                if diff>0:
-                    x_1 = x_0*pre/x
-                else:
-                    x_1 = 0.
-                if diff>1:
-                    x_2 = x_1*(pre-1.)/x
-                else:
-                    x_2 = 0.
-            else:
-                x_0 = x
-                x_1 = 1.
-                x_2 = 0.
-
-            # From here, we loop over terms of the form a*(x**ii)
-            # If a particular ii,jj combination is not found in the data, then
-            # its coefficient is treated as zero.
-            # What is the largest ii?
-            II = coef[2][0]
-            
-            # On which coefficient are we currently operating?
-            index = 2
-            # This is a flag that indicates the active index was used in 
-            # the last loop, so it needs to be incremented.
-            
-            for ii in range(II,-1,-1):
-                # If the current x-exponent is the same one represented in
-                # the active coefficient row, then calculate q.
-                if index<len(coef) and coef[index][0] == ii:
-                    # Fold the current coefficient into the p expansion
-                    # Update the highest derivatives first since they depend
-                    # on the historical values of the lower derivatives
-                    if diff>0:
-                        if diff > 1:
-                            pxx = 2*px + x_0 * pxx
-                        px = p + x_0 * px
-                    p = coef[index][1] + x_0 * p
-                    index += 1
-                # If the current x exponent is not represented, execute a
-                # p-expansion with zero q.
-                else:
-                    if diff > 0:
-                        if diff > 1:
-                            pxx = 2*px + x_0 * pxx
-                        px = p + x_0 * px
-                    p = x_0 * p
-                    
-            # Modify the derivatives for the pre-exponnetials
-            if pre!=1.:
-                if diff>0:
-                    if diff>1:
-                        pxx = pxx*x_1*x_1 + px*x_2
-                    px *= x_1
-                
-            # Apply the post-exponentials
-            if post!=0:
-                f = x**post
-                if diff>0:
-                    fx = post*f/x
-                    if diff>1:
-                        fxx = fx*(post-1)/x
-                        pxx = pxx*f + 2.*px*fx + p*fxx
-                    px = px*f + p*fx
-                p *= f
-
-            if len(group)==1:
-                return p,px,pxx
-
-            g += p
-            if diff>0:
-                gx += px
-                if diff>1:
-                    gxx += pxx
-                    
-        return g,gx,gxx
+GROUP may also be the tuple returned by _compile1(), which is how the 
+inner routines call _poly1().  A raw coefficient list is compiled on 
+every call.  The terms are evaluated together, and the polynomial and
+its derivatives are formed by a single matrix product.
+"""
+        if not isinstance(group, tuple):
+            group = self._compile1(group)
+        e,C = group
+        x = np.asarray(x, dtype=float)
+
+        # Evaluate every term, x**e, with one row per term
+        P = x.reshape((1,-1))**e[:,np.newaxis]
+        nd = [1,2,3][max(0,min(diff,2))]
+        R = np.dot(C[:,:nd].T, P).reshape((nd,) + x.shape)
+
+        p = R[0]
+        px = pxx = 0.
+        if diff>0:
+            px = R[1]/x
+            if diff>1:
+                pxx = R[2]/(x*x)
+        return p,px,pxx
     
     
     def _iter1(self, fn, prop, y, x, Ids, xmin, xmax,
@@ -797,7 +698,7 @@ nondimensionalized, and the returned values are non-dimensionalzied.
                     
         # Move on to the polynomial expansion
         if 'coef0' in self.data['AOgroup']:
-            p,pt,ptt = self._poly1(tt,self.data['AOgroup']['coef0'],diff)
+            p,pt,ptt = self._poly1(tt,self._compiled['AO'],diff)
             A+=p
             if diff>0:
                 At += pt
@@ -834,23 +735,22 @@ Returns the Helmholtz free energy and its derivatives up to diff.
 This is a PRIMATIVE ROUTINE.  The arguments must already be 
 nondimensionalized, and the returned values are non-dimensionalzied.
 """
-        # Sparse polynomial evaluation is roughly 2x as fast as dense
-        # polynomial evaluation for the R134a polynomials.  The 
-        # explicitly defined algorithm is also roughly 2x as fast.  the
-        # p_d() algorithm for R134a evaluated in about 80us on a 4 core
-        # AMD A10-9700B R7
-
         ARgroup = self.data['ARgroup']
 
-        # First evaluate the polynomial without an exponential coefficient
-        A,At,Ad,Att,Atd,Add = self._poly2(tt,dd,ARgroup['coef0'][0],diff)
+        # Evaluate all of the polynomials at once.  The results have a
+        # first dimension with one element per polynomial.
+        P = self._poly2(tt,dd,self._compiled['AR'],diff,split=True)
+        # Start with the polynomial without an exponential coefficient
+        A,At,Ad,Att,Atd,Add = [
+                (this[0] if diff>=order else 0.)
+                for order,this in zip([0,1,1,2,2,2], P)]
         
-        k=0
         ddk = 1.
-        for term in ARgroup['coef0'][1:]:
-            p,pt,pd,ptt,ptd,pdd = self._poly2(tt, dd, term, diff)
+        for k in range(1, len(ARgroup['coef0'])):
+            p,pt,pd,ptt,ptd,pdd = [
+                    (this[k] if diff>=order else 0.)
+                    for order,this in zip([0,1,1,2,2,2], P)]
             
-            k += 1
             ddk *= dd
             e = np.exp(-ddk)
             if diff>0:
@@ -1055,7 +955,7 @@ fn is an integer indicating which property fit form to use
         d,dt,dtt = self._satfit( 
                 T/Tscale,
                 self.data['DSVgroup']['fn'],
-                self.data['DSVgroup']['coef'],
+                self._compiled['DSV'],
                 diff)
         # Rescale 
         d *= dscale
@@ -1078,7 +978,7 @@ fn is an integer indicating which property fit form to use
         d,dt,dtt = self._satfit( 
                 T/Tscale,
                 self.data['DSLgroup']['fn'],
-                self.data['DSLgroup']['coef'],
+                self._compiled['DSL'],
                 diff)
         # Rescale 
         d *= dscale
@@ -1103,7 +1003,7 @@ Presumes temperature is in Kelvin, reports pressure in Pa
         p,pt,ptt = self._satfit( 
                 T/Tscale,
                 self.data['PSgroup']['fn'],
-                self.data['PSgroup']['coef'],
+                self._compiled['PS'],
                 diff)
         # Rescale 
         p *= pscale
@@ -13,6 +13,9 @@ Chris Martin (c) 2015,2017
 
 import json
 import sys
+import re
+import struct
+import itertools
 import numpy as np
 import os
 import time
@@ -192,6 +195,9 @@ if pyro.config['version'].split('.')[0] < 2:
         data_dir = os.path.join( install_dir, 'data')
         reg_dir = os.path.join( install_dir, 'registry')
 
+        # Load timing for each configuration file (see pyromat.startup_report)
+        self.stats = []
+
         self.entries = {
             'install_dir': PMConfigEntry(default=install_dir, write=False, etype=str),
             'version' : PMConfigEntry(default=pyro.__version__, write=False, etype=str),
@@ -202,10 +208,20 @@ if pyro.config['version'].split('.')[0] < 2:
             'dat_overwrite' : PMConfigEntry(default=True, etype=bool),
             'dat_exist_fatal' : PMConfigEntry(default=False, etype=bool),
             'dat_recursive' : PMConfigEntry(default=True, etype=bool),
+            'dat_lazy' : PMConfigEntry(default=False, etype=bool),
+            'dat_cache' : PMConfigEntry(default='', etype=str),
+            'dat_workers' : PMConfigEntry(default=1, etype=int),
+            'dat_pool' : PMConfigEntry(default='thread', etype=str),
+            'dat_manifest' : PMConfigEntry(default=False, etype=bool),
+            'dat_include' : PMConfigEntry(default='', etype=str),
+            'dat_exclude' : PMConfigEntry(default='', etype=str),
+            'dat_thread' : PMConfigEntry(default=False, etype=bool),
+            'dat_store' : PMConfigEntry(default='', etype=str),
             'reg_dir' : PMConfigEntry(default=reg_dir, append=True, etype=str),
             'reg_verbose' : PMConfigEntry(default=True, etype=bool),
             'reg_overwrite' : PMConfigEntry(default=True, etype=bool),
             'reg_exist_fatal' : PMConfigEntry(default=False, etype=bool),
+            'reg_lazy' : PMConfigEntry(default=False, etype=bool),
             'def_T' : PMConfigEntry(default=298.15, etype=float),
             'def_p' : PMConfigEntry(default=1.01325, etype=float),
             'unit_force' : PMConfigEntry(default='N', etype=str),
@@ -271,6 +287,7 @@ Checks for unrecognized parameters and illegal values.
 
             lead += '   '
 
+            tic = time.time()
             temp_config = {}
             with open(filename,'r') as ff:
                 exec(compile(ff.read(),filename,'exec'),{},temp_config)
@@ -280,6 +297,8 @@ Checks for unrecognized parameters and illegal values.
             # execfile(filename,globals(),temp_config)
 
             self.update(temp_config)
+            self.stats.append({'file':filename, 'time':time.time()-tic, 
+                    'entries':len(temp_config)})
             if verbose:
                 message = 'Found entries: '
                 for item in temp_config:
@@ -482,11 +501,15 @@ Suppress the default data check by setting the 'test'
 keyword to False.
 Suppress printing errors to stdout by setting the 
 'verbose' keyword to False.
+
+Files with the .hpb extension are read as binary data 
+files (see save_file()).  All others are read as JSON.
 """
 
+    binary = filename.endswith('.hpb')
     # open the file
     try:
-        fil = open(filename,'r')
+        fil = open(filename,'rb' if binary else 'r')
     except:
         print_error(
 'Failed to open file ' + repr(filename) + 
@@ -495,7 +518,10 @@ Suppress printing errors to stdout by setting the
 
     # parse the file
     try:
-        readin = json.load(fil)
+        if binary:
+            readin = _hpb_read(fil)
+        else:
+            readin = json.load(fil)
     except:
         print_error('Could not parse file ' + repr(filename) + 
             '. Try replacing the file from a fresh installation.')
@@ -524,10 +550,285 @@ repr(mh) + '.')
 
 
 
+# peek_file() reads the data files in blocks of this many bytes, and it
+# stops as soon as it has found the 'id' and 'class' entries.
+_PEEK_BLOCK = 4096
+_PEEK_KEYS = [(key, re.compile(b'"' + key.encode('utf-8') + 
+        br'"\s*:\s*("(?:[^"\\]|\\.)*")')) for key in ('id', 'class')]
+
+def peek_file(filename):
+    """Read the id and class of a data file without parsing it
+    readin = peek_file(filename)
+
+Returns a dictionary with only the 'id' and 'class' entries of the data
+file.  Rather than parsing the entire JSON file, the raw bytes are 
+scanned for the two keys, and the file is only read as far as it takes
+to find them.  If either key cannot be found, a PMFileError is raised, 
+and the caller should fall back on load_file().
+
+Opening and reading the file cost about as much as parsing a small data
+file, so peek_file() is only a little faster than load_file().  To 
+avoid opening the data files at all, use a manifest (see the 
+'dat_manifest' configuration parameter).
+"""
+    readin = {}
+    try:
+        with open(filename,'rb') as fil:
+            if filename.endswith('.hpb'):
+                # The binary header is JSON, but it is small
+                header = _hpb_header(fil)[0]['data']
+                return {'id':header['id'], 'class':header['class']}
+            text = b''
+            while len(readin) < len(_PEEK_KEYS):
+                block = fil.read(_PEEK_BLOCK)
+                if not block:
+                    break
+                text += block
+                for key,pattern in _PEEK_KEYS:
+                    if key not in readin:
+                        found = pattern.search(text)
+                        if found is not None:
+                            readin[key] = json.loads(
+                                    found.group(1).decode('utf-8'))
+    except PMFileError:
+        raise
+    except:
+        print_error(
+'Failed to open file ' + repr(filename) + 
+'. The file does not exist, or there may be a permissions problem.')
+        raise PMFileError(filename)
+
+    if len(readin) < len(_PEEK_KEYS):
+        raise PMFileError(filename)
+    return readin
+
+
+
+
+
+
+
 
 
+def save_file(filename, data, binary=None):
+    """Write a data dictionary to a data file
+    save_file(filename, data)
+        or
+    save_file(filename, data, binary=True)
+
+When the file name has the .hpb extension, the data are written in the
+PYroMat binary format.  Otherwise, they are written as JSON.  The binary
+keyword overrides the file name extension when it is True or False.
+
+The binary format begins with a fixed 16-byte header: the four bytes 
+b'HPB2', then the length of a JSON header and the number of values in 
+the numeric block, and a reserved zero, each a little-endian 32-bit 
+unsigned integer.  The JSON header has two entries.  'data' is the data
+dictionary, but every rectangular list of only floats (like the 'C' and
+'Tlim' coefficients) is replaced by null.  'arrays' lists the location 
+of each of them as [path, start, stop, shape], where path is the list 
+of keys leading to the array.  All of the arrays are flattened into one 
+contiguous block of little-endian float64 values that follows the JSON 
+header on an 8-byte boundary, and start and stop are positions in the 
+block.  When the file is read by load_file(), the file is read with 
+one call, and the arrays are read-only numpy views of the block, so no 
+numbers are ever parsed.
+"""
+    if binary is None:
+        binary = filename.endswith('.hpb')
+    if binary:
+        arrays = []
+        block = []
+        header = {'data':_hpb_pack(data, arrays, [], block), 
+                'arrays':arrays}
+        header = json.dumps(header, sort_keys=True, 
+                default=json_default).encode('utf-8')
+        # Pad the header so the block is aligned
+        header += b' ' * (-(len(header) + _HPB_FIXED.size) % 8)
+        with open(filename, 'wb') as ff:
+            ff.write(_HPB_FIXED.pack(_HPB_MAGIC, len(header), len(block), 0))
+            ff.write(header)
+            ff.write(np.array(block, dtype='<f8').tobytes())
+    else:
+        with open(filename, 'w') as ff:
+            json.dump(data, ff, sort_keys=True, indent=4, default=json_default)
+
+
+
+
+def json_default(obj):
+    """Convert numpy types for json.dump()
+    json.dump(data, ff, default=json_default)
+
+Data loaded from binary files contain numpy arrays, which the json 
+module cannot write on its own.
+"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError('Object of type %s is not JSON serializable'%type(obj).__name__)
+
+
+
+
+def _mp_context():
+    """Return the multiprocessing context for PYroMat's process pools
+    context = _mp_context()
+
+The fork start method is used where it is available, so the workers
+inherit the loaded data instead of importing PYroMat again.  Older 
+versions of Python only have the default, so the multiprocessing module
+is returned.  Either way, context.Pool() starts a pool.
+"""
+    # multiprocessing is only imported when a pool is needed
+    import multiprocessing
+    if hasattr(multiprocessing, 'get_context'):
+        if 'fork' in multiprocessing.get_all_start_methods():
+            return multiprocessing.get_context('fork')
+    return multiprocessing
+
+
+
+_HPB_MAGIC = b'HPB2'
+# The fixed part of the header: the magic bytes, the length of the JSON
+# header, the number of float64 values in the block, and a reserved word.
+_HPB_FIXED = struct.Struct('<4sIII')
 
+_HPB_FLOAT = set([float])
+_HPB_LIST = set([list])
+_HPB_NESTED = set([list, np.ndarray])
+_HPB_CONTAINERS = (dict, list, tuple, np.ndarray)
+_HPB_SCALARS = set([float, int, bool, str, type(None)])
+
+def _hpb_array(value):
+    """Flatten a non-empty rectangular (nested) list of only floats
+    shape, flat = _hpb_array(value)
+
+Returns the shape of the array and a flat list of its values, or None
+if the value cannot be stored as an array.  Numpy arrays of floats are
+also accepted.
+"""
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind != 'f' or len(value) == 0:
+            return None
+        return list(value.shape), value.ravel().tolist()
+    if not isinstance(value, list) or len(value) == 0:
+        return None
+    # Checking the set of types is much faster than testing each element
+    types = set(map(type, value))
+    if types == _HPB_FLOAT:
+        return [len(value)], value
+    elif types == _HPB_LIST and len(set(map(len, value))) == 1:
+        # Tables are checked all at once
+        flat = list(itertools.chain(*value))
+        if set(map(type, flat)) == _HPB_FLOAT:
+            return [len(value), len(value[0])], flat
+    if not types <= _HPB_NESTED:
+        return None
+    shape = None
+    flat = []
+    for vv in value:
+        # Most tables that are not arrays of floats (like the integer
+        # exponents of the mp coefficients) fail on their first row
+        this = _hpb_array(vv)
+        if this is None or (shape is not None and this[0] != shape):
+            return None
+        shape = this[0]
+        flat.extend(this[1])
+    return [len(value)] + shape, flat
+
+
+def _hpb_pack(value, arrays, path, block):
+    """Remove the float arrays from a data structure
+    header = _hpb_pack(value, arrays, path, block)
+
+Every non-empty list (or nested list) of only floats that forms a
+rectangular array (see _hpb_array()) is replaced by None, and an entry
+of the form
+    [path, start, stop, shape]
+is appended to the arrays list.  The path is the list of keys and 
+indices from the top of the structure, and start and stop are the 
+positions of the flattened array in the block.  block is a list of 
+floats to which the flattened arrays are appended.  It is converted to
+an array only once, by the caller.
+"""
+    if isinstance(value, dict):
+        out = {}
+        for key,vv in value.items():
+            # Only containers can hold arrays
+            if isinstance(vv, _HPB_CONTAINERS):
+                vv = _hpb_pack(vv, arrays, path + [key], block)
+            out[key] = vv
+        return out
+    this = _hpb_array(value)
+    if this is not None:
+        arrays.append([path, len(block), len(block) + len(this[1]), this[0]])
+        block.extend(this[1])
+        return None
+    if isinstance(value, (list, tuple)):
+        # Lists of scalars need not be searched element by element
+        if _HPB_SCALARS.issuperset(map(type, value)):
+            return list(value)
+        return [_hpb_pack(vv, arrays, path + [ii], block) 
+                for ii,vv in enumerate(value)]
+    return value
+
+
+def _hpb_header(fil, whole=False):
+    """Read the header of a binary data file opened in 'rb' mode
+    header, raw, start, count = _hpb_header(fil)
+        or
+    header, raw, start, count = _hpb_header(fil, whole=True)
+
+Returns the JSON header, the bytes that were read, the position of the 
+numeric block in the file, and the number of float64 values in the 
+block.  Unless whole is True, only the header is read.  Otherwise, the
+entire file is read with one call.
+"""
+    fixed = _HPB_FIXED.size
+    raw = fil.read() if whole else fil.read(fixed)
+    if len(raw) < fixed:
+        raise PMFileError(fil.name)
+    magic,size,count,_ = _HPB_FIXED.unpack_from(raw)
+    if magic != _HPB_MAGIC:
+        raise PMFileError(fil.name)
+    start = fixed + size
+    if not whole:
+        raw += fil.read(size)
+    elif len(raw) < start + 8*count:
+        raise PMFileError(fil.name)
+    return json.loads(raw[fixed:start].decode('utf-8')), raw, start, count
+
+
+def _hpb_read(fil, mmap=False):
+    """Read a binary data file opened in 'rb' mode
+    data = _hpb_read(fil)
+        or
+    data = _hpb_read(fil, mmap=True)
+
+The file is read with one call, and each array is a read-only view of 
+the numeric block; nothing is parsed or copied.  If mmap is True, only
+the header is read, and the block is memory-mapped instead, so the 
+arrays are views of the file itself.  Their pages are shared by every 
+process that maps the same file.
+"""
+    header,raw,start,count = _hpb_header(fil, whole=not mmap)
+    if not mmap:
+        block = np.frombuffer(raw, dtype='<f8', count=count, offset=start)
+    elif count:
+        block = np.memmap(fil.name, dtype='<f8', mode='r', offset=start, 
+                shape=(count,))
+    else:
+        block = np.zeros((0,), dtype='<f8')
 
+    data = header['data']
+    for path,begin,end,shape in header['arrays']:
+        parent = data
+        for key in path[:-1]:
+            parent = parent[key]
+        parent[path[-1]] = block[begin:end].reshape(shape)
+    return data
 
 
 
@@ -545,8 +846,8 @@ files in the search path as part of its output.
 """
     # Check that the file is a data file, and that it is
     # not already suppressed
-    if (len(path)<=4) or (path[-4:]!='.hpd'):
-        print_error('File ' + path + ' is not a *.hpd file.')
+    if (len(path)<=4) or (path[-4:] not in ('.hpd', '.hpb')):
+        print_error('File ' + path + ' is not a *.hpd or *.hpb file.')
         raise PMFileError('Suppression failed.')
     try:
         os.rename(path,path+'~')
@@ -573,8 +874,8 @@ The modification will allow load() to see the file.
 """
     # Check that the file is a data file, and that it is
     # already suppressed
-    if (len(path)<=5) or (path[-5:]!='.hpd~'):
-        print_error('File ' + path + ' is not a suppressed *.hpd file.')
+    if (len(path)<=5) or (path[-5:] not in ('.hpd~', '.hpb~')):
+        print_error('File ' + path + ' is not a suppressed *.hpd or *.hpb file.')
         raise PMFileError('Revival failed.')
     try:
         os.rename(path,path[:-1])
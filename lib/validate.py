@@ -0,0 +1,192 @@
+"""PYROMAT.VALIDATE
+
+The validate module runs the _test() methods of the species in the data
+dictionary and collects the results in a single report.  The ig class
+tests every species against the tabulated data in its data file (see
+the ig._test() documentation).  Testing every species one at a time can
+take a long time, so the tests can be spread across a pool of worker
+processes.
+
+>>> import pyromat as pm
+>>> result = pm.validate.run(report_file='validate.log', workers=4)
+>>> result['failed']
+[]
+"""
+
+import pyromat as pyro
+import multiprocessing
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from io import StringIO
+utility = pyro.utility
+
+
+
+# The configuration parameters that _test() changes as it runs
+_UNITS = ['unit_energy', 'unit_matter', 'unit_pressure', 'unit_temperature']
+
+
+
+def run(species=None, report_file='validate.log', report_level=2,
+        basic=False, workers=1, verbose=False):
+    """Run the _test() methods of many species and write a merged report
+    result = run()
+        or
+    result = run(species, report_file='validate.log', report_level=2,
+            basic=False, workers=1, verbose=False)
+
+SPECIES is an optional list of species id strings to test.  When it is
+omitted, every species in the data dictionary with a _test() method is
+tested.  REPORT_LEVEL and BASIC are passed to each _test() method.
+
+The tests are run in a pool of WORKERS processes.  By default, or when
+workers is 1, the tests are run in this process.  When workers is None,
+the number of CPUs is used.  Where it is available, the pool forks this
+process, so the workers start with the data already loaded.  Otherwise
+(e.g. on Windows) the workers import the __main__ module again, so a 
+script that calls run() with more than one worker must do so under an
+"if __name__ == '__main__':" guard.  The unit configuration parameters 
+that _test() changes are restored when each test is finished.
+
+Each test writes its report to memory, and the reports are merged in
+order of species id into REPORT_FILE, which may be a file name or an
+open file.  The report begins with a summary of the failures and the
+time spent testing each species.  If report_file is None, no report is
+written.  If verbose is True, the outcome of each test is printed to
+stdout as it finishes.
+
+The result is a dictionary with the following keys:
+passed
+    A list of the species ids that passed.
+failed
+    A list of the species ids that failed or raised an error.
+results
+    A list with a dictionary for each species, in order of species id,
+    with its 'id', whether it 'passed', the 'time' spent in seconds,
+    the 'error' message if it raised an exception (otherwise None), and
+    its 'report' text.
+time
+    The total time spent testing in seconds.
+workers
+    The number of workers used.
+"""
+    tic = utility.time.time()
+    # Do not test a partial load
+    pyro.dat.wait()
+    if species is None:
+        species = [sid for sid in sorted(pyro.dat.data.keys())
+                if hasattr(pyro.dat.data[sid], '_test')]
+    else:
+        species = sorted(species)
+        for sid in species:
+            if sid not in pyro.dat.data:
+                utility.print_error('No substance named "' + str(sid) +
+                        '" was found in the loaded data.')
+                raise utility.PMParamError('Invalid substance name.')
+            if not hasattr(pyro.dat.data[sid], '_test'):
+                utility.print_error('The species ' + sid + ' has no _test() method.')
+                raise utility.PMParamError('Species cannot be tested.')
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    workers = max(1, min(workers, len(species)))
+
+    tasks = [(sid, report_level, basic) for sid in species]
+    results = []
+    if workers > 1:
+        pool = utility._mp_context().Pool(workers)
+        try:
+            for this in pool.imap_unordered(_test_one, tasks):
+                results.append(this)
+                if verbose:
+                    _print_result(this)
+        finally:
+            pool.close()
+            pool.join()
+        results.sort(key=lambda this: this['id'])
+    else:
+        for task in tasks:
+            results.append(_test_one(task))
+            if verbose:
+                _print_result(results[-1])
+
+    out = {'passed':[this['id'] for this in results if this['passed']],
+            'failed':[this['id'] for this in results if not this['passed']],
+            'results':results, 'time':utility.time.time() - tic,
+            'workers':workers}
+
+    if report_file is not None:
+        if hasattr(report_file, 'write'):
+            _write_report(report_file, out)
+        else:
+            with open(report_file, 'w') as ff:
+                _write_report(ff, out)
+    return out
+
+
+
+def _test_one(task):
+    """Run a single species test
+    result = _test_one((sid, report_level, basic))
+
+This is the worker function for run().  It returns the result
+dictionary for the species.
+"""
+    sid, report_level, basic = task
+    units = dict((key, pyro.config[key]) for key in _UNITS)
+    ff = StringIO()
+    error = None
+    tic = utility.time.time()
+    try:
+        passed = bool(pyro.dat.data[sid]._test(ff,
+                report_level=report_level, basic=basic))
+    except Exception as exc:
+        passed = False
+        error = repr(exc)
+    elapsed = utility.time.time() - tic
+    for key,value in units.items():
+        pyro.config[key] = value
+    return {'id':sid, 'passed':passed, 'time':elapsed, 'error':error,
+            'report':ff.getvalue()}
+
+
+
+def _print_result(this):
+    """Print the outcome of a single test to stdout"""
+    if this['passed']:
+        utility.sys.stdout.write('Testing %s..[passed]\n'%this['id'])
+    else:
+        utility.sys.stdout.write('Testing %s..[FAILED]\n'%this['id'])
+
+
+
+def _write_report(ff, out):
+    """Write the merged report to an open file"""
+    results = out['results']
+    ff.write('PYroMat validation report\n')
+    ff.write('  PYroMat Version: %s\n'%pyro.config['version'])
+    ff.write('  Date: %s\n'%utility.time.strftime('%Y-%m-%d %H:%M:%S'))
+    ff.write('  Species tested: %d\n'%len(results))
+    ff.write('  Workers: %d\n'%out['workers'])
+    ff.write('  Total time: %.3fs\n'%out['time'])
+    ff.write('  Time testing: %.3fs\n'%sum([this['time'] for this in results]))
+    ff.write('  Passed: %d\n'%len(out['passed']))
+    ff.write('  Failed: %d\n'%len(out['failed']))
+    for this in results:
+        if not this['passed']:
+            if this['error'] is None:
+                ff.write('    %s\n'%this['id'])
+            else:
+                ff.write('    %s  (%s)\n'%(this['id'], this['error']))
+
+    ff.write('\nTimes\n')
+    for this in results:
+        ff.write('  %-20s %9.4fs  %s\n'%(this['id'], this['time'],
+                'pass' if this['passed'] else 'FAIL'))
+
+    for this in results:
+        ff.write('\n')
+        ff.write(this['report'])
+        if this['error'] is not None:
+            ff.write('ERROR: %s\n'%this['error'])
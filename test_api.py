@@ -0,0 +1,203 @@
+# This script cross-checks the array interfaces (the bank module and those
+# built on it) against the scalar property methods of the individual 
+# species, and against tabulated reference values.  It can be run
+# by pytest or by itself,
+#
+#   $python test_api.py
+#
+# Each check raises an AssertionError when the two calculations disagree by
+# more than its tolerance.
+
+import pyromat as pyro
+import pyromat.bank
+import pyromat.equil
+import pyromat.combust
+import sys
+import numpy as np
+
+
+
+# Species of both the ig and ig2 classes
+BANK_SPECIES = ['ig.B2H6', 'ig.CH4', 'ig.CO2', 'ig.H2O', 'ig.N2', 'ig.O2']
+# Temperatures inside all of their limits
+BANK_T = np.array([300., 800., 1500., 2500., 5000.])
+# One atmosphere in bar
+ATM = 1.01325
+
+
+
+def _close(a, b, rtol=1e-9, atol=0., what='value'):
+    """Raise an AssertionError unless two arrays agree"""
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    assert np.allclose(a, b, rtol=rtol, atol=atol), \
+        '%s mismatch: %r != %r'%(what, a, b)
+
+
+def _molar(sid, T, p=1.):
+    """Molar h, s, and g of a species from its own property methods"""
+    this = pyro.get(sid)
+    mw = this.mw()
+    h = np.asarray(this.h(T=T), dtype=float) * mw
+    s = np.asarray(this.s(T=T, p=p), dtype=float) * mw
+    return h, s, h - T*s
+
+
+
+def test_bank():
+    """PMBank against a loop over the species' cp(), h(), s(), and g()"""
+    b = pyro.bank.PMBank(BANK_SPECIES)
+    p = 3.
+    cp = b.cp(BANK_T)
+    h = b.h(BANK_T)
+    s = b.s(BANK_T, p)
+    g = b.g(BANK_T, p)
+    for ii,sid in enumerate(BANK_SPECIES):
+        this = pyro.get(sid)
+        _close(cp[ii], this.cp(T=BANK_T), what=sid + ' cp')
+        _close(h[ii], this.h(T=BANK_T), what=sid + ' h')
+        _close(s[ii], this.s(T=BANK_T, p=p), what=sid + ' s')
+        _close(g[ii], this.h(T=BANK_T) - BANK_T*this.s(T=BANK_T, p=p),
+                rtol=1e-8, what=sid + ' g')
+        _close(b.mw()[ii], this.mw(), what=sid + ' mw')
+
+
+def test_reaction():
+    """PMReaction against the species' Gibbs energies and JANAF"""
+    r = pyro.bank.PMReaction({'ig.H2':-1, 'ig.O2':-0.5, 'ig.H2O':1})
+    T = np.array([500., 1000., 2000., 3000.])
+    dh = 0.
+    dg = 0.
+    for sid,nu in r.stoich[0].items():
+        h,s,g = _molar(sid, T)
+        dh = dh + nu*h
+        dg = dg + nu*g
+    _close(r.dh(T), dh, rtol=1e-8, what='dh')
+    _close(r.dg(T), dg, rtol=1e-8, what='dg')
+    _close(r.Kp(T), np.exp(-dg/pyro.units.const_Ru/T), rtol=1e-8, what='Kp')
+    # The JANAF tables give log10(Kf) = 3.540 for H2O(g) at 2000 K
+    _close(np.log10(r.Kp(2000.)), 3.540, rtol=0., atol=0.005, what='log10 Kp')
+
+
+def test_mixture():
+    """pyromat.mixture() against a mass-weighted sum of its constituents"""
+    T = np.array([300., 1000., 2500.])
+    p = 2.
+    x = {'ig.N2':0.78, 'ig.O2':0.21, 'ig.Ar':0.01}
+    mix = pyro.mixture(x)
+    mw = sum([xx*pyro.get(sid).mw() for sid,xx in x.items()])
+    cp = 0.
+    h = 0.
+    s = 0.
+    for sid,xx in x.items():
+        this = pyro.get(sid)
+        y = xx*this.mw()/mw
+        cp = cp + y*this.cp(T=T)
+        h = h + y*this.h(T=T)
+        # Like the igmix class, the entropy does not include mixing
+        s = s + y*this.s(T=T, p=p)
+    _close(mix.mw(), mw, what='mw')
+    _close(mix.cp(T=T), cp, rtol=1e-8, what='cp')
+    _close(mix.h(T=T), h, rtol=1e-8, what='h')
+    _close(mix.s(T=T, p=p), s, rtol=1e-8, what='s')
+    # The mixture built from ig.air's own composition matches ig.air
+    air = pyro.get('ig.air')
+    mix = pyro.mixture(air.X())
+    _close(mix.h(T=T), air.h(T=T), rtol=1e-8, what='air h')
+    _close(mix.s(T=T, p=p), air.s(T=T, p=p), rtol=1e-8, what='air s')
+    # Out of range, the ig2 constituents contribute nothing, so cp and h
+    # are zero, and s only has the pressure term
+    T = np.array([100., 7000.])
+    _close(air.cp(T=T), 0., what='air cp out of range')
+    _close(air.h(T=T), 0., what='air h out of range')
+    _close(air.s(T=T, p=p), -pyro.units.const_Ru/air.mw()*np.log(p),
+            what='air s out of range')
+
+
+def test_pmmixture():
+    """PMMixture against a pyromat.mixture() for each state"""
+    species = ['ig.N2', 'ig.O2', 'ig.H2O', 'ig.CO2']
+    m = pyro.bank.PMMixture(species)
+    X = np.array([[0.79, 0.21, 0., 0.],
+            [0.70, 0.05, 0.15, 0.10],
+            [0.25, 0.25, 0.25, 0.25]])
+    T = np.array([300., 1200., 2500.])
+    p = np.array([1., 5., 20.])
+    P = m.props(X, T, p)
+    for ii in range(len(T)):
+        mix = pyro.mixture(dict(zip(species, X[ii])))
+        for key in ['cp', 'cv', 'h', 'e', 'gam']:
+            _close(P[key][ii], getattr(mix, key)(T=T[ii]), rtol=1e-8,
+                    what='%s, state %d'%(key, ii))
+        _close(P['d'][ii], mix.d(T=T[ii], p=p[ii]), rtol=1e-8,
+                what='d, state %d'%ii)
+        # Unlike igmix, PMMixture includes the entropy of mixing
+        x = X[ii][X[ii] > 0.]
+        ds = -pyro.units.const_Ru/mix.mw()*np.sum(x*np.log(x))
+        _close(P['s'][ii], mix.s(T=T[ii], p=p[ii]) + ds, rtol=1e-8,
+                what='s, state %d'%ii)
+        _close(m.mw(X[ii]), mix.mw(), what='mw, state %d'%ii)
+
+
+def test_equilibrium():
+    """PMEquilibrium against the equilibrium constants of its reactions"""
+    species = ['ig.N2', 'ig.O2', 'ig.NO', 'ig.N', 'ig.O']
+    eq = pyro.equil.PMEquilibrium(species)
+    T = np.array([2000., 3000., 4000.])
+    p = np.array([ATM, 1., 10.])
+    b = eq.inventory({'ig.N2':0.79, 'ig.O2':0.21})
+    result = eq.solve(b, T, p, tol=1e-12)
+    assert result['converged'].all()
+    X = dict(zip(species, np.moveaxis(result['X'], -1, 0)))
+    # The elements are conserved; O/N is 0.42/1.58 in every state
+    N = X['ig.N'] + X['ig.NO'] + 2*X['ig.N2']
+    O = X['ig.O'] + X['ig.NO'] + 2*X['ig.O2']
+    _close(O/N, 0.42/1.58, rtol=1e-9, what='O/N')
+    # The partial pressures satisfy each reaction's Kp
+    reactions = [({'ig.O2':-1, 'ig.O':2}, X['ig.O']**2/X['ig.O2']*p),
+            ({'ig.N2':-1, 'ig.N':2}, X['ig.N']**2/X['ig.N2']*p),
+            ({'ig.N2':-0.5, 'ig.O2':-0.5, 'ig.NO':1},
+                X['ig.NO']/np.sqrt(X['ig.N2']*X['ig.O2']))]
+    for stoich,Kp in reactions:
+        dg = 0.
+        for sid,nu in stoich.items():
+            dg = dg + nu*_molar(sid, T)[2]
+        _close(Kp, np.exp(-dg/pyro.units.const_Ru/T), rtol=1e-6,
+                what=repr(stoich) + ' Kp')
+
+
+def test_flame():
+    """PMFlame against an enthalpy balance and the CEA flame temperature"""
+    air = {'ig.O2':1., 'ig.N2':3.76}
+    # Frozen products of stoichiometric methane and air
+    f = pyro.combust.PMFlame('ig.CH4', air)
+    result = f.solve(1., 300., ATM)
+    reactants = pyro.mixture({'ig.CH4':1., 'ig.O2':2., 'ig.N2':7.52})
+    products = pyro.mixture({'ig.CO2':1., 'ig.H2O':2., 'ig.N2':7.52})
+    T = products.T_h(h=reactants.h(T=300.))
+    _close(result['T'], T, rtol=0., atol=0.01, what='frozen T')
+    # The equilibrium flame temperature from NASA CEA is 2226 K
+    f = pyro.combust.PMFlame('ig.CH4', air, equilibrium=True)
+    result = f.solve(1., 298.15, ATM)
+    _close(result['T'], 2226., rtol=0., atol=3., what='equilibrium T')
+    # The products are in equilibrium at the flame temperature
+    eq = pyro.equil.PMEquilibrium(f.species)
+    b = eq.inventory({'ig.CH4':1., 'ig.O2':2., 'ig.N2':7.52})
+    X = eq.solve(b, result['T'], ATM)['X']
+    _close(result['X'], X, rtol=1e-4, atol=1e-8, what='equilibrium X')
+
+
+
+if __name__ == '__main__':
+    failures = []
+    for name,test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            sys.stdout.write('Testing ' + name[5:] + '..')
+            try:
+                test()
+            except AssertionError as err:
+                failures.append(name)
+                sys.stdout.write('[FAILED]\n    ' + str(err) + '\n')
+            else:
+                sys.stdout.write('[passed]\n')
+    sys.exit(1 if failures else 0)
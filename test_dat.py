@@ -0,0 +1,259 @@
+# This script checks the data loader (pyromat.dat) on small temporary data
+# directories built from copies of the stock data files.  It can be run by
+# pytest or by itself,
+#
+#   $python test_dat.py
+#
+# Each check raises an AssertionError when the loader does not behave as
+# documented.  The configuration and the data dictionary are restored
+# when each check is finished.
+
+import pyromat as pyro
+import os
+import sys
+import shutil
+import tempfile
+import numpy as np
+
+
+
+# The stock data directory
+DATA = os.path.join(os.path.dirname(os.path.abspath(pyro.__file__)), 'data')
+# A few stock species files, and their ids
+FILES = {'ig.N2':'ig2/N2.hpd', 'ig.O2':'ig2/O2.hpd', 'ig.CO2':'ig2/C_O2.hpd',
+        'ig.Ar':'ig2/Ar.hpd', 'mp.CO2':'mp/C_O2.hpd'}
+
+
+
+def _sandbox(sids, **config):
+    """Load from a temporary data directory
+    tmp, saved = _sandbox(sids, dat_cache=..., ...)
+
+Copies the files of the species in sids to a new temporary directory,
+and makes it the only data directory.  The keyword arguments are written
+to the configuration.  The data dictionary is cleared, but nothing is
+loaded.  Pass the results to _restore() when the check is finished.
+"""
+    tmp = tempfile.mkdtemp()
+    for sid in sids:
+        _copy(sid, tmp)
+    saved = dict((key, pyro.config[key]) for key in config)
+    saved['dat_dir'] = list(pyro.config['dat_dir'])
+    # Writing to dat_dir appends to the list, so it is replaced directly
+    pyro.config.entries['dat_dir'].value = [tmp]
+    for key,value in config.items():
+        pyro.config[key] = value
+    pyro.dat.clear()
+    return tmp, saved
+
+
+def _restore(tmp, saved):
+    """Undo _sandbox() and reload the stock data"""
+    pyro.config.entries['dat_dir'].value = saved.pop('dat_dir')
+    for key,value in saved.items():
+        pyro.config[key] = value
+    shutil.rmtree(tmp)
+    pyro.dat.clear()
+    pyro.dat.load(verbose=False)
+
+
+def _copy(sid, tmp):
+    """Copy the stock file of a species to a directory and return its path"""
+    dest = os.path.join(tmp, os.path.basename(FILES[sid]))
+    shutil.copy(os.path.join(DATA, FILES[sid]), dest)
+    return dest
+
+
+def _edit(fil, mw):
+    """Rewrite a data file with a new molecular weight"""
+    data = pyro.utility.load_file(fil)
+    data['mw'] = mw
+    # Make sure the size changes too, so the edit is seen even when the
+    # file system's time resolution is coarse
+    data['doc'] = data.get('doc', '') + ' (edited)'
+    pyro.utility.save_file(fil, data)
+
+
+def _load():
+    """Clear and load the data, and return the stats"""
+    pyro.dat.clear()
+    pyro.dat.load(verbose=False)
+    return pyro.dat.stats
+
+
+def _stock(sid):
+    """Build a species directly from its stock file"""
+    data = pyro.utility.load_file(os.path.join(DATA, FILES[sid]))
+    data['fromfile'] = os.path.join(DATA, FILES[sid])
+    return pyro.reg.registry[data['class']](data)
+
+
+def _same(a, b, what):
+    """Raise an AssertionError unless two data structures hold the same values"""
+    if isinstance(b, dict):
+        assert isinstance(a, dict) and sorted(a.keys()) == sorted(b.keys()), \
+                '%s keys: %r != %r'%(what, sorted(a), sorted(b))
+        for key in b:
+            _same(a[key], b[key], what + '.' + str(key))
+    elif isinstance(b, list) and isinstance(a, np.ndarray):
+        assert np.array_equal(a, np.array(b, dtype=float)), \
+                '%s: %r != %r'%(what, a, b)
+    elif isinstance(b, list):
+        assert isinstance(a, list) and len(a) == len(b), \
+                '%s: %r != %r'%(what, a, b)
+        for ii,(aa,bb) in enumerate(zip(a, b)):
+            _same(aa, bb, '%s[%d]'%(what, ii))
+    else:
+        assert a == b and type(a) == type(b), '%s: %r != %r'%(what, a, b)
+
+
+
+def test_cache():
+    """The snapshot cache is used until a file or the configuration changes"""
+    # Writing the cache into a data directory would change the directory,
+    # so it is kept somewhere else
+    cachedir = tempfile.mkdtemp()
+    cache = os.path.join(cachedir, 'dat.cache')
+    tmp, saved = _sandbox(['ig.N2', 'ig.O2'], dat_cache=cache)
+    try:
+        assert not _load()['snapshot']
+        assert os.path.isfile(cache), 'the cache was not written'
+        assert _load()['snapshot'], 'the cache was not used'
+        assert sorted(pyro.dat.data.keys()) == ['ig.N2', 'ig.O2']
+        # The species built from the cache are the same
+        T = np.array([300., 1000., 3000.])
+        h = pyro.get('ig.N2').h(T=T)
+        assert np.array_equal(h, _stock('ig.N2').h(T=T))
+        # Editing a file
+        mw = pyro.get('ig.N2').mw()
+        _edit(os.path.join(tmp, 'N2.hpd'), 2*mw)
+        assert not _load()['snapshot'], 'an edited file was missed'
+        assert pyro.get('ig.N2').mw() == 2*mw
+        assert _load()['snapshot']
+        # Adding a file
+        _copy('ig.CO2', tmp)
+        assert not _load()['snapshot'], 'an added file was missed'
+        assert 'ig.CO2' in pyro.dat.data
+        assert _load()['snapshot']
+        # Removing a file
+        os.remove(os.path.join(tmp, 'O2.hpd'))
+        assert not _load()['snapshot'], 'a removed file was missed'
+        assert 'ig.O2' not in pyro.dat.data
+        assert _load()['snapshot']
+        # Changing the configuration
+        pyro.config['dat_exclude'] = 'ig.CO2'
+        stats = _load()
+        pyro.config['dat_exclude'] = ''
+        assert not stats['snapshot'], 'a configuration change was missed'
+        assert 'ig.CO2' not in pyro.dat.data
+    finally:
+        _restore(tmp, saved)
+        shutil.rmtree(cachedir)
+
+
+def test_reload():
+    """reload() reports and applies only the files that changed"""
+    tmp, saved = _sandbox(['ig.N2', 'ig.O2', 'ig.Ar'])
+    try:
+        _load()
+        kept = pyro.get('ig.Ar')
+        mw = pyro.get('ig.N2').mw()
+        _edit(os.path.join(tmp, 'N2.hpd'), 2*mw)
+        _copy('ig.CO2', tmp)
+        os.remove(os.path.join(tmp, 'O2.hpd'))
+        summary = pyro.dat.reload(verbose=False)
+        assert summary == {'added':['ig.CO2'], 'changed':['ig.N2'],
+                'removed':['ig.O2']}, repr(summary)
+        assert sorted(pyro.dat.data.keys()) == ['ig.Ar', 'ig.CO2', 'ig.N2']
+        assert pyro.get('ig.N2').mw() == 2*mw
+        # Unchanged species are not rebuilt
+        assert pyro.get('ig.Ar') is kept, 'an unchanged species was rebuilt'
+        # Nothing has changed since
+        summary = pyro.dat.reload(verbose=False)
+        assert summary == {'added':[], 'changed':[], 'removed':[]}, \
+                repr(summary)
+    finally:
+        _restore(tmp, saved)
+
+
+def test_hpb():
+    """.hpb files hold the same data and load the same species as .hpd"""
+    tmp, saved = _sandbox([])
+    try:
+        for sid in ['ig.N2', 'ig.CO2', 'mp.CO2']:
+            data = pyro.utility.load_file(os.path.join(DATA, FILES[sid]))
+            fil = os.path.join(tmp, sid.replace('.', '_') + '.hpb')
+            pyro.utility.save_file(fil, data)
+            _same(pyro.utility.load_file(fil), data, sid)
+        # Arrays of any shape, including the ones that cannot be packed
+        data = {'id':'test.hpb', 'class':'none', 'doc':'', 
+                'vector':[1., 2.5], 'table':[[1., 2.], [3., 4.]], 
+                'cube':[[[1., 2.], [3., 4.]]], 'ragged':[[1., 2.], [3.]],
+                'mixed':[[1, 2.], [3., 4.]], 'empty':[], 'text':['a', 'b'], 
+                'nested':{'array':[0.5, 0.25], 'number':3}}
+        fil = os.path.join(tmp, 'test.hpb')
+        pyro.utility.save_file(fil, data)
+        _same(pyro.utility.load_file(fil), data, 'test')
+        os.remove(fil)
+        # The species built from them are the same
+        _load()
+        assert sorted(pyro.dat.data.keys()) == ['ig.CO2', 'ig.N2', 'mp.CO2']
+        T = np.array([300., 1000., 3000.])
+        for sid in ['ig.N2', 'ig.CO2']:
+            assert np.array_equal(pyro.get(sid).h(T=T), _stock(sid).h(T=T))
+        assert np.array_equal(pyro.get('mp.CO2').h(T=T[:2], p=10.),
+                _stock('mp.CO2').h(T=T[:2], p=10.))
+    finally:
+        _restore(tmp, saved)
+
+
+def test_store():
+    """Species use read-only views of the store until their files change"""
+    storedir = tempfile.mkdtemp()
+    store = os.path.join(storedir, 'dat.store')
+    tmp, saved = _sandbox(['ig.N2', 'ig.O2', 'mp.CO2'], dat_store='', 
+            dat_lazy=False)
+    try:
+        _load()
+        pyro.dat.updatestore(store, verbose=False)
+        assert os.path.isfile(store), 'the store was not written'
+        pyro.config['dat_store'] = store
+        for lazy in [False, True]:
+            pyro.config['dat_lazy'] = lazy
+            stats = _load()
+            for sid in ['ig.N2', 'ig.O2']:
+                C = pyro.get(sid).data['C']
+                assert isinstance(C, np.ndarray) and C.base is not None, \
+                        sid + ' does not use the store'
+                assert not C.flags.writeable, sid + ' can write to the store'
+                T = np.array([300., 1000., 3000.])
+                assert np.array_equal(pyro.get(sid).h(T=T), 
+                        _stock(sid).h(T=T))
+            assert stats['store'] == 2, repr(stats['store'])
+        # An edited file is loaded from the file
+        pyro.config['dat_lazy'] = False
+        mw = pyro.get('ig.O2').mw()
+        _edit(os.path.join(tmp, 'O2.hpd'), 2*mw)
+        stats = _load()
+        assert stats['store'] == 1, repr(stats['store'])
+        assert pyro.get('ig.O2').mw() == 2*mw
+        assert isinstance(pyro.get('ig.O2').data['C'], list)
+    finally:
+        _restore(tmp, saved)
+        shutil.rmtree(storedir)
+
+
+
+if __name__ == '__main__':
+    failures = []
+    for name,test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            sys.stdout.write('Testing ' + name[5:] + '..')
+            try:
+                test()
+            except AssertionError as err:
+                failures.append(name)
+                sys.stdout.write('[FAILED]\n    ' + str(err) + '\n')
+            else:
+                sys.stdout.write('[passed]\n')
+    sys.exit(1 if failures else 0)